@@ -0,0 +1,83 @@
+"""
+Single-row vs bulk ingest benchmark
+
+Uploads the same synthetic samples through POST /api/water-quality/
+one at a time, then through POST /api/water-quality/bulk as a JSON
+array and as NDJSON, and reports rows per second for each path.
+
+Run: python -m bench.bench_bulk_ingest [--rows 20000]
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+
+def make_rows(count: int, seed: int = 7) -> list[dict]:
+    rng = random.Random(seed)
+    start = date(2024, 1, 1)
+    return [
+        {
+            "site_name": f"Gateway {rng.randrange(50)}",
+            "location": f"Sector {rng.randrange(25)}",
+            "sample_date": (start + timedelta(days=rng.randrange(365))).isoformat(),
+            "ph": round(rng.uniform(6.0, 8.5), 2),
+            "turbidity_ntu": round(rng.uniform(0.1, 40.0), 2),
+            "dissolved_oxygen_mg_l": round(rng.uniform(4.0, 12.0), 2),
+            "nitrates_mg_l": round(rng.uniform(0.0, 5.0), 2),
+            "e_coli_count": rng.randrange(500),
+            "status": rng.choice(["good", "fair", "poor", "unsafe"]),
+        }
+        for _ in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--single-rows", type=int, default=2_000, help="rows sent through the single-row path")
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix=".db", prefix="bench_")
+    os.close(fd)
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    try:
+        from fastapi.testclient import TestClient
+        from main import app
+
+        rows = make_rows(args.rows)
+        results = {"rows": args.rows}
+        with TestClient(app) as client:
+            started = time.perf_counter()
+            for row in rows[:args.single_rows]:
+                assert client.post("/api/water-quality/", json=row).status_code == 201
+            elapsed = time.perf_counter() - started
+            results["single_row_per_s"] = round(args.single_rows / elapsed)
+
+            started = time.perf_counter()
+            response = client.post("/api/water-quality/bulk", json=rows)
+            elapsed = time.perf_counter() - started
+            assert response.json()["created"] == args.rows
+            results["bulk_json_per_s"] = round(args.rows / elapsed)
+
+            body = "\n".join(json.dumps(row) for row in rows)
+            started = time.perf_counter()
+            response = client.post(
+                "/api/water-quality/bulk", content=body, headers={"Content-Type": "application/x-ndjson"}
+            )
+            elapsed = time.perf_counter() - started
+            assert response.json()["created"] == args.rows
+            results["bulk_ndjson_per_s"] = round(args.rows / elapsed)
+
+        results["speedup_json"] = round(results["bulk_json_per_s"] / results["single_row_per_s"], 1)
+        results["speedup_ndjson"] = round(results["bulk_ndjson_per_s"] / results["single_row_per_s"], 1)
+        print(json.dumps(results, indent=2))
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Inspection worklist benchmark
+
+Fills bridges, then times GET /api/bridges/due's query for several
+windows and page sizes against the same ordering without the index (a
+full scan and sort) and against pulling every bridge and sorting in
+Python, as ops did before. Also reports what the index costs: batched
+UPDATEs of condition and next inspection date with and without it, and
+the time to build it on an existing table.
+
+Run: python -m bench.bench_due [--rows 1000000]
+"""
+import argparse
+import json
+import os
+import random
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import func, literal_column, text
+
+from routers.bridges import crud
+from routers.bridges.models import CONDITION_RISK_DAYS, LOAD_RISK_DAYS_PER_TON, LOAD_RISK_MAX_TONS, Bridge, due_rank
+
+from .common import fill_bridges, measure, temp_database
+
+# fill_bridges schedules inspections around this day
+TODAY = date(2025, 1, 1)
+WINDOWS = (0, 30, 365)
+PAGE_SIZES = (10, 100, 500)
+
+
+def unindexed_due(db, within_days: int, limit: int):
+    """The worklist query with its rank written so it cannot match the index"""
+    rank = due_rank + literal_column("0")
+    cutoff = TODAY + timedelta(days=within_days)
+    return (
+        db.query(Bridge.id)
+        .filter(rank <= func.julianday(cutoff.isoformat()), Bridge.next_inspection_date <= cutoff)
+        .order_by(rank, Bridge.id)
+        .limit(limit)
+        .all()
+    )
+
+
+def python_sort(db, within_days: int, limit: int):
+    """Every scheduled bridge fetched and ranked in Python"""
+    cutoff = TODAY + timedelta(days=within_days)
+    weights = {member.name: days for member, days in CONDITION_RISK_DAYS.items()}
+    rows = db.execute(text(
+        "SELECT id, next_inspection_date, condition, max_load_rating_tons FROM bridges "
+        "WHERE next_inspection_date IS NOT NULL"
+    )).all()
+    ranked = [
+        ((TODAY - date.fromisoformat(due)).days + weights[condition]
+         + min(load, LOAD_RISK_MAX_TONS) * LOAD_RISK_DAYS_PER_TON, row_id)
+        for row_id, due, condition, load in rows
+        if date.fromisoformat(due) <= cutoff
+    ]
+    ranked.sort(key=lambda item: (-item[0], item[1]))
+    return ranked[:limit]
+
+
+def timed_updates(engine, rows: int, count: int, seed: int) -> float:
+    """Milliseconds to change condition and next inspection date of `count` random bridges in one transaction"""
+    rng = random.Random(seed)
+    conditions = [member.name for member in CONDITION_RISK_DAYS]
+    params = [
+        (rng.choice(conditions), (TODAY + timedelta(days=rng.randrange(-365, 365))).isoformat(), rng.randrange(1, rows))
+        for _ in range(count)
+    ]
+    raw = engine.raw_connection()
+    try:
+        started = time.perf_counter()
+        raw.cursor().executemany("UPDATE bridges SET condition = ?, next_inspection_date = ? WHERE id = ?", params)
+        raw.commit()
+        return round((time.perf_counter() - started) * 1000, 1)
+    finally:
+        raw.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--updates", type=int, default=20_000)
+    args = parser.parse_args()
+
+    engine, Session, path = temp_database()
+    try:
+        fill_bridges(engine, args.rows, today=TODAY)
+        db = Session()
+        results = {"rows": args.rows, "today": TODAY.isoformat()}
+        for days in WINDOWS:
+            cutoff = TODAY + timedelta(days=days)
+            window = {"due": db.query(func.count(Bridge.id)).filter(Bridge.next_inspection_date <= cutoff).scalar()}
+            for limit in PAGE_SIZES:
+                window[f"top_{limit}"] = measure(
+                    lambda: crud.get_due_bridges(db, within_days=days, limit=limit, today=TODAY), args.repeat
+                )
+            window["top_100_unindexed"] = measure(lambda: unindexed_due(db, days, 100), 3)
+            window["top_100_python_sort"] = measure(lambda: python_sort(db, days, 100), 3)
+            results[f"within_{days}d"] = window
+        db.close()
+
+        results["updates"] = {"count": args.updates, "with_index_ms": timed_updates(engine, args.rows, args.updates, 1)}
+        with engine.begin() as conn:
+            conn.execute(text("DROP INDEX ix_bridges_due_rank_id"))
+        results["updates"]["without_index_ms"] = timed_updates(engine, args.rows, args.updates, 2)
+        index = next(index for index in Bridge.__table__.indexes if index.name == "ix_bridges_due_rank_id")
+        started = time.perf_counter()
+        index.create(engine)
+        results["index_build_s"] = round(time.perf_counter() - started, 2)
+        print(json.dumps(results, indent=2))
+    finally:
+        engine.dispose()
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Wire format and compression benchmark
+
+Encodes one 500-row page of water quality samples as json, columnar json
+and msgpack, then compresses each with gzip (level 6) and brotli
+(quality 4, the middleware defaults). Reports bytes and encode time.
+
+Run: python -m bench.bench_formats [--rows 100000] [--limit 500]
+"""
+import argparse
+import json
+import os
+
+from core.compression import _Compressor
+from core.serialize import PageEncoder
+from routers.water_quality import crud
+from routers.water_quality.models import WaterQualitySample
+from routers.water_quality.schemas import WaterQualityListResponse, WaterQualityResponse
+
+from .common import fill_samples, measure, temp_database
+
+
+def compress(encoding: str, body: bytes) -> bytes:
+    compressor = _Compressor(encoding, gzip_level=6, brotli_quality=4)
+    return compressor.process(body) + compressor.finish()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--limit", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    engine, Session, path = temp_database()
+    try:
+        fill_samples(engine, args.rows)
+        db = Session()
+        encoder = PageEncoder(WaterQualityListResponse, WaterQualityResponse, "samples")
+        page = crud.get_samples(db, limit=args.limit, sort="sample_date", columns=encoder.columns(WaterQualitySample))
+        db.close()
+
+        results = {"rows": args.rows, "limit": args.limit}
+        for fmt in ("json", "columnar", "msgpack"):
+            body = encoder.encode(*page, fmt=fmt)
+            entry = {"bytes": len(body), "encode": measure(lambda: encoder.encode(*page, fmt=fmt), args.repeat)}
+            for encoding in ("gzip", "br"):
+                entry[encoding] = {
+                    "bytes": len(compress(encoding, body)),
+                    "compress": measure(lambda: compress(encoding, body), args.repeat),
+                }
+            results[fmt] = entry
+        print(json.dumps(results, indent=2))
+    finally:
+        engine.dispose()
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Offset vs keyset pagination benchmark
+
+Compares fetching page 1 and page 10,000 (100 rows per page) of
+water quality samples on a table of a million rows.
+
+Run: python -m bench.bench_pagination [--rows 1000000]
+"""
+import argparse
+import json
+import os
+
+from core.pagination import encode_cursor
+from routers.water_quality import crud
+from routers.water_quality.models import WaterQualitySample
+
+from .common import fill_samples, measure, temp_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--page", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    engine, Session, path = temp_database()
+    try:
+        fill_samples(engine, args.rows)
+        db = Session()
+        skip = (args.page - 1) * args.limit
+        results = {"rows": args.rows, "limit": args.limit, "page": args.page}
+
+        for sort in ("id", "sample_date"):
+            column = crud.SORT_COLUMNS[sort]
+            # The cursor for page N points at the last row of page N-1
+            anchor = (
+                db.query(WaterQualitySample)
+                .order_by(column, WaterQualitySample.id)
+                .offset(skip - 1)
+                .first()
+            )
+            cursor = encode_cursor(sort, getattr(anchor, column.key), anchor.id)
+
+            results[sort] = {
+                "offset_page_1": measure(
+                    lambda: crud.get_samples(db, skip=0, limit=args.limit, sort=sort), args.repeat
+                ),
+                f"offset_page_{args.page}": measure(
+                    lambda: crud.get_samples(db, skip=skip, limit=args.limit, sort=sort), args.repeat
+                ),
+                f"cursor_page_{args.page}": measure(
+                    lambda: crud.get_samples(db, limit=args.limit, sort=sort, cursor=cursor), args.repeat
+                ),
+            }
+        db.close()
+        print(json.dumps(results, indent=2))
+    finally:
+        engine.dispose()
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
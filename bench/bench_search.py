@@ -0,0 +1,49 @@
+"""
+Substring vs full-text search benchmark
+
+Times the water quality list endpoint's `search` filter on a table of a
+million samples, with the legacy `%term%` scan and with the FTS5 index.
+
+Run: python -m bench.bench_search [--rows 1000000]
+"""
+import argparse
+import json
+import os
+
+from core.counting import TotalMode
+from core.search import SearchMode
+from routers.water_quality import crud
+
+from .common import fill_samples, measure, temp_database
+
+TERMS = ["Millbrook", "Harbor Outfall", "Cedar Pump 7"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    engine, Session, path = temp_database()
+    try:
+        fill_samples(engine, args.rows)
+        db = Session()
+        results = {"rows": args.rows}
+        for term in TERMS:
+            results[term] = {}
+            for mode in (SearchMode.SUBSTRING, SearchMode.FTS):
+                for total in (TotalMode.EXACT, TotalMode.FALSE):
+                    results[term][f"{mode.value}_total_{total.value}"] = measure(
+                        lambda: crud.get_samples(db, search=term, search_mode=mode, include_total=total),
+                        args.repeat,
+                    )
+        db.close()
+        print(json.dumps(results, indent=2))
+    finally:
+        engine.dispose()
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
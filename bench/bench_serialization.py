@@ -0,0 +1,85 @@
+"""
+List page serialization benchmark
+
+Times one 500-row page of water quality samples through the Pydantic path
+(ORM objects -> WaterQualityListResponse -> FastAPI response validation ->
+json.dumps) and through the fast path (column tuples -> orjson), split into
+fetch and serialize, and checks both produce the same JSON.
+
+Run: python -m bench.bench_serialization [--rows 100000] [--limit 500]
+"""
+import argparse
+import json
+import os
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from core.serialize import PageEncoder
+from routers.water_quality import crud
+from routers.water_quality.models import WaterQualitySample
+from routers.water_quality.schemas import WaterQualityListResponse, WaterQualityResponse
+
+from .common import fill_samples, measure, temp_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--limit", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    engine, Session, path = temp_database()
+    try:
+        fill_samples(engine, args.rows)
+        db = Session()
+        encoder = PageEncoder(WaterQualityListResponse, WaterQualityResponse, "samples")
+        columns = encoder.columns(WaterQualitySample)
+        adapter = TypeAdapter(WaterQualityListResponse)
+
+        def fetch_orm():
+            db.expunge_all()
+            return crud.get_samples(db, limit=args.limit, sort="sample_date")
+
+        def fetch_columns():
+            return crud.get_samples(db, limit=args.limit, sort="sample_date", columns=columns)
+
+        def pydantic_path(page):
+            rows, total, next_cursor = page
+            # What the route and FastAPI's serialize_response + JSONResponse do
+            content = WaterQualityListResponse(total=total, samples=rows, next_cursor=next_cursor)
+            value = adapter.validate_python(content, from_attributes=True)
+            dumped = jsonable_encoder(adapter.dump_python(value, mode="json"))
+            return json.dumps(dumped, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+        def fast_path(page):
+            return encoder.encode(*page)
+
+        orm_page, column_page = fetch_orm(), fetch_columns()
+        assert json.loads(pydantic_path(orm_page)) == orjson.loads(fast_path(column_page))
+
+        results = {
+            "rows": args.rows,
+            "limit": args.limit,
+            "pydantic": {
+                "fetch": measure(fetch_orm, args.repeat),
+                "serialize": measure(lambda: pydantic_path(orm_page), args.repeat),
+                "total": measure(lambda: pydantic_path(fetch_orm()), args.repeat),
+            },
+            "fast": {
+                "fetch": measure(fetch_columns, args.repeat),
+                "serialize": measure(lambda: fast_path(column_page), args.repeat),
+                "total": measure(lambda: fast_path(fetch_columns()), args.repeat),
+            },
+        }
+        db.close()
+        print(json.dumps(results, indent=2))
+    finally:
+        engine.dispose()
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Map viewport and radius query benchmark
+
+Fills bridges clustered around a city centre, then times list pages for
+viewports of increasing size (bbox), radius searches (near) and, for
+comparison, the substring location search the API offered before.
+
+Run: python -m bench.bench_spatial [--rows 1000000]
+"""
+import argparse
+import json
+import os
+import random
+
+from core.counting import TotalMode
+from core.search import SearchMode
+from core.serialize import PageEncoder
+from routers.bridges import crud
+from routers.bridges.models import Bridge
+from routers.bridges.schemas import BridgeListResponse, BridgeResponse
+
+from .common import CITY_CENTER, fill_bridges, measure, temp_database
+
+# Viewport sizes in degrees of latitude (longitude spans 1.3x as much)
+VIEWPORTS = {"street": 0.005, "neighbourhood": 0.02, "district": 0.08}
+RADII_M = (250, 1000, 5000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    engine, Session, path = temp_database()
+    try:
+        fill_bridges(engine, args.rows)
+        db = Session()
+        columns = PageEncoder(BridgeListResponse, BridgeResponse, "bridges").columns(Bridge)
+        rng = random.Random(1)
+
+        def page(include_total, **filters):
+            return crud.get_bridges(db, limit=args.limit, include_total=include_total, columns=columns, **filters)
+
+        def viewport(span):
+            lat = CITY_CENTER[0] + rng.uniform(-0.05, 0.05)
+            lon = CITY_CENTER[1] + rng.uniform(-0.05, 0.05)
+            return (lat, lon, lat + span, lon + span * 1.3)
+
+        def point():
+            return (CITY_CENTER[0] + rng.uniform(-0.05, 0.05), CITY_CENTER[1] + rng.uniform(-0.05, 0.05))
+
+        results = {"rows": args.rows, "limit": args.limit}
+        for name, span in VIEWPORTS.items():
+            box = viewport(span)
+            results[f"bbox_{name}"] = {
+                "matches": page(TotalMode.EXACT, bbox=box)[1],
+                "page": measure(lambda: page(TotalMode.FALSE, bbox=viewport(span)), args.repeat),
+                "page_with_total": measure(lambda: page(TotalMode.EXACT, bbox=viewport(span)), args.repeat),
+            }
+        for radius in RADII_M:
+            results[f"near_{radius}m"] = {
+                "matches": page(TotalMode.EXACT, near=(*point(), radius))[1],
+                "page": measure(lambda: page(TotalMode.FALSE, near=(*point(), radius)), args.repeat),
+            }
+        results["substring_location"] = {
+            "page": measure(
+                lambda: page(TotalMode.EXACT, search="Mill River", search_mode=SearchMode.SUBSTRING), 5
+            ),
+        }
+        db.close()
+        print(json.dumps(results, indent=2))
+    finally:
+        engine.dispose()
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
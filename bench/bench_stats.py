@@ -0,0 +1,77 @@
+"""
+Water quality stats benchmark
+
+Compares the /stats aggregation (raw GROUP BY, daily rollup, and raw
+percentiles) with what dashboards did before: pull every raw sample and
+aggregate client-side in Python.
+
+Run: python -m bench.bench_stats [--rows 1000000]
+"""
+import argparse
+import json
+import os
+import statistics
+from collections import defaultdict
+
+from routers.water_quality import crud
+from routers.water_quality.models import WaterQualitySample
+
+from .common import fill_samples, measure, temp_database
+
+
+def client_side(db, start_date: str, end_date: str) -> int:
+    """Baseline: fetch raw rows and aggregate per site and month in Python"""
+    columns = [getattr(WaterQualitySample, metric) for metric in crud.METRIC_COLUMNS]
+    groups = defaultdict(lambda: defaultdict(list))
+    rows = db.query(WaterQualitySample.site_name, WaterQualitySample.sample_date, *columns).filter(
+        WaterQualitySample.sample_date >= start_date, WaterQualitySample.sample_date <= end_date
+    )
+    for site, day, *values in rows:
+        bucket = groups[(site, day.replace(day=1))]
+        for metric, value in zip(crud.METRIC_COLUMNS, values):
+            if value is not None:
+                bucket[metric].append(value)
+    for metrics in groups.values():
+        for values in metrics.values():
+            ordered = sorted(values)
+            (min(values), max(values), statistics.fmean(values), ordered[len(ordered) // 2])
+    return len(groups)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    engine, Session, path = temp_database()
+    try:
+        fill_samples(engine, args.rows)
+        db = Session()
+        results = {"rows": args.rows}
+        for label, (start, end) in {"one_year": ("2020-01-01", "2020-12-31"), "all": ("2015-01-01", "2024-12-31")}.items():
+            results[label] = {
+                "client_side_python": measure(lambda: client_side(db, start, end), args.repeat),
+                "sql_month_raw": measure(
+                    lambda: crud.get_stats(db, bucket="month", start_date=start, end_date=end, use_rollup=False),
+                    args.repeat,
+                ),
+                "sql_month_rollup": measure(
+                    lambda: crud.get_stats(db, bucket="month", start_date=start, end_date=end), args.repeat
+                ),
+                "sql_month_p50_p90_p95": measure(
+                    lambda: crud.get_stats(
+                        db, bucket="month", start_date=start, end_date=end, percentiles=[50, 90, 95]
+                    ),
+                    args.repeat,
+                ),
+            }
+        db.close()
+        print(json.dumps(results, indent=2))
+    finally:
+        engine.dispose()
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
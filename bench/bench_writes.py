@@ -0,0 +1,106 @@
+"""
+Single-row write path benchmark
+
+Creates, updates and deletes rows one at a time through the CRUD layer,
+each in a fresh session as a request would, and reports the latency of
+each operation plus the SQL statements it issued.
+
+Run: python -m bench.bench_writes [--rows 200000] [--ops 500] [--profile production]
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+from datetime import date
+
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+from database import create_profiled_engine
+
+from routers.bridges import crud as bridge_crud
+from routers.bridges.schemas import BridgeCreate, BridgeUpdate
+from routers.water_quality import crud as sample_crud
+from routers.water_quality.schemas import WaterQualityCreate, WaterQualityUpdate
+
+from .common import fill_samples, temp_database
+
+BRIDGE = BridgeCreate(
+    name="Bench Bridge", location="Bench Street", length_meters=120.0, width_meters=12.0,
+    max_load_rating_tons=40.0, condition="good", year_built="1999", material="steel",
+)
+SAMPLE = WaterQualityCreate(
+    site_name="Bench Intake 1", location="Sector 1", sample_date=date(2024, 5, 1), ph=7.1,
+    turbidity_ntu=2.0, dissolved_oxygen_mg_l=8.0, nitrates_mg_l=1.0, e_coli_count=10, status="good",
+)
+OPERATIONS = {
+    "bridges": (bridge_crud.create_bridge, bridge_crud.update_bridge, bridge_crud.delete_bridge,
+                BRIDGE, BridgeUpdate(condition="fair", notes="Resurfaced")),
+    "water_quality": (sample_crud.create_sample, sample_crud.update_sample, sample_crud.delete_sample,
+                      SAMPLE, WaterQualityUpdate(ph=7.4)),
+}
+
+
+def timed(Session, statements: list, fn, **kwargs) -> tuple[float, int, object]:
+    """Run one operation in a fresh session; return (milliseconds, statements issued, result)"""
+    db = Session()
+    before = len(statements)
+    started = time.perf_counter()
+    try:
+        result = fn(db, **kwargs)
+    finally:
+        db.close()
+    return (time.perf_counter() - started) * 1000, len(statements) - before, result
+
+
+def summarize(samples: list[tuple[float, int]]) -> dict:
+    timings = [ms for ms, _ in samples]
+    return {
+        "median_ms": round(statistics.median(timings), 3),
+        "p99_ms": round(sorted(timings)[int(len(timings) * 0.99) - 1], 3),
+        "statements": max(count for _, count in samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000, help="samples preloaded before timing")
+    parser.add_argument("--ops", type=int, default=500)
+    parser.add_argument("--profile", default="production", help="engine profile (see database.ENGINE_PROFILES)")
+    args = parser.parse_args()
+
+    engine, _, path = temp_database()
+    engine.dispose()
+    engine = create_profiled_engine(f"sqlite:///{path}", args.profile)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *params: statements.append(params[2]))
+    try:
+        fill_samples(engine, args.rows)
+        results = {"rows": args.rows, "ops": args.ops, "profile": args.profile}
+        for resource, (create, update, delete, data, changes) in OPERATIONS.items():
+            created, updated, deleted, ids = [], [], [], []
+            for _ in range(args.ops):
+                ms, count, row = timed(Session, statements, create, data=data)
+                created.append((ms, count))
+                ids.append(row.id)
+            for row_id in ids:
+                ms, count, _ = timed(Session, statements, update, row_id=row_id, data=changes)
+                updated.append((ms, count))
+            for row_id in ids:
+                ms, count, _ = timed(Session, statements, delete, row_id=row_id)
+                deleted.append((ms, count))
+            results[resource] = {
+                "create": summarize(created),
+                "update": summarize(updated),
+                "delete": summarize(deleted),
+            }
+        print(json.dumps(results, indent=2))
+    finally:
+        engine.dispose()
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
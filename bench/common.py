@@ -0,0 +1,195 @@
+"""
+Shared helpers for the benchmark scripts
+"""
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from core.migrations import migrate
+from core.partitions import month_of, next_month
+from routers.bridges.models import bridge_locations, bridge_search
+from routers.water_quality import rollup
+from routers.water_quality.models import sample_locations, sample_partitions, sample_search
+
+
+def create_database(path: str):
+    """Migrate a database file to the app's current schema and return its engine"""
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    migrate(engine)
+    return engine
+
+
+def temp_database():
+    """Create an empty database file with all tables and return (engine, Session factory, path)"""
+    fd, path = tempfile.mkstemp(suffix=".db", prefix="bench_")
+    os.close(fd)
+    engine = create_database(path)
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine), path
+
+
+SITE_AREAS = ["Riverside", "Harbor", "Lakeview", "Millbrook", "Northgate", "Cedar", "Westfield", "Elm Creek"]
+SITE_KINDS = ["Intake", "Outfall", "Sensor", "Reservoir", "Pump Station"]
+
+# Synthetic assets cluster around a city centre, denser towards the middle
+CITY_CENTER = (40.71, -74.0)
+CITY_SPREAD = (0.08, 0.10)
+
+
+def city_point(rng: random.Random) -> tuple[float, float]:
+    """A (lat, lon) drawn around CITY_CENTER, rounded to about 1 m"""
+    return (
+        round(rng.gauss(CITY_CENTER[0], CITY_SPREAD[0]), 5),
+        round(rng.gauss(CITY_CENTER[1], CITY_SPREAD[1]), 5),
+    )
+
+
+def fill_samples(engine, rows: int, seed: int = 42, chunk: int = 50_000):
+    """
+    Insert synthetic water quality samples using raw executemany
+
+    Deterministic for a given seed. A few sites are sampled far more often
+    than the rest, and most samples are good; each site has a fixed
+    location. Rows go straight into their monthly partitions (all ten
+    years' are created first) and the partition directory. The full-text
+    and spatial indexes and the daily rollup are rebuilt afterwards in
+    one pass rather than per row.
+    """
+    rng = random.Random(seed)
+    site_points = [city_point(random.Random(seed * 1000 + site)) for site in range(200)]
+    statuses = ["GOOD", "FAIR", "POOR", "UNSAFE"]
+    status_weights = [55, 25, 15, 5]
+    start = date(2015, 1, 1)
+    with engine.begin() as conn:
+        month = start
+        while month <= start + timedelta(days=3649):
+            sample_partitions.table_for(conn, month)
+            month = next_month(month)
+        ids = sample_partitions.allocate(conn, rows)
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        for offset in range(0, rows, chunk):
+            by_table: dict[str, list] = {}
+            for i in range(offset, min(offset + chunk, rows)):
+                site = int(200 * rng.random() ** 2)
+                day = start + timedelta(days=rng.randrange(3650))
+                by_table.setdefault(sample_partitions.table_name(month_of(day)), []).append((
+                    ids[i],
+                    f"{SITE_AREAS[site % len(SITE_AREAS)]} {SITE_KINDS[site % len(SITE_KINDS)]} {site}",
+                    f"Sector {site % 25}",
+                    *site_points[site],
+                    day.isoformat(),
+                    round(rng.uniform(6.0, 8.5), 2),
+                    round(rng.uniform(0.1, 40.0), 2),
+                    round(rng.uniform(4.0, 12.0), 2),
+                    round(rng.uniform(0.0, 5.0), 2),
+                    rng.randrange(500),
+                    rng.choices(statuses, status_weights)[0],
+                ))
+            for name, batch in by_table.items():
+                cur.executemany(
+                    f"INSERT INTO {name} (id, site_name, location, latitude, longitude, sample_date, ph, "
+                    "turbidity_ntu, dissolved_oxygen_mg_l, nitrates_mg_l, e_coli_count, status) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    batch,
+                )
+                cur.executemany(
+                    f"INSERT INTO {sample_partitions.directory.name} (id, month) VALUES (?, ?)",
+                    [(row[0], row[5][:8] + "01") for row in batch],
+                )
+        raw.commit()
+    finally:
+        raw.close()
+    db = sessionmaker(bind=engine)()
+    try:
+        sample_search.rebuild(db)
+        sample_locations.rebuild(db)
+        rollup.rebuild(db)
+        db.commit()
+    finally:
+        db.close()
+
+
+BRIDGE_KINDS = ["Footbridge", "Viaduct", "Overpass", "Crossing", "Causeway", "Trestle"]
+BRIDGE_WATERS = ["Mill River", "Harbor Channel", "Cedar Creek", "Rail Yard", "Highway 9", "North Canal"]
+BRIDGE_NOTES = [
+    "Expansion joint wear", "Deck resurfaced", "Bearing corrosion observed", "Scour monitoring",
+    "Load posting under review", "Railing replaced", "Drainage blocked", "Paint system failing",
+]
+
+
+def fill_bridges(engine, rows: int, seed: int = 42, chunk: int = 50_000, today: date = date(2025, 1, 1)):
+    """
+    Insert synthetic bridges using raw executemany
+
+    Deterministic for a given seed: lengths are log-normal, most bridges
+    are in good or fair condition and were built mid-century, and worse
+    condition means a shorter inspection interval, and locations cluster
+    around the city centre. The full-text and spatial indexes are rebuilt
+    afterwards.
+    """
+    rng = random.Random(seed)
+    conditions = ["EXCELLENT", "GOOD", "FAIR", "POOR", "CRITICAL"]
+    condition_weights = [10, 45, 30, 12, 3]
+    intervals = {"EXCELLENT": 730, "GOOD": 730, "FAIR": 365, "POOR": 180, "CRITICAL": 90}
+    materials = ["concrete", "steel", "composite", "stone", "timber"]
+    material_weights = [50, 30, 10, 5, 5]
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        for offset in range(0, rows, chunk):
+            batch = []
+            for i in range(offset, min(offset + chunk, rows)):
+                area = SITE_AREAS[rng.randrange(len(SITE_AREAS))]
+                condition = rng.choices(conditions, condition_weights)[0]
+                last = today - timedelta(days=rng.randrange(720))
+                batch.append((
+                    f"{area} {BRIDGE_KINDS[rng.randrange(len(BRIDGE_KINDS))]} {i}",
+                    f"{area} over {BRIDGE_WATERS[rng.randrange(len(BRIDGE_WATERS))]}",
+                    *city_point(rng),
+                    round(max(5.0, rng.lognormvariate(4.1, 0.8)), 1),
+                    round(rng.triangular(4.0, 40.0, 10.0), 1),
+                    round(rng.triangular(5.0, 120.0, 40.0), 1),
+                    condition,
+                    last.isoformat(),
+                    (last + timedelta(days=intervals[condition])).isoformat(),
+                    str(int(rng.triangular(1890, 2024, 1965))),
+                    rng.choices(materials, material_weights)[0],
+                    rng.choice(BRIDGE_NOTES) if rng.random() < 0.3 else None,
+                ))
+            cur.executemany(
+                "INSERT INTO bridges (name, location, latitude, longitude, length_meters, width_meters, "
+                "max_load_rating_tons, condition, last_inspection_date, next_inspection_date, year_built, "
+                "material, notes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                batch,
+            )
+        raw.commit()
+    finally:
+        raw.close()
+    db = sessionmaker(bind=engine)()
+    try:
+        bridge_search.rebuild(db)
+        bridge_locations.rebuild(db)
+        db.commit()
+    finally:
+        db.close()
+
+
+def measure(fn, repeat: int = 5) -> dict:
+    """Run fn repeatedly and return timing statistics in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        "min_ms": round(min(timings), 3),
+        "median_ms": round(statistics.median(timings), 3),
+        "max_ms": round(max(timings), 3),
+    }
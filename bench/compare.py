@@ -0,0 +1,72 @@
+"""
+Compare two bench.suite result files
+
+Prints the p50 and p99 change of every scenario present in both runs and
+exits with status 1 when any p50 regressed by more than the threshold,
+so it can gate a commit.
+
+Run: python -m bench.compare baseline.json candidate.json [--threshold 10]
+"""
+import argparse
+import json
+import sys
+
+
+def load(path: str) -> dict:
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def change(before: float, after: float) -> float:
+    """Relative change in percent"""
+    return (after - before) / before * 100 if before else 0.0
+
+
+def compare(baseline: dict, candidate: dict, threshold: float) -> tuple[list[str], list[str]]:
+    """
+    Returns:
+        Tuple of (report lines, names of the scenarios that regressed)
+    """
+    lines = [f"{'scenario':<24}{'p50 ms':>20}{'change':>10}{'p99 ms':>20}{'change':>10}"]
+    regressed = []
+    for name, before in baseline["scenarios"].items():
+        after = candidate["scenarios"].get(name)
+        if after is None:
+            lines.append(f"{name:<24}{'(missing from candidate)':>40}")
+            continue
+        p50 = change(before["p50_ms"], after["p50_ms"])
+        p99 = change(before["p99_ms"], after["p99_ms"])
+        flag = ""
+        if p50 > threshold:
+            regressed.append(name)
+            flag = "  REGRESSED"
+        lines.append(
+            f"{name:<24}{before['p50_ms']:>9.2f} -> {after['p50_ms']:>7.2f}{p50:>+9.1f}%"
+            f"{before['p99_ms']:>9.2f} -> {after['p99_ms']:>7.2f}{p99:>+9.1f}%{flag}"
+        )
+    for name in candidate["scenarios"].keys() - baseline["scenarios"].keys():
+        lines.append(f"{name:<24}{'(new in candidate)':>40}")
+    return lines, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed p50 slowdown in percent")
+    args = parser.parse_args()
+
+    baseline, candidate = load(args.baseline), load(args.candidate)
+    for key in ("rows", "seed", "profile"):
+        if baseline["meta"].get(key) != candidate["meta"].get(key):
+            print(f"warning: runs differ in {key}: {baseline['meta'].get(key)} vs {candidate['meta'].get(key)}")
+    print(f"{baseline['meta'].get('commit')} -> {candidate['meta'].get('commit')}")
+    lines, regressed = compare(baseline, candidate, args.threshold)
+    print("\n".join(lines))
+    if regressed:
+        print(f"{len(regressed)} scenario(s) slower than {args.threshold:g}%: {', '.join(regressed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Deterministic synthetic dataset generator
+
+Builds a database file holding the same number of bridges and of water
+quality samples, generated from a seed, so benchmark runs on different
+commits read identical data. Sizes are 10k, 1m, 10m or a plain row count.
+
+Run: python -m bench.generate --size 1m --out bench_1m.db [--seed 42]
+"""
+import argparse
+import json
+import os
+import time
+
+from .common import create_database, fill_bridges, fill_samples
+
+SIZES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+
+
+def parse_size(value: str) -> int:
+    """Rows for a named size or a plain row count"""
+    return SIZES[value.lower()] if value.lower() in SIZES else int(value.replace("_", ""))
+
+
+def build_database(path: str, rows: int, seed: int = 42) -> dict:
+    """
+    Create and fill a benchmark database
+
+    Args:
+        path: Database file to create (must not exist yet)
+        rows: Bridges and samples to insert (each)
+        seed: Random seed; the same seed always gives the same data
+
+    Returns:
+        Generation metadata (rows, seed, seconds)
+    """
+    if os.path.exists(path):
+        raise FileExistsError(path)
+    started = time.perf_counter()
+    engine = create_database(path)
+    try:
+        fill_bridges(engine, rows, seed=seed)
+        fill_samples(engine, rows, seed=seed)
+    finally:
+        engine.dispose()
+    return {"rows": rows, "seed": seed, "seconds": round(time.perf_counter() - started, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", default="10k", help="10k, 1m, 10m or a row count")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", required=True, help="database file to create")
+    args = parser.parse_args()
+    print(json.dumps({"path": args.out, **build_database(args.out, parse_size(args.size), args.seed)}))
+
+
+if __name__ == "__main__":
+    main()
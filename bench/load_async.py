@@ -0,0 +1,143 @@
+"""
+Sync vs async stack under many concurrent clients
+
+Drives the app with 200 concurrent clients (asyncio tasks sharing one
+httpx.AsyncClient over ASGITransport, so the app runs on the same event loop
+a uvicorn worker would give it). Each client loops over a mix of list and
+single-row reads with a write every tenth request. The sync stack
+(DB_ASYNC=0) holds one of the ~40 threadpool slots per database call; the
+async stack (DB_ASYNC=1) awaits aiosqlite instead. Each stack runs in a
+fresh interpreter against its own copy of the same database. The response
+cache is disabled so every request reaches the database.
+
+Run: python -m bench.load_async [--clients 200] [--seconds 15] [--profile production]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from .load_read_write import SAMPLE, summarize
+
+
+async def drive(app, clients: int, seconds: float, rows: int) -> dict:
+    import httpx
+
+    latencies = {"reads": [], "writes": []}
+    errors = []
+    deadline = time.perf_counter() + seconds
+
+    async def client_loop(client, seed: int):
+        rng = random.Random(seed)
+        count = 0
+        while time.perf_counter() < deadline:
+            count += 1
+            started = time.perf_counter()
+            kind = "reads"
+            if count % 10 == 0:
+                kind = "writes"
+                response = await client.post("/api/water-quality/", json=SAMPLE)
+                expected = 201
+            elif count % 2:
+                response = await client.get(f"/api/water-quality/{rng.randrange(1, rows + 1)}")
+                expected = 200
+            else:
+                day = f"{rng.randrange(2015, 2025)}-{rng.randrange(1, 13):02d}-01"
+                response = await client.get(
+                    f"/api/water-quality/?limit=50&start_date={day}&sort=sample_date&include_total=false"
+                )
+                expected = 200
+            latencies[kind].append((time.perf_counter() - started) * 1000)
+            if response.status_code != expected:
+                errors.append(response.status_code)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client, seed) for seed in range(clients)))
+        elapsed = time.perf_counter() - started
+
+    every = latencies["reads"] + latencies["writes"]
+    return {
+        **summarize(every),
+        "rps": round(len(every) / elapsed, 1),
+        "errors": len(errors),
+        "reads": summarize(latencies["reads"]),
+        "writes": summarize(latencies["writes"]),
+    }
+
+
+def run_stack(args) -> dict:
+    """Run the load against this interpreter's stack"""
+    import database
+    from core.cache import response_cache
+    from core.migrations import ensure_schema
+    from main import app
+
+    # The ASGI transport does not run the app's lifespan
+    ensure_schema(database.engine)
+
+    async def run():
+        try:
+            return await drive(app, args.clients, args.seconds, args.rows)
+        finally:
+            # aiosqlite connection threads keep the interpreter alive until closed
+            await database.async_engine.dispose()
+
+    response_cache.max_entries = 0
+    result = asyncio.run(run())
+    return {"stack": "async" if database.DB_ASYNC else "sync", "profile": database.DB_PROFILE, **result}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=15.0)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--profile", default="production")
+    parser.add_argument("--in-process", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.in_process:
+        print(json.dumps(run_stack(args)))
+        return
+
+    from .common import fill_samples, temp_database
+
+    engine, _, seed_path = temp_database()
+    fill_samples(engine, args.rows)
+    engine.dispose()
+
+    results = []
+    try:
+        for flag in ("0", "1"):
+            fd, path = tempfile.mkstemp(suffix=".db", prefix="bench_")
+            os.close(fd)
+            shutil.copyfile(seed_path, path)
+            env = dict(os.environ, DATABASE_URL=f"sqlite:///{path}", DB_PROFILE=args.profile, DB_ASYNC=flag)
+            forwarded = ["--clients", str(args.clients), "--seconds", str(args.seconds), "--rows", str(args.rows)]
+            try:
+                completed = subprocess.run(
+                    [sys.executable, "-m", "bench.load_async", "--in-process", *forwarded],
+                    env=env, capture_output=True, text=True,
+                )
+                if completed.returncode:
+                    sys.exit(completed.stderr)
+                results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+            finally:
+                for suffix in ("", "-wal", "-shm"):
+                    if os.path.exists(path + suffix):
+                        os.remove(path + suffix)
+    finally:
+        os.remove(seed_path)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
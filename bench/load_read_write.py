@@ -0,0 +1,147 @@
+"""
+Concurrent read/write load test
+
+Measures GET /api/water-quality/ latency with readers alone, then again
+while writer threads ingest samples through POST /api/water-quality/.
+Each profile runs in a fresh interpreter against its own database file,
+because the engine is configured once at import time.
+
+Run: python -m bench.load_read_write [--profile default|production|all]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+SAMPLE = {
+    "site_name": "Load Test Intake",
+    "location": "Sector 9",
+    "sample_date": "2025-06-01",
+    "ph": 7.1,
+    "turbidity_ntu": 3.0,
+    "dissolved_oxygen_mg_l": 8.0,
+    "nitrates_mg_l": 0.4,
+    "e_coli_count": 10,
+    "status": "good",
+}
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies: list[float]) -> dict:
+    return {
+        "requests": len(latencies),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(max(latencies), 2),
+    }
+
+
+def run_phase(client, readers: int, writers: int, seconds: float) -> dict:
+    """Run readers (and optionally writers) for a fixed duration"""
+    stop = threading.Event()
+    read_latencies: list[float] = []
+    write_latencies: list[float] = []
+    errors = []
+
+    def read_loop():
+        while not stop.is_set():
+            started = time.perf_counter()
+            response = client.get("/api/water-quality/?limit=100&status=good&include_total=false")
+            read_latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                errors.append(response.status_code)
+
+    def write_loop():
+        while not stop.is_set():
+            started = time.perf_counter()
+            response = client.post("/api/water-quality/", json=SAMPLE)
+            write_latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 201:
+                errors.append(response.status_code)
+
+    threads = [threading.Thread(target=read_loop) for _ in range(readers)]
+    threads += [threading.Thread(target=write_loop) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    result = {"reads": summarize(read_latencies), "errors": len(errors)}
+    if write_latencies:
+        result["writes"] = summarize(write_latencies)
+    return result
+
+
+def run_profile(args) -> dict:
+    """Run both phases in this process against a fresh database"""
+    from fastapi.testclient import TestClient
+
+    import database
+    from core.migrations import ensure_schema
+    from main import app
+    from .common import fill_samples
+
+    ensure_schema(database.engine)
+    fill_samples(database.engine, args.rows)
+    with TestClient(app) as client:
+        return {
+            "profile": database.DB_PROFILE,
+            "rows": args.rows,
+            "read_only": run_phase(client, args.readers, 0, args.seconds),
+            "read_during_ingest": run_phase(client, args.readers, args.writers, args.seconds),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--profile", default="all")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--in-process", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.in_process:
+        print(json.dumps(run_profile(args)))
+        return
+
+    import database
+    profiles = sorted(database.ENGINE_PROFILES) if args.profile == "all" else [args.profile]
+    results = []
+    for profile in profiles:
+        fd, path = tempfile.mkstemp(suffix=".db", prefix="bench_")
+        os.close(fd)
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{path}", DB_PROFILE=profile)
+        forwarded = [
+            "--rows", str(args.rows), "--readers", str(args.readers),
+            "--writers", str(args.writers), "--seconds", str(args.seconds),
+        ]
+        try:
+            output = subprocess.run(
+                [sys.executable, "-m", "bench.load_read_write", "--in-process", *forwarded],
+                env=env, check=True, capture_output=True, text=True,
+            ).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+        finally:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
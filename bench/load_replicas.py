@@ -0,0 +1,154 @@
+"""
+Analytics reads during ingest, from the primary or from a read replica
+
+Reader threads request yearly stats and filtered list pages with exact
+totals (the response cache is off) while writer threads ingest samples.
+The run is repeated with every read on the primary and with a replica
+refreshed every --refresh seconds, each in a fresh interpreter on a copy
+of the same generated database. The replica runs also report the lag
+seen on /metrics and how long each refresh took.
+
+Run: python -m bench.load_replicas [--rows 200000] [--readers 4] [--writers 2] [--seconds 20]
+"""
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from .load_read_write import SAMPLE, summarize
+
+
+def run_load(args) -> dict:
+    """Readers and writers against this interpreter's app for args.seconds"""
+    from fastapi.testclient import TestClient
+
+    import database
+    from core.cache import response_cache
+    from core.replicas import REPLICA_REFRESH_SECONDS
+    from main import app
+
+    response_cache.max_entries = 0
+    stop = threading.Event()
+    reads: list[float] = []
+    writes: list[float] = []
+    lags: list[float] = []
+    errors = []
+
+    def read_loop(seed: int):
+        rng = random.Random(seed)
+        while not stop.is_set():
+            year = rng.randrange(2015, 2025)
+            if rng.random() < 0.5:
+                url = f"/api/water-quality/stats?bucket=month&start_date={year}-01-01&end_date={year}-12-31"
+            else:
+                url = f"/api/water-quality/?status=poor&skip={rng.randrange(2_000)}&limit=100"
+            started = time.perf_counter()
+            response = client.get(url)
+            reads.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                errors.append(response.status_code)
+
+    def write_loop():
+        while not stop.is_set():
+            started = time.perf_counter()
+            response = client.post("/api/water-quality/", json=SAMPLE)
+            writes.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 201:
+                errors.append(response.status_code)
+
+    def watch_lag():
+        while not stop.wait(0.5):
+            match = re.search(r"^db_replica_lag_seconds\{[^}]*\} (\S+)$", client.get("/metrics").text, re.M)
+            if match:
+                lags.append(float(match.group(1)))
+
+    with TestClient(app) as client:
+        # Wait for the first refresh (started by the app's lifespan)
+        deadline = time.monotonic() + 600
+        while not all(replica.lag() is not None for replica in database.replicas.replicas):
+            if time.monotonic() > deadline:
+                raise RuntimeError("the replica was never refreshed")
+            time.sleep(0.2)
+        threads = [threading.Thread(target=read_loop, args=(seed,)) for seed in range(args.readers)]
+        threads += [threading.Thread(target=write_loop) for _ in range(args.writers)]
+        threads.append(threading.Thread(target=watch_lag))
+        for thread in threads:
+            thread.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    result = {
+        "replicas": len(database.replicas.replicas),
+        "reads": summarize(reads),
+        "reads_per_s": round(len(reads) / args.seconds, 1),
+        "writes_per_s": round(len(writes) / args.seconds, 1),
+        "writes": summarize(writes),
+        "errors": len(errors),
+    }
+    if lags:
+        result["lag_s"] = {"mean": round(sum(lags) / len(lags), 2), "max": round(max(lags), 2)}
+        refreshes = REPLICA_REFRESH_SECONDS.count(database.replicas.replicas[0].name)
+        if refreshes:
+            total = REPLICA_REFRESH_SECONDS.sum(database.replicas.replicas[0].name)
+            result["refresh"] = {"count": refreshes, "mean_s": round(total / refreshes, 2)}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--refresh", type=float, default=10.0, help="replica refresh interval in seconds")
+    parser.add_argument("--profile", default="production")
+    parser.add_argument("--in-process", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.in_process:
+        print(json.dumps(run_load(args)))
+        return
+
+    from .common import fill_samples, temp_database
+
+    engine, _, seed_path = temp_database()
+    fill_samples(engine, args.rows)
+    engine.dispose()
+    directory = tempfile.mkdtemp(prefix="bench_replicas_")
+    forwarded = [
+        "--readers", str(args.readers), "--writers", str(args.writers), "--seconds", str(args.seconds),
+    ]
+    results = []
+    try:
+        for replicas in (0, 1):
+            path = os.path.join(directory, f"primary_{replicas}.db")
+            shutil.copyfile(seed_path, path)
+            env = dict(
+                os.environ,
+                DATABASE_URL=f"sqlite:///{path}",
+                DB_PROFILE=args.profile,
+                DATABASE_REPLICAS=f"sqlite:///{os.path.join(directory, 'replica.db')}" if replicas else "",
+                REPLICA_REFRESH_SECONDS=str(args.refresh),
+            )
+            output = subprocess.run(
+                [sys.executable, "-m", "bench.load_replicas", "--in-process", *forwarded],
+                env=env, check=True, capture_output=True, text=True,
+            ).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+    finally:
+        os.remove(seed_path)
+        shutil.rmtree(directory, ignore_errors=True)
+    print(json.dumps({"rows": args.rows, "cpus": os.cpu_count(), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Read throughput of the multi-worker mode by worker count
+
+Starts the real server, `python main.py --workers N` (N=1 is the plain
+single-process server), on a copy of one generated database and drives
+it over HTTP from client processes for a fixed time. Readers GET random
+samples by id and list pages at random offsets, so the per-worker
+response caches rarely hit. A second phase adds client processes that
+POST samples, which the multi-worker mode sends to its writer process.
+
+Throughput can only scale up to the number of free cores, and the client
+processes run on the same machine.
+
+Run: python -m bench.load_workers [--workers 1 2 4] [--readers 8] [--writers 2] [--seconds 10]
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .load_read_write import SAMPLE, summarize
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def client_loop(port: int, seconds: float, seed: int, rows: int, writes: bool) -> tuple[list[float], int]:
+    """One client: sequential requests over a keep-alive connection until the deadline"""
+    rng = random.Random(seed)
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    body = json.dumps(SAMPLE)
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        if writes:
+            method, url, expected = "POST", "/api/water-quality/", 201
+        elif rng.random() < 0.5:
+            method, url, expected = "GET", f"/api/water-quality/{rng.randrange(1, rows + 1)}", 200
+        else:
+            url = f"/api/water-quality/?status=good&skip={rng.randrange(5_000)}&limit=50&include_total=false"
+            method, expected = "GET", 200
+        started = time.perf_counter()
+        connection.request(
+            method, url, body=body if writes else None, headers={"Content-Type": "application/json"}
+        )
+        response = connection.getresponse()
+        response.read()
+        latencies.append((time.perf_counter() - started) * 1000)
+        if response.status != expected:
+            errors += 1
+    connection.close()
+    return latencies, errors
+
+
+def run_phase(port: int, args, writers: int) -> dict:
+    jobs = [(False, index) for index in range(args.readers)] + [(True, 1000 + index) for index in range(writers)]
+    with ProcessPoolExecutor(max_workers=len(jobs)) as pool:
+        futures = [
+            (writes, pool.submit(client_loop, port, args.seconds, seed, args.rows, writes)) for writes, seed in jobs
+        ]
+        results = [(writes, future.result()) for writes, future in futures]
+
+    reads = [value for writes, (latencies, _) in results if not writes for value in latencies]
+    phase = {
+        "reads_per_s": round(len(reads) / args.seconds, 1),
+        "reads": summarize(reads),
+        "errors": sum(errors for _, (_, errors) in results),
+    }
+    written = [value for writes, (latencies, _) in results if writes for value in latencies]
+    if written:
+        phase["writes_per_s"] = round(len(written) / args.seconds, 1)
+        phase["writes"] = summarize(written)
+    return phase
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(port: int, server: subprocess.Popen, timeout: float = 300.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            sys.exit(f"server exited with {server.returncode}")
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/health")
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.5)
+    sys.exit("server did not start")
+
+
+def run_workers(workers: int, seed_path: str, args) -> dict:
+    """Both phases against `python main.py --workers N` on a copy of the dataset"""
+    fd, path = tempfile.mkstemp(suffix=".db", prefix="bench_")
+    os.close(fd)
+    shutil.copyfile(seed_path, path)
+    port = free_port()
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{path}", DB_PROFILE=args.profile)
+    server = subprocess.Popen(
+        [sys.executable, "main.py", "--workers", str(workers), "--host", "127.0.0.1", "--port", str(port)],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_up(port, server)
+        return {
+            "workers": workers,
+            "read_only": run_phase(port, args, 0),
+            "read_during_writes": run_phase(port, args, args.writers),
+        }
+    finally:
+        server.send_signal(signal.SIGINT)
+        server.wait(timeout=60)
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--readers", type=int, default=8, help="reading client processes")
+    parser.add_argument("--writers", type=int, default=2, help="writing client processes in the second phase")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--profile", default="production")
+    args = parser.parse_args()
+
+    from .common import fill_samples, temp_database
+
+    engine, _, seed_path = temp_database()
+    fill_samples(engine, args.rows)
+    engine.dispose()
+    try:
+        results = [run_workers(workers, seed_path, args) for workers in args.workers]
+    finally:
+        os.remove(seed_path)
+    print(json.dumps({"cpus": os.cpu_count(), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+Scripted benchmark scenarios run in-process through the ASGI app
+
+Generates (or reuses) a deterministic dataset, then times each scenario
+through TestClient: list, deep page (skip and cursor), search, date range,
+stats, single get, single writes and bulk ingest. The response cache is
+cleared before every timed request so each one reaches the database.
+Results are written as JSON; compare two runs with bench.compare.
+
+Cold start is timed in fresh interpreters: cold_import_main (importing
+the app) and cold_first_request (importing, starting it and serving one
+list request). The report's "import_time" lists the slowest direct
+imports of main from `python -X importtime`.
+
+With --db the dataset is generated once and reused; each run works on a
+copy so the write scenarios never change it.
+
+Run: python -m bench.suite --size 10k [--db bench_10k.db] [--out results.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from .load_read_write import percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TERMS = ["river", "harbor", "cedar", "mill", "viaduct", "north", "lake", "creek"]
+SAMPLE = {
+    "site_name": "Suite Intake",
+    "location": "Sector 3",
+    "sample_date": "2025-02-01",
+    "ph": 7.2,
+    "turbidity_ntu": 1.5,
+    "dissolved_oxygen_mg_l": 8.8,
+    "nitrates_mg_l": 0.6,
+    "e_coli_count": 4,
+    "status": "good",
+}
+
+# Run in a fresh interpreter per sample; prints the import and first response times in ms
+COLD_START = """
+import time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+harness = time.perf_counter() - imported
+with TestClient(main.app) as client:
+    assert client.get("/api/water-quality/?limit=10").status_code == 200
+print((imported - started) * 1000, (time.perf_counter() - started - harness) * 1000)
+"""
+
+
+def scenarios(rows: int, rng: random.Random) -> dict:
+    """
+    Scenario name -> (requests per round relative to --repeat, request factory)
+
+    Each factory returns (method, url, json body or None, expected status).
+    """
+    def random_id():
+        return rng.randrange(1, rows + 1)
+
+    def date_window(days: int):
+        start = date(2015, 1, 1) + timedelta(days=rng.randrange(3650 - days))
+        return start.isoformat(), (start + timedelta(days=days)).isoformat()
+
+    def deep_cursor():
+        from core.pagination import encode_cursor
+        return encode_cursor("id", int(rows * 0.9), int(rows * 0.9))
+
+    return {
+        "list_bridges": (1, lambda: ("GET", "/api/bridges/?limit=100", None, 200)),
+        "list_samples_filtered": (1, lambda: ("GET", "/api/water-quality/?limit=100&status=poor", None, 200)),
+        "deep_page_skip": (0.2, lambda: (
+            "GET", f"/api/water-quality/?skip={int(rows * 0.9)}&limit=100&include_total=false", None, 200
+        )),
+        "deep_page_cursor": (1, lambda: (
+            "GET", f"/api/water-quality/?cursor={deep_cursor()}&limit=100&include_total=false", None, 200
+        )),
+        "search": (1, lambda: ("GET", f"/api/bridges/?search={rng.choice(TERMS)}&limit=50", None, 200)),
+        "date_range": (1, lambda: (
+            "GET",
+            "/api/water-quality/?start_date={}&end_date={}&sort=sample_date&limit=100".format(*date_window(30)),
+            None,
+            200,
+        )),
+        "stats": (0.5, lambda: (
+            "GET", "/api/water-quality/stats?start_date={}&end_date={}".format(*date_window(365)), None, 200
+        )),
+        "single_get": (1, lambda: ("GET", f"/api/bridges/{random_id()}", None, 200)),
+        "write_create": (1, lambda: ("POST", "/api/water-quality/", SAMPLE, 201)),
+        "write_update": (1, lambda: (
+            "PUT", f"/api/bridges/{random_id()}", {"notes": f"Inspected {rng.randrange(10_000)}"}, 200
+        )),
+        "bulk_ingest_1000": (0.1, lambda: ("POST", "/api/water-quality/bulk", [SAMPLE] * 1000, 201)),
+    }
+
+
+def run_scenarios(client, rows: int, repeat: int, seed: int, only: list[str]) -> dict:
+    from core.cache import response_cache
+
+    rng = random.Random(seed)
+    results = {}
+    for name, (weight, make_request) in scenarios(rows, rng).items():
+        if only and name not in only:
+            continue
+        count = max(3, round(repeat * weight))
+        latencies = []
+        for index in range(count + 2):
+            method, url, body, expected = make_request()
+            response_cache.clear()
+            started = time.perf_counter()
+            response = client.request(method, url, json=body)
+            elapsed = (time.perf_counter() - started) * 1000
+            if response.status_code != expected:
+                raise RuntimeError(f"{name}: {method} {url} returned {response.status_code}: {response.text[:200]}")
+            if index >= 2:  # the first two requests warm caches and are not recorded
+                latencies.append(elapsed)
+        results[name] = summarize(latencies)
+    return results
+
+
+def summarize(latencies: list[float]) -> dict:
+    return {
+        "requests": len(latencies),
+        "min_ms": round(min(latencies), 3),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "max_ms": round(max(latencies), 3),
+    }
+
+
+def slowest_imports(importtime: str, top: int = 10) -> dict:
+    """The direct imports of main by cumulative time (ms) from `-X importtime` output"""
+    children = {}
+    for line in importtime.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 1:
+            children[name.strip()] = round(int(cumulative) / 1000, 1)
+        elif depth == 0:
+            if name.strip() == "main":
+                return dict(sorted(children.items(), key=lambda item: -item[1])[:top])
+            children = {}
+    return {}
+
+
+def cold_start(runs: int) -> tuple[dict, dict]:
+    """
+    Time importing the app and serving its first request, each run in a fresh interpreter
+
+    Returns:
+        Tuple of (scenario results, slowest imports of main)
+    """
+    def python(*argv: str) -> subprocess.CompletedProcess:
+        return subprocess.run([sys.executable, *argv], cwd=ROOT, capture_output=True, text=True, check=True)
+
+    python("-c", COLD_START)  # migrates a newly generated dataset; not recorded
+    imports, first_requests = [], []
+    for _ in range(runs):
+        imported, first = map(float, python("-c", COLD_START).stdout.split())
+        imports.append(imported)
+        first_requests.append(first)
+    results = {"cold_import_main": summarize(imports), "cold_first_request": summarize(first_requests)}
+    return results, slowest_imports(python("-X", "importtime", "-c", "import main").stderr)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", default="10k", help="10k, 1m, 10m or a row count")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", help="dataset file to reuse, generated there if missing (default: temporary)")
+    parser.add_argument("--profile", default="production", help="engine profile (see database.ENGINE_PROFILES)")
+    parser.add_argument("--repeat", type=int, default=50, help="timed requests per scenario (scaled per scenario)")
+    parser.add_argument("--only", nargs="*", default=[], help="run only these scenarios")
+    parser.add_argument("--cold-runs", type=int, default=5, help="fresh interpreters timed for cold start")
+    parser.add_argument("--out", help="write results JSON here (default: stdout)")
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix=".db", prefix="bench_suite_")
+    os.close(fd)
+    os.remove(path)
+    # The engine is configured from the environment when database is first imported
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ["DB_PROFILE"] = args.profile
+
+    try:
+        from .generate import build_database, parse_size
+
+        rows = parse_size(args.size)
+        generated = None
+        if args.db is None:
+            generated = build_database(path, rows, args.seed)
+        else:
+            if not os.path.exists(args.db):
+                generated = build_database(args.db, rows, args.seed)
+            shutil.copyfile(args.db, path)
+
+        # Before the write scenarios, in subprocesses inheriting DATABASE_URL
+        results, import_time = {}, {}
+        if not args.only or {"cold_import_main", "cold_first_request"} & set(args.only):
+            results, import_time = cold_start(args.cold_runs)
+
+        from fastapi.testclient import TestClient
+        from main import app
+
+        with TestClient(app) as client:
+            results.update(run_scenarios(client, rows, args.repeat, args.seed, args.only))
+
+        report = {
+            "meta": {
+                "commit": git_commit(),
+                "size": args.size,
+                "rows": rows,
+                "seed": args.seed,
+                "profile": args.profile,
+                "python": platform.python_version(),
+                "sqlite": sqlite3.sqlite_version,
+                "generated": generated,
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            },
+            "scenarios": results,
+            "import_time": import_time,
+        }
+        output = json.dumps(report, indent=2)
+        if args.out:
+            with open(args.out, "w") as handle:
+                handle.write(output + "\n")
+        else:
+            print(output)
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+
+if __name__ == "__main__":
+    main()
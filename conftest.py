@@ -0,0 +1,13 @@
+"""
+Shared test setup
+"""
+import pytest
+
+from core.migrations import ensure_schema
+from database import engine
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    """Migrate the test database (TestClient(app) without `with` skips the app's lifespan)"""
+    ensure_schema(engine)
@@ -0,0 +1,180 @@
+"""
+In-process response cache with strong ETags for the read endpoints
+Entries are keyed by route, normalized query parameters and the version
+counter of the table behind the route; CRUD writes bump that counter,
+which makes every older entry unreachable
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+from fastapi.routing import APIRoute
+
+
+class ResponseCache:
+    """Thread-safe LRU cache of rendered GET responses with a TTL"""
+
+    def __init__(self, max_entries: int = 2048, ttl_seconds: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._versions: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def version(self, table: str) -> int:
+        """Current version counter of a table"""
+        return self._versions.get(table, 0)
+
+    def versions(self) -> dict[str, int]:
+        """Version counter of every table written so far"""
+        with self._lock:
+            return dict(self._versions)
+
+    def invalidate(self, table: str, version: Optional[int] = None) -> None:
+        """
+        Bump a table's version so cached responses built from it are never served again
+
+        A reader worker passes the version broadcast by the writer process
+        (core.workers) instead, so every worker renders the same ETags.
+        """
+        with self._lock:
+            current = self._versions.get(table, 0)
+            self._versions[table] = current + 1 if version is None else max(current, version)
+
+    def get(self, key) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["expires_at"] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key, entry: dict) -> None:
+        with self._lock:
+            entry["expires_at"] = time.monotonic() + self.ttl_seconds
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "entries": len(self._entries),
+                "versions": dict(self._versions),
+            }
+
+
+# Shared by every router
+response_cache = ResponseCache()
+
+
+def make_etag(table: str, version: int, body: bytes) -> str:
+    """Strong ETag over the table version and the rendered body (which carries updated_at)"""
+    digest = hashlib.blake2b(f"{table}:{version}:".encode() + body, digest_size=16).hexdigest()
+    return f'"{digest}"'
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    # If-None-Match uses weak comparison, so W/"x" (as sent back for a
+    # compressed response, see core/compression.py) matches "x"
+    if not header:
+        return False
+    candidates = [part.strip().removeprefix("W/") for part in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def _not_modified(etag: str) -> Response:
+    response_cache.not_modified += 1
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+def vary_cache(key: Callable[[Request], Hashable]) -> Callable:
+    """
+    Add key(request) to the cache key of a GET endpoint
+
+    For responses that depend on more than the table and the query
+    string, e.g. the current date. Apply below the route decorator:
+
+        @router.get("/due")
+        @vary_cache(lambda request: date.today())
+        async def due(...): ...
+    """
+    def decorate(endpoint: Callable) -> Callable:
+        endpoint.cache_vary = key
+        return endpoint
+    return decorate
+
+
+def cached_route(table: str, cache: ResponseCache = response_cache) -> type[APIRoute]:
+    """
+    Build an APIRoute class that caches the GET routes of a router
+
+    Usage:
+        router = APIRouter(route_class=cached_route("bridges"))
+
+    A request whose If-None-Match matches the cached ETag gets a 304
+    without running the endpoint, so the database is never touched.
+    Streaming responses and non-200 responses are not cached.
+    """
+
+    class CachedRoute(APIRoute):
+        def get_route_handler(self) -> Callable:
+            handler = super().get_route_handler()
+            vary = getattr(self.endpoint, "cache_vary", None)
+
+            async def cached_handler(request: Request) -> Response:
+                if request.method != "GET":
+                    return await handler(request)
+
+                version = cache.version(table)
+                key = (request.url.path, tuple(sorted(request.query_params.multi_items())), version)
+                if vary is not None:
+                    key += (vary(request),)
+                if_none_match = request.headers.get("if-none-match")
+
+                entry = cache.get(key)
+                if entry is not None:
+                    if _etag_matches(if_none_match, entry["etag"]):
+                        return _not_modified(entry["etag"])
+                    return Response(
+                        content=entry["body"],
+                        status_code=200,
+                        media_type=entry["media_type"],
+                        headers={"ETag": entry["etag"], "Cache-Control": "no-cache"},
+                    )
+
+                response = await handler(request)
+                if response.status_code != 200 or isinstance(response, StreamingResponse):
+                    return response
+
+                etag = make_etag(table, version, response.body)
+                cache.set(key, {"body": response.body, "media_type": response.media_type, "etag": etag})
+                if _etag_matches(if_none_match, etag):
+                    return _not_modified(etag)
+                response.headers["ETag"] = etag
+                response.headers["Cache-Control"] = "no-cache"
+                return response
+
+            return cached_handler
+
+    return CachedRoute
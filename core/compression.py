@@ -0,0 +1,140 @@
+"""
+Negotiated response compression (brotli or gzip)
+Bodies at or above a size threshold are compressed with the best encoding
+the client accepts; streaming responses are compressed chunk by chunk
+"""
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+# Server preference when the client accepts several encodings equally
+PREFERRED_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Pick a content encoding from an Accept-Encoding header
+
+    Returns:
+        "br", "gzip" or None when nothing acceptable is supported
+    """
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        if name:
+            weights[name] = weight
+    candidates = [
+        (weights.get(encoding, weights.get("*", 0.0)), -rank, encoding)
+        for rank, encoding in enumerate(PREFERRED_ENCODINGS)
+    ]
+    weight, _, encoding = max(candidates)
+    return encoding if weight > 0 else None
+
+
+class _Compressor:
+    """Incremental brotli or gzip compressor"""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        if encoding == "br":
+            compressor = brotli.Compressor(quality=brotli_quality)
+            self.process, self.finish = compressor.process, compressor.finish
+        else:
+            compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self.process, self.finish = compressor.compress, compressor.flush
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with brotli or gzip, as negotiated through Accept-Encoding
+
+    Responses smaller than minimum_size, already-encoded responses and
+    bodiless statuses pass through untouched. Compressed responses get
+    `Vary: Accept-Encoding`, and a strong ETag is turned into a weak one
+    because the bytes now differ from the identity encoding.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        def mark_compressed(message: Message) -> MutableHeaders:
+            headers = MutableHeaders(raw=message["headers"])
+            headers["Content-Encoding"] = encoding
+            headers.add_vary_header("Accept-Encoding")
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = f"W/{etag}"
+            return headers
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                headers = Headers(raw=message["headers"])
+                passthrough = message["status"] in (204, 304) or "content-encoding" in headers
+                if passthrough:
+                    await send(message)
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                if not more_body and len(body) < self.minimum_size:
+                    await send(start)
+                    await send(message)
+                    passthrough = True
+                    return
+                compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                headers = mark_compressed(start)
+                if more_body:
+                    del headers["Content-Length"]
+                    await send(start)
+                    await send({"type": "http.response.body", "body": compressor.process(body), "more_body": True})
+                    return
+                compressed = compressor.process(body) + compressor.finish()
+                headers["Content-Length"] = str(len(compressed))
+                await send(start)
+                await send({"type": "http.response.body", "body": compressed})
+                return
+
+            if more_body:
+                chunk = compressor.process(body)
+                if chunk:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            else:
+                await send({"type": "http.response.body", "body": compressor.process(body) + compressor.finish()})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,109 @@
+"""
+Total-count helpers for the list endpoints
+Lets callers skip the COUNT(*) entirely or serve it from a small cache
+"""
+import enum
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Query
+
+
+class TotalMode(str, enum.Enum):
+    """How a list endpoint should compute its `total` field"""
+    FALSE = "false"
+    EXACT = "exact"
+    ESTIMATE = "estimate"
+
+
+class CountCache:
+    """
+    Thread-safe cache of row counts keyed by filter set
+
+    Entries expire after `ttl_seconds` and the whole cache is dropped by
+    `invalidate()`, which the CRUD modules call on every write.
+    """
+
+    def __init__(self, ttl_seconds: float = 30.0, max_entries: int = 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[int]:
+        """Return a cached count or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            count, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return count
+
+    def set(self, key, count: int) -> None:
+        """Store a count for a filter set"""
+        with self._lock:
+            self._entries[key] = (count, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_count(self, key, count_fn: Callable[[], int]) -> int:
+        """Return the cached count for key, computing and storing it on a miss"""
+        count = self.get(key)
+        if count is None:
+            count = count_fn()
+            self.set(key, count)
+        return count
+
+    def invalidate(self) -> None:
+        """Drop every cached count"""
+        with self._lock:
+            self._entries.clear()
+
+
+def filter_key(**filters) -> tuple:
+    """Build a hashable cache key from filter keyword arguments"""
+    return tuple(sorted((name, value) for name, value in filters.items() if value is not None))
+
+
+def count_query(query: Query) -> int:
+    """Run a plain COUNT(*) over a filtered query without ordering or paging"""
+    statement = query.statement.with_only_columns(func.count(), maintain_column_froms=True).order_by(None)
+    return query.session.execute(statement).scalar()
+
+
+def resolve_total(
+    query: Query,
+    mode: TotalMode,
+    cache: CountCache,
+    key: tuple,
+    count: Optional[Callable[[], int]] = None
+) -> Optional[int]:
+    """
+    Compute the `total` for a list request according to the requested mode
+
+    Args:
+        query: Filtered query (before pagination)
+        mode: false skips counting, exact always counts, estimate uses the cache
+        cache: Count cache of the resource being listed
+        key: Cache key for the filter set (see filter_key)
+        count: Counts the matching rows; defaults to a COUNT(*) over query
+
+    Returns:
+        Row count, or None when mode is false
+    """
+    if mode == TotalMode.FALSE:
+        return None
+    count = count or (lambda: count_query(query))
+    if mode == TotalMode.ESTIMATE:
+        return cache.get_or_count(key, count)
+    total = count()
+    cache.set(key, total)
+    return total
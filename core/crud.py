@@ -0,0 +1,915 @@
+"""
+Generic CRUD operations for resource tables
+A resource declares its model, filters, sort keys and search index once;
+pagination, counting, full-text sync, bulk writes and cache invalidation
+live here so every resource gets the same behaviour
+"""
+import operator
+from dataclasses import dataclass
+from typing import Any, Callable, Generic, Optional, TypeVar
+
+from pydantic import BaseModel as Schema
+from sqlalchemy import Row, Table, bindparam, delete, func, insert, literal, or_, select, union_all, update
+from sqlalchemy.orm import Query, Session
+
+from core.cache import response_cache
+from core.counting import CountCache, TotalMode, count_query, filter_key, resolve_total
+from core.pagination import paginate
+from core.partitions import MonthlyPartitions, month_of
+from core.search import FullTextIndex, SearchMode, match_expression
+from core.spatial import SpatialIndex
+from models.base import BaseModel
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+_COUNT_CACHE_SIZE = 256
+
+# Every CRUD by table name; the writer process (core.workers) looks them up
+_registry: dict[str, "CRUDBase"] = {}
+
+
+@dataclass(frozen=True)
+class Filter:
+    """
+    One query-string filter of a list endpoint
+
+    Attributes:
+        name: Query parameter name
+        column: Model column the filter applies to
+        op: Comparison applied as op(column, value), equality by default
+        annotation: Type of the query parameter
+        description: Query parameter description for the API docs
+    """
+    name: str
+    column: Any
+    op: Callable = operator.eq
+    annotation: Any = str
+    description: str = ""
+
+
+def corresponding(source, column):
+    """A model column as selected from source: the model, an aliased model or a Table"""
+    return source.c[column.key] if isinstance(source, Table) else getattr(source, column.key)
+
+
+def crud_for(table_name: str) -> Optional["CRUDBase"]:
+    """The CRUD of a table, if one was created"""
+    return _registry.get(table_name)
+
+
+def query_entity(query: Query):
+    """The model (or aliased model) a filtered query selects from"""
+    return query.column_descriptions[0]["entity"]
+
+
+class CRUDBase(Generic[ModelT]):
+    """
+    List, get, create, update, delete and the bulk writes for one model
+
+    Subclasses keep derived data in sync by extending the on_create,
+    on_update, on_delete, on_bulk_create, on_bulk_update and on_bulk_delete
+    hooks, which run inside the write transaction before it commits
+    (on_delete after the row has been deleted). The single-row hooks get
+    the row returned by the write statement (a Row, read like the model);
+    the set-based hooks get the id and before_columns (updates) or
+    delete_columns (deletes) of every affected row.
+    """
+
+    # Columns on_update and on_bulk_update need the old value of (read
+    # first only when changed)
+    before_columns: tuple[str, ...] = ()
+    # Columns the DELETEs return for on_delete and on_bulk_delete
+    delete_columns: tuple[str, ...] = ("id",)
+
+    def __init__(
+        self,
+        model: type[ModelT],
+        filters: list[Filter] = (),
+        sort_columns: Optional[dict[str, Any]] = None,
+        search_index: Optional[FullTextIndex] = None,
+        substring_columns: list = (),
+        export_columns: Optional[list] = None,
+        spatial_index: Optional[SpatialIndex] = None,
+    ):
+        """
+        Args:
+            model: SQLAlchemy model (a models.base.BaseModel)
+            filters: Filters accepted by the list endpoints
+            sort_columns: Sort keys accepted by the list endpoint; each page
+                is ordered by (key, id). "relevance" (search rank) is also
+                accepted when searching in FTS mode.
+            search_index: FTS index behind the `search` filter
+            substring_columns: Columns matched by the legacy substring search
+            export_columns: Columns written by the export endpoint
+            spatial_index: R*Tree behind the `bbox` and `near` filters
+        """
+        self.model = model
+        self.filters = list(filters)
+        self.sort_columns = sort_columns or {"id": model.id}
+        self.search_index = search_index
+        self.substring_columns = list(substring_columns)
+        self.export_columns = export_columns
+        self.spatial_index = spatial_index
+        # Cached totals for include_total=estimate; every write invalidates it
+        self.count_cache = CountCache()
+        _registry[self.table_name] = self
+
+    @property
+    def table_name(self) -> str:
+        return self.model.__tablename__
+
+    def invalidate(self, version: Optional[int] = None) -> None:
+        """Drop cached counts and responses after a write (version: as broadcast by the writer process)"""
+        self.count_cache.invalidate()
+        response_cache.invalidate(self.table_name, version)
+
+    def conditions(self, source=None, **filters) -> list:
+        """
+        WHERE clauses for the declared filters that have a value
+
+        Args:
+            source: Model, aliased model or Table to filter (default: the model)
+            **filters: Values for the declared filters
+        """
+        return [
+            spec.op(spec.column if source is None else corresponding(source, spec.column), filters[spec.name])
+            for spec in self.filters
+            if filters.get(spec.name) is not None
+        ]
+
+    def source(self, db: Session, **filters):
+        """The model (or an aliased model) list queries with these filters select from"""
+        return self.model
+
+    def count(self, query: Query, **filters) -> int:
+        """Total rows of a filtered list query"""
+        return count_query(query)
+
+    def _map_area_only(self, search=None, **filters) -> bool:
+        # A bbox / near filter with no search and no other filter
+        return (
+            self.spatial_index is not None
+            and not search
+            and bool(filters.get("bbox") or filters.get("near"))
+            and not self.conditions(**filters)
+        )
+
+    def estimates_total(self, include_total: TotalMode, search=None, **filters) -> bool:
+        """
+        Whether get_page may return an approximate total for these arguments
+
+        With include_total=estimate, a bbox / near filter and no other
+        filter, a dense area's total is estimated from the R*Tree (see
+        SpatialIndex.estimate) rather than counted.
+        """
+        return include_total == TotalMode.ESTIMATE and self._map_area_only(search, **filters)
+
+    def _spatial_estimate(self, query: Query, **filters) -> int:
+        # A dense area is estimated from the R*Tree, where counting it would
+        # read every row of the table; a sparse one is counted exactly
+        estimate = self.spatial_index.estimate(query.session, filters.get("bbox"), filters.get("near"))
+        return estimate if estimate is not None else self.count(query, **filters)
+
+    def filter(
+        self,
+        db: Session,
+        search: Optional[str] = None,
+        search_mode: SearchMode = SearchMode.FTS,
+        **filters
+    ) -> Query:
+        """
+        Build the filtered query shared by the list endpoints
+
+        Args:
+            db: Database session
+            search: Search term; a word-prefix match through the FTS index
+            search_mode: fts, or substring for the legacy `%term%` match
+            **filters: Values for the declared filters; None means unfiltered.
+                With a spatial index, also `bbox` as (min_lat, min_lon,
+                max_lat, max_lon) and `near` as (lat, lon, radius_m). With a
+                search index, also `search_in`, a tuple of the indexed
+                columns an fts search matches (default: index.searched).
+
+        Returns:
+            Filtered query (not yet ordered or paginated) over source(),
+            or over another alias of the model (see query_entity)
+        """
+        return self._filter(db, search=search, search_mode=search_mode, **filters)
+
+    def _filter(self, db: Session, search=None, search_mode=SearchMode.FTS, ranked=False, **filters) -> Query:
+        # ranked: the page is sorted by search rank, so the FTS table must be joined
+        entity = self.source(db, **filters)
+        query = db.query(entity).filter(*self.conditions(entity, **filters))
+
+        if self.spatial_index is not None and (filters.get("bbox") or filters.get("near")):
+            query = self.spatial_index.filter(query, entity, bbox=filters.get("bbox"), near=filters.get("near"))
+
+        if search and search_mode == SearchMode.FTS and self.search_index is not None:
+            return self.search_index.filter(query, entity.id, search, filters.get("search_in"))
+
+        if search and self.substring_columns:
+            query = query.filter(self._substring(entity, search))
+
+        return query
+
+    def _substring(self, entity, search: str):
+        term = f"%{search}%"
+        return or_(*(corresponding(entity, column).ilike(term) for column in self.substring_columns))
+
+    def get_page(
+        self,
+        db: Session,
+        skip: int = 0,
+        limit: int = 100,
+        sort: str = "id",
+        cursor: Optional[str] = None,
+        include_total: TotalMode = TotalMode.EXACT,
+        search: Optional[str] = None,
+        search_mode: SearchMode = SearchMode.FTS,
+        columns: Optional[list] = None,
+        **filters
+    ) -> tuple[list, Optional[int], Optional[str]]:
+        """
+        Get one page of filtered rows
+
+        Args:
+            db: Database session
+            skip: Number of records to skip (ignored when a cursor is given)
+            limit: Maximum number of records to return
+            sort: Sort key, one of sort_columns or "relevance"
+            cursor: Keyset cursor from a previous page
+            include_total: Whether to count exactly, from the cache, or not at
+                all; see estimates_total for when the total is approximate
+            search: Search term
+            search_mode: Full-text (default) or legacy substring search
+            columns: Select only these columns and return Row tuples
+                instead of model objects (must include id and the sort key)
+            **filters: Values for the declared filters
+
+        Returns:
+            Tuple of (rows, total count or None, next page cursor)
+
+        Raises:
+            InvalidCursor: If the cursor cannot be decoded
+        """
+        ranked = (
+            sort == "relevance"
+            and search
+            and search_mode == SearchMode.FTS
+            and self.search_index is not None
+            and match_expression(search) is not None
+        )
+        query = self._filter(db, search=search, search_mode=search_mode, ranked=ranked, **filters)
+        entity = query_entity(query)
+
+        key = filter_key(search=search, search_mode=search_mode, **filters)
+        count = lambda: self.count(query, search=search, search_mode=search_mode, **filters)
+        if self.estimates_total(include_total, search, **filters):
+            # Estimated from the R*Tree and cached under its own key, so
+            # an approximate total never stands in for an exact one
+            key = ("spatial_estimate",) + key
+            count = lambda: self._spatial_estimate(query, **filters)
+        total = resolve_total(query, include_total, self.count_cache, key, count=count)
+
+        if ranked:
+            sort_column = self.search_index.rank
+        else:
+            sort_column = corresponding(entity, self.sort_columns.get(sort, self.model.id))
+        if columns:
+            query = query.with_entities(*(corresponding(entity, column) for column in columns))
+
+        rows, next_cursor = paginate(
+            query,
+            sort=sort,
+            sort_column=sort_column,
+            id_column=entity.id,
+            skip=skip,
+            limit=limit,
+            cursor=cursor,
+        )
+        return rows, total, next_cursor
+
+    def export_query(self, db: Session, columns: Optional[list] = None, **filters) -> Query:
+        """Filtered rows in id order, for streaming export; `columns` selects only those"""
+        query = self._filter(db, **filters)
+        entity = query_entity(query)
+        query = query.order_by(entity.id)
+        if columns:
+            query = query.with_entities(*(corresponding(entity, column) for column in columns))
+        return query
+
+    def get(self, db: Session, row_id: int, columns: Optional[list] = None) -> Optional[ModelT]:
+        """
+        Get one row by ID
+
+        Args:
+            db: Database session
+            row_id: Row ID
+            columns: Select only these columns and return a Row tuple
+
+        Returns:
+            The row or None if not found
+        """
+        query = db.query(*columns) if columns else db.query(self.model)
+        return query.filter(self.model.id == row_id).first()
+
+    def create(self, db: Session, data: Schema) -> Row:
+        """
+        Create a row with a single INSERT ... RETURNING
+
+        Args:
+            db: Database session
+            data: Create schema instance
+
+        Returns:
+            Created row (a Row with every column, server defaults included)
+        """
+        values = data.model_dump()
+        row = db.execute(insert(self.model).values(**values).returning(*self.model.__table__.c)).one()
+        self.on_create(db, row, values)
+        db.commit()
+        self.invalidate()
+        return row
+
+    def bulk_create(self, db: Session, rows: list[dict], chunk_size: int = 1000) -> list[int]:
+        """
+        Insert many already-validated rows
+
+        Each chunk is one multi-row INSERT ... RETURNING id plus the
+        on_bulk_create hook, committed as its own transaction, with no
+        per-row refresh. Chunking bounds how long the write lock is held.
+
+        Args:
+            db: Database session
+            rows: Row dicts (from the create schema's model_dump())
+            chunk_size: Rows per transaction
+
+        Returns:
+            IDs of the created rows, in input order
+        """
+        ids: list[int] = []
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            chunk_ids = db.scalars(
+                insert(self.model).returning(self.model.id, sort_by_parameter_order=True),
+                chunk,
+            ).all()
+            self.on_bulk_create(db, chunk_ids, chunk)
+            db.commit()
+            ids.extend(chunk_ids)
+        if ids:
+            self.invalidate()
+        return ids
+
+    def update(self, db: Session, row_id: int, data: Schema) -> Optional[Row]:
+        """
+        Update the fields that were set on the update schema
+
+        A single UPDATE ... RETURNING; updated_at is set by the column's
+        onupdate default. Only when a column listed in before_columns is
+        being changed is its old value read first, for on_update.
+
+        Returns:
+            Updated row (a Row with every column) or None if not found
+        """
+        changes = data.model_dump(exclude_unset=True)
+        if not changes:
+            return self.get(db, row_id)
+
+        changed = [name for name in self.before_columns if name in changes]
+        before = {}
+        if changed:
+            old = db.execute(
+                select(*(getattr(self.model, name) for name in changed)).where(self.model.id == row_id)
+            ).one_or_none()
+            if old is None:
+                return None
+            before = dict(zip(changed, old))
+
+        row = db.execute(
+            update(self.model)
+            .where(self.model.id == row_id)
+            .values(**changes)
+            .returning(*self.model.__table__.c)
+            .execution_options(synchronize_session=False)
+        ).one_or_none()
+        if row is None:
+            return None
+
+        before = {**{name: getattr(row, name) for name in self.before_columns}, **before}
+        self.on_update(db, row, before, changes)
+        db.commit()
+        self.invalidate()
+        return row
+
+    def delete(self, db: Session, row_id: int) -> bool:
+        """
+        Delete a row with a single DELETE ... RETURNING
+
+        Returns:
+            True if deleted, False if not found
+        """
+        row = db.execute(
+            delete(self.model)
+            .where(self.model.id == row_id)
+            .returning(*(getattr(self.model, name) for name in self.delete_columns))
+            .execution_options(synchronize_session=False)
+        ).one_or_none()
+        if row is None:
+            return False
+
+        self.on_delete(db, row)
+        db.commit()
+        self.invalidate()
+        return True
+
+    def update_where(self, db: Session, changes: dict, **filters) -> list[int]:
+        """
+        Apply one change set to every row matching the filters
+
+        A single UPDATE ... RETURNING id; updated_at is set by the
+        column's onupdate default.
+
+        Args:
+            db: Database session
+            changes: Column values to set
+            **filters: Values for the declared filters
+
+        Returns:
+            IDs of the updated rows
+        """
+        ids = self._execute_update(db, self.conditions(**filters), changes)
+        self._finish_bulk(db, ids)
+        return ids
+
+    def bulk_update(self, db: Session, items: list[tuple[int, dict]]) -> list[int]:
+        """
+        Apply per-row change sets in one transaction
+
+        Rows sharing the same change set are updated by one
+        UPDATE ... WHERE id IN (...) RETURNING id, so a batch that sets
+        the same values on many rows costs one statement.
+
+        Args:
+            db: Database session
+            items: (row id, changes) pairs
+
+        Returns:
+            IDs of the updated rows; ids that do not exist are left out
+        """
+        groups: dict[tuple, list[int]] = {}
+        for row_id, changes in items:
+            groups.setdefault(tuple(sorted(changes.items())), []).append(row_id)
+        ids: list[int] = []
+        for key, group in groups.items():
+            ids.extend(self._execute_update(db, [self.model.id.in_(group)], dict(key)))
+        self._finish_bulk(db, ids)
+        return ids
+
+    def delete_where(self, db: Session, **filters) -> list[int]:
+        """
+        Delete every row matching the filters with one DELETE ... RETURNING id
+
+        Returns:
+            IDs of the deleted rows
+        """
+        statement = (
+            delete(self.model)
+            .where(*self.conditions(**filters))
+            .returning(*(getattr(self.model, name) for name in self.delete_columns))
+            .execution_options(synchronize_session=False)
+        )
+        rows = db.execute(statement).all()
+        if rows:
+            self.on_bulk_delete(db, rows)
+        ids = [row.id for row in rows]
+        self._finish_bulk(db, ids)
+        return ids
+
+    def _execute_update(self, db: Session, where: list, changes: dict) -> list[int]:
+        before = self._read_before(db, self.model.__table__, where, changes)
+        statement = (
+            update(self.model)
+            .where(*where)
+            .values(**changes)
+            .returning(*self._returned(self.model.__table__))
+            .execution_options(synchronize_session=False)
+        )
+        rows = db.execute(statement).all()
+        if rows:
+            self.on_bulk_update(db, rows, before or rows, changes)
+        return [row.id for row in rows]
+
+    def _returned(self, table: Table) -> list:
+        # id plus before_columns: what the set-based UPDATEs return for on_bulk_update
+        return [table.c.id, *(table.c[name] for name in self.before_columns if name != "id")]
+
+    def _read_before(self, db: Session, table: Table, where: list, changes: dict) -> list[Row]:
+        # Old before_columns of the rows an update will change, when it changes them
+        if not any(name in changes for name in self.before_columns):
+            return []
+        return db.execute(select(*self._returned(table)).where(*where)).all()
+
+    def _finish_bulk(self, db: Session, ids: list[int]) -> None:
+        db.commit()
+        if ids:
+            self.invalidate()
+
+    # Hooks; the defaults keep the search and spatial indexes in sync
+
+    def _indexes(self) -> list:
+        return [index for index in (self.search_index, self.spatial_index) if index is not None]
+
+    def on_create(self, db: Session, row: Row, values: dict) -> None:
+        for index in self._indexes():
+            index.add_many(db, [(row.id, values)])
+
+    def on_bulk_create(self, db: Session, ids: list[int], rows: list[dict]) -> None:
+        for index in self._indexes():
+            index.add_many(db, list(zip(ids, rows)))
+
+    def on_update(self, db: Session, row: Row, before: dict, changes: dict) -> None:
+        if self.search_index is not None and self.search_index.touches(changes):
+            self.search_index.upsert(db, row.id, {c: getattr(row, c) for c in self.search_index.columns})
+        if self.spatial_index is not None and self.spatial_index.touches(changes):
+            self.spatial_index.upsert(db, row.id, row)
+
+    def on_delete(self, db: Session, row: Row) -> None:
+        for index in self._indexes():
+            index.remove(db, row.id)
+
+    def on_bulk_update(self, db: Session, rows: list[Row], before: list[Row], changes: dict) -> None:
+        """
+        rows: id and before_columns of every updated row, as updated;
+        before: the same columns as they were before the update
+        """
+        ids = [row.id for row in rows]
+        for index in self._indexes():
+            if index.touches(changes):
+                index.refresh_many(db, ids)
+
+    def on_bulk_delete(self, db: Session, rows: list[Row]) -> None:
+        """rows: delete_columns of every deleted row"""
+        ids = [row.id for row in rows]
+        for index in self._indexes():
+            index.remove_many(db, ids)
+
+
+class PartitionedCRUD(CRUDBase[ModelT]):
+    """
+    CRUD over a model stored in monthly partitions (core.partitions)
+
+    Reads whose filters bound the partition column select from just the
+    months in range, and their totals are counted per month and summed.
+    Full-text searches and sparse map queries are routed through the
+    partition directory to the months holding their matches, and reads by
+    id look up the one month in it. Other reads go through the view over
+    every month. Writes go straight to the partition of the row's date and
+    keep the directory in step; a write that changes the date moves the row
+    to its new month under the same id.
+    """
+
+    def __init__(self, model: type[ModelT], partitions: MonthlyPartitions, **kwargs):
+        """
+        Args:
+            model: SQLAlchemy model registered with partitions
+            partitions: Monthly partitions holding the model's rows
+            **kwargs: As for CRUDBase
+        """
+        super().__init__(model, **kwargs)
+        self.partitions = partitions
+        # Per-month count statements by (months, filters used); a union over
+        # every month costs more to build than to run
+        self._counts: dict[tuple, Any] = {}
+
+    def bounds(self, **filters) -> tuple:
+        """(lower, upper) of the partition column implied by the filters, None when open"""
+        lower = upper = None
+        for spec in self.filters:
+            value = filters.get(spec.name)
+            if value is None or spec.column.key != self.partitions.column:
+                continue
+            if spec.op in (operator.ge, operator.gt, operator.eq):
+                lower = value
+            if spec.op in (operator.le, operator.lt, operator.eq):
+                upper = value
+        return lower, upper
+
+    def source(self, db: Session, **filters):
+        return self.partitions.entity(db, *self.bounds(**filters))
+
+    def count(self, query: Query, search=None, search_mode=SearchMode.FTS, **filters) -> int:
+        """
+        Sum of per-month counts; each month counts through its own indexes,
+        where a COUNT over the union would first pull every row through it.
+        Searches and spatial filters count over the union.
+        """
+        tables = self.partitions.tables(query.session, *self.bounds(**filters))
+        if search or filters.get("bbox") or filters.get("near") or len(tables) < 2:
+            return count_query(query)
+        values = {spec.name: filters[spec.name] for spec in self.filters if filters.get(spec.name) is not None}
+        # Bind types follow the values (a date filter may be a string), so they are part of the key
+        key = (tuple(table.name for table in tables), tuple((name, type(value)) for name, value in values.items()))
+        statement = self._counts.get(key)
+        if statement is None:
+            if len(self._counts) >= _COUNT_CACHE_SIZE:
+                self._counts.clear()
+            params = {name: bindparam(name, value) for name, value in values.items()}
+            counts = union_all(
+                *(select(func.count()).select_from(table).where(*self.conditions(table, **params)) for table in tables)
+            ).subquery()
+            statement = self._counts[key] = select(func.coalesce(func.sum(*counts.c), 0))
+        return query.session.execute(statement, values).scalar()
+
+    def get_page(
+        self,
+        db: Session,
+        skip: int = 0,
+        limit: int = 100,
+        sort: str = "id",
+        cursor: Optional[str] = None,
+        include_total: TotalMode = TotalMode.EXACT,
+        search: Optional[str] = None,
+        search_mode: SearchMode = SearchMode.FTS,
+        columns: Optional[list] = None,
+        **filters
+    ) -> tuple[list, Optional[int], Optional[str]]:
+        """
+        As CRUDBase.get_page
+
+        A full-text search with no other filter, sorted by id or relevance,
+        is counted and paged in the FTS index alone. Only the rows of the
+        page are then read from their months, where routing every match
+        through the directory costs a pass over all of them.
+        """
+        matches = None
+        if (
+            search
+            and search_mode == SearchMode.FTS
+            and self.search_index is not None
+            and sort in ("id", "relevance")
+            and not self.conditions(**filters)
+            and not filters.get("bbox")
+            and not filters.get("near")
+        ):
+            matches = self.search_index.ids(db, search, filters.get("search_in"))
+        if matches is None:
+            return super().get_page(
+                db, skip=skip, limit=limit, sort=sort, cursor=cursor, include_total=include_total,
+                search=search, search_mode=search_mode, columns=columns, **filters
+            )
+
+        total = resolve_total(
+            matches, include_total, self.count_cache, filter_key(search=search, search_mode=search_mode, **filters)
+        )
+        row_id = self.search_index.table.c.rowid
+        page, next_cursor = paginate(
+            matches,
+            sort=sort,
+            sort_column=self.search_index.rank if sort == "relevance" else row_id,
+            id_column=row_id,
+            skip=skip,
+            limit=limit,
+            cursor=cursor,
+        )
+        ids = [row[0] for row in page]
+        entity = self.partitions.route(db, [ids])
+        query = db.query(entity)
+        if columns:
+            query = query.with_entities(*(corresponding(entity, column) for column in columns))
+        rows = {row.id: row for row in query}
+        return [rows[row_id] for row_id in ids if row_id in rows], total, next_cursor
+
+    def _filter(self, db: Session, search=None, search_mode=SearchMode.FTS, ranked=False, **filters) -> Query:
+        matches = None
+        if search and search_mode == SearchMode.FTS and self.search_index is not None:
+            matches = self.search_index.matches(search, filters.get("search_in"))
+            if matches is None:
+                # No searchable tokens: nothing matches
+                return super()._filter(db, search=search, search_mode=search_mode, **filters)
+        ids = [matches] if matches is not None else []
+        if self.spatial_index is not None:
+            ids += self.spatial_index.candidates(db, filters.get("bbox"), filters.get("near"))
+        if not ids:
+            return super()._filter(db, search=search, search_mode=search_mode, **filters)
+
+        # Joining the FTS or R*Tree lookup to the view would repeat it in
+        # every month; the directory hands each month its own matches
+        entity = self.partitions.route(db, ids, *self.bounds(**filters), materialize=ranked)
+        query = db.query(entity).filter(*self.conditions(entity, **filters))
+        if self.spatial_index is not None:
+            query = self.spatial_index.filter(
+                query, entity, bbox=filters.get("bbox"), near=filters.get("near"), use_index=False
+            )
+        if matches is None and search and self.substring_columns:
+            query = query.filter(self._substring(entity, search))
+        elif ranked:
+            query = self.search_index.filter(query, entity.id, search, filters.get("search_in"))
+        return query
+
+    def create(self, db: Session, data: Schema) -> Row:
+        values = data.model_dump()
+        [row_id] = self.partitions.allocate(db, 1)
+        table = self.partitions.table_for(db, values[self.partitions.column])
+        row = db.execute(insert(table).values(id=row_id, **values).returning(*table.c)).one()
+        db.execute(insert(self.partitions.directory).values(id=row_id, month=table.info["month"]))
+        self.on_create(db, row, values)
+        db.commit()
+        self.invalidate()
+        return row
+
+    def bulk_create(self, db: Session, rows: list[dict], chunk_size: int = 1000) -> list[int]:
+        ids: list[int] = []
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            chunk_ids = self.partitions.allocate(db, len(chunk))
+            by_month: dict = {}
+            for row_id, row in zip(chunk_ids, chunk):
+                by_month.setdefault(month_of(row[self.partitions.column]), []).append({**row, "id": row_id})
+            for month, params in by_month.items():
+                db.execute(insert(self.partitions.table_for(db, month)), params)
+            db.execute(
+                insert(self.partitions.directory),
+                [{"id": row["id"], "month": month} for month, params in by_month.items() for row in params],
+            )
+            self.on_bulk_create(db, chunk_ids, chunk)
+            db.commit()
+            ids.extend(chunk_ids)
+        if ids:
+            self.invalidate()
+        return ids
+
+    def get(self, db: Session, row_id: int, columns: Optional[list] = None) -> Optional[Row]:
+        """As CRUDBase.get, reading only the month the directory places the row in"""
+        table = self.partitions.locate(db, row_id)
+        if table is None:
+            return None
+        selected = [table.c[column.key] for column in columns] if columns else table.c
+        return db.execute(select(*selected).where(table.c.id == row_id)).first()
+
+    def update(self, db: Session, row_id: int, data: Schema) -> Optional[Row]:
+        changes = data.model_dump(exclude_unset=True)
+        if not changes:
+            return self.get(db, row_id)
+
+        table = self.partitions.locate(db, row_id)
+        if table is None:
+            return None
+        changed = [name for name in self.before_columns if name in changes]
+        before = {}
+        if changed:
+            old = db.execute(select(*(table.c[name] for name in changed)).where(table.c.id == row_id)).one()
+            before = dict(zip(changed, old))
+
+        rows = self._update_in(db, table, [table.c.id == row_id], changes, returning=table.c)
+        if not rows:
+            return None
+        [row] = rows
+
+        before = {**{name: getattr(row, name) for name in self.before_columns}, **before}
+        self.on_update(db, row, before, changes)
+        db.commit()
+        self.invalidate()
+        return row
+
+    def delete(self, db: Session, row_id: int) -> bool:
+        table = self.partitions.locate(db, row_id)
+        if table is None:
+            return False
+        row = db.execute(
+            delete(table)
+            .where(table.c.id == row_id)
+            .returning(*(table.c[name] for name in self.delete_columns))
+        ).one_or_none()
+        if row is None:
+            return False
+        db.execute(delete(self.partitions.directory).where(self.partitions.directory.c.id == row_id))
+
+        self.on_delete(db, row)
+        db.commit()
+        self.invalidate()
+        return True
+
+    def update_where(self, db: Session, changes: dict, **filters) -> list[int]:
+        tables = self._targets_first(self.partitions.tables(db, *self.bounds(**filters)), changes)
+        rows, before = [], []
+        for table in tables:
+            where = self.conditions(table, **filters)
+            before += self._read_before(db, table, where, changes)
+            rows += self._update_in(db, table, where, changes, returning=self._returned(table))
+        if rows:
+            self.on_bulk_update(db, rows, before or rows, changes)
+        ids = [row.id for row in rows]
+        self._finish_bulk(db, ids)
+        return ids
+
+    def bulk_update(self, db: Session, items: list[tuple[int, dict]]) -> list[int]:
+        groups: dict[tuple, list[int]] = {}
+        for row_id, changes in items:
+            groups.setdefault(tuple(sorted(changes.items())), []).append(row_id)
+        ids: list[int] = []
+        directory = self.partitions.directory.c
+        for key, group in groups.items():
+            changes = dict(key)
+            by_month: dict = {}
+            for row_id, month in db.execute(select(directory.id, directory.month).where(directory.id.in_(group))):
+                by_month.setdefault(month, []).append(row_id)
+            tables = self._targets_first([self.partitions.table(month) for month in by_month], changes)
+            rows, before = [], []
+            for table in tables:
+                where = [table.c.id.in_(by_month[table.info["month"]])]
+                before += self._read_before(db, table, where, changes)
+                rows += self._update_in(db, table, where, changes, returning=self._returned(table))
+            if rows:
+                self.on_bulk_update(db, rows, before or rows, changes)
+            ids.extend(row.id for row in rows)
+        self._finish_bulk(db, ids)
+        return ids
+
+    def delete_where(self, db: Session, **filters) -> list[int]:
+        rows: list[Row] = []
+        directory = self.partitions.directory
+        for table in self.partitions.tables(db, *self.bounds(**filters)):
+            conditions = self.conditions(table, **filters)
+            db.execute(delete(directory).where(directory.c.id.in_(select(table.c.id).where(*conditions))))
+            rows += db.execute(
+                delete(table).where(*conditions).returning(*(table.c[name] for name in self.delete_columns))
+            ).all()
+        if rows:
+            self.on_bulk_delete(db, rows)
+        ids = [row.id for row in rows]
+        self._finish_bulk(db, ids)
+        return ids
+
+    def drop_before(self, db: Session, before) -> int:
+        """
+        Retention: drop every month that ends before `before`
+
+        Whole partitions are dropped rather than deleted row by row; the
+        month `before` falls in is kept.
+
+        Returns:
+            Number of rows dropped
+        """
+        cutoff = month_of(before)
+        tables = [table for table in self.partitions.tables(db) if table.info["month"] < cutoff]
+        ids = [row_id for table in tables for row_id in db.scalars(select(table.c.id))]
+        if ids:
+            self.on_drop_partitions(db, ids, cutoff)
+        self.partitions.drop(db, [table.info["month"] for table in tables])
+        db.commit()
+        if tables:
+            self.invalidate()
+        return len(ids)
+
+    def _targets_first(self, tables: list[Table], changes: dict) -> list[Table]:
+        # Update rows already in the target month before moving others into it,
+        # so moved rows are not matched a second time
+        if self.partitions.column not in changes:
+            return tables
+        target = month_of(changes[self.partitions.column])
+        return sorted(tables, key=lambda table: table.info["month"] != target)
+
+    def _update_in(self, db: Session, table: Table, where: list, changes: dict, returning=None) -> list[Row]:
+        """
+        Apply changes to the rows of one partition matching where
+
+        Rows whose new date falls in another month are copied there with
+        INSERT ... SELECT, re-filed in the directory and deleted from
+        this partition.
+
+        Returns:
+            The changed rows, with the `returning` columns (default: id)
+        """
+        column = self.partitions.column
+        if column not in changes or month_of(changes[column]) == table.info["month"]:
+            statement = update(table).where(*where).values(**changes)
+            return db.execute(statement.returning(*(returning if returning is not None else [table.c.id]))).all()
+
+        target = self.partitions.table_for(db, changes[column])
+        values = [
+            literal(changes[c.name], c.type) if c.name in changes
+            else c.onupdate.arg if c.onupdate is not None
+            else c
+            for c in table.c
+        ]
+        moved = db.execute(
+            insert(target)
+            .from_select([c.name for c in table.c], select(*values).where(*where))
+            .returning(*(target.c[c.name] for c in (returning if returning is not None else [table.c.id])))
+        ).all()
+        directory = self.partitions.directory
+        db.execute(
+            update(directory)
+            .where(directory.c.id.in_(select(table.c.id).where(*where)))
+            .values(month=target.info["month"])
+        )
+        db.execute(delete(table).where(*where))
+        return moved
+
+    # Hooks (see CRUDBase)
+
+    def on_drop_partitions(self, db: Session, ids: list[int], before) -> None:
+        """Rows in partitions about to be dropped (all dated before `before`)"""
+        for index in self._indexes():
+            index.remove_many(db, ids)
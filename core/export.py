@@ -0,0 +1,90 @@
+"""
+Streaming export of list results as NDJSON, CSV, columnar NDJSON or MessagePack
+Rows are read with yield_per from a server-side cursor and encoded in
+batches, so memory stays flat however many rows are exported
+"""
+import csv
+import enum
+import io
+import json
+from datetime import date, datetime
+from typing import Callable, Iterator
+
+from sqlalchemy.orm import Query, Session
+
+from core.serialize import pack
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    # One JSON object per batch mapping each column to an array of values
+    "columnar": "application/x-ndjson",
+    # A stream of MessagePack maps, one per row
+    "msgpack": "application/msgpack",
+}
+
+
+def _plain(value):
+    """Convert a column value to what the JSON responses contain"""
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def stream_export(
+    session_factory: Callable[[], Session],
+    build_query: Callable[[Session], Query],
+    columns: list,
+    fmt: str,
+    batch_size: int = 1000
+) -> Iterator[bytes]:
+    """
+    Yield an export of a query, one encoded batch at a time
+
+    The generator opens its own session because it keeps running after
+    the request's dependencies have been torn down.
+
+    Args:
+        session_factory: Callable returning a new session (e.g. SessionLocal)
+        build_query: Builds the filtered, ordered query selecting columns, for a session
+        columns: Mapped columns to export, in output order
+        fmt: A key of EXPORT_MEDIA_TYPES
+        batch_size: Rows fetched and encoded per chunk
+
+    Yields:
+        Encoded chunks of the export body
+    """
+    names = [column.key for column in columns]
+    db = session_factory()
+    try:
+        statement = build_query(db).statement
+        result = db.execute(statement, execution_options={"yield_per": batch_size})
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(names)
+            for batch in result.partitions():
+                writer.writerows([_plain(value) for value in row] for row in batch)
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+            if buffer.tell():
+                yield buffer.getvalue().encode()
+        elif fmt == "columnar":
+            for batch in result.partitions():
+                arrays = {name: [_plain(value) for value in values] for name, values in zip(names, zip(*batch))}
+                yield json.dumps(arrays, separators=(",", ":")).encode() + b"\n"
+        elif fmt == "msgpack":
+            for batch in result.partitions():
+                yield b"".join(pack(dict(zip(names, row))) for row in batch)
+        else:
+            for batch in result.partitions():
+                lines = [
+                    json.dumps({name: _plain(value) for name, value in zip(names, row)}, separators=(",", ":"))
+                    for row in batch
+                ]
+                yield ("\n".join(lines) + "\n").encode()
+    finally:
+        db.close()
@@ -0,0 +1,136 @@
+"""
+Explicit schema setup with a fast "already current" check
+
+migrate() brings a database up to date with every registered router:
+tables and added columns, indexes, monthly partitions, full-text and
+spatial shadow tables, then the registered data steps (e.g. the daily
+rollup backfill) and the query plan check. It stamps the database with
+SCHEMA_VERSION in SQLite's user_version header field.
+
+ensure_schema(), run at app startup, reads that one integer and only
+migrates when it differs, so a current database costs one PRAGMA and
+importing no models.
+
+SCHEMA_VERSION is a fingerprint of the declared schema. After changing a
+model, an index or a registered shadow table, run
+    python -m core.migrations --fingerprint
+and update it (a test fails until it matches). Bump MIGRATIONS_REVISION
+when a step changes behaviour without changing the declared schema.
+
+Migrate a database by hand: python -m core.migrations
+"""
+import hashlib
+import sys
+from typing import Callable
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+SCHEMA_VERSION = 226154169
+
+MIGRATIONS_REVISION = 1
+
+# Functions run by migrate() after the DDL steps, in registration order
+_steps: list[Callable[[Engine], None]] = []
+
+
+def migration_step(step: Callable[[Engine], None]):
+    """Register a function migrate() runs after the tables and shadow tables exist"""
+    _steps.append(step)
+    return step
+
+
+def _load_routers() -> None:
+    from routers import ROUTERS
+
+    for spec in ROUTERS:
+        spec.load()
+
+
+def schema_version(bind: Engine) -> int:
+    with bind.connect() as conn:
+        return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def schema_fingerprint() -> int:
+    """SCHEMA_VERSION as computed from the registered models and shadow tables"""
+    from sqlalchemy.dialects import sqlite
+    from sqlalchemy.schema import CreateIndex, CreateTable
+
+    from core import partitions, search, spatial
+    from database import Base
+
+    _load_routers()
+    dialect = sqlite.dialect()
+    parts = [f"revision {MIGRATIONS_REVISION}"]
+    for table in Base.metadata.sorted_tables:
+        parts.append(str(CreateTable(table).compile(dialect=dialect)).strip())
+        parts.extend(sorted(str(CreateIndex(index).compile(dialect=dialect)) for index in table.indexes))
+    parts.extend(f"partitions {p.name} {p.column}" for p in partitions._registry)
+    parts.extend(f"fts {index.source_table} {index.columns}" for index in search._registry)
+    parts.extend(f"rtree {i.source_table} {i.lat_column} {i.lon_column}" for i in spatial._registry)
+    parts.extend(f"step {step.__module__}.{step.__qualname__}" for step in _steps)
+    digest = hashlib.sha256("\n".join(parts).encode()).hexdigest()
+    # user_version is a signed 32-bit integer
+    return int(digest[:7], 16)
+
+
+def migrate(bind: Engine) -> None:
+    """Create or update every table, index and shadow table, then stamp SCHEMA_VERSION"""
+    from core.partitions import ensure_partitions
+    from core.query_plan import check_query_plans
+    from core.search import ensure_full_text_indexes
+    from core.spatial import ensure_spatial_indexes
+    from database import Base
+    from models import ensure_columns, ensure_indexes
+
+    _load_routers()
+    Base.metadata.create_all(bind=bind)
+    ensure_columns(bind)
+    ensure_indexes(bind)
+    ensure_partitions(bind)
+    ensure_full_text_indexes(bind)
+    ensure_spatial_indexes(bind)
+    for step in _steps:
+        step(bind)
+
+    # Refuse to stamp (and start) if a canonical list query would scan a whole table
+    check_query_plans(bind)
+
+    with bind.begin() as conn:
+        conn.execute(text(f"PRAGMA user_version = {int(SCHEMA_VERSION)}"))
+
+
+def ensure_schema(bind: Engine) -> bool:
+    """
+    Migrate the database unless it is already stamped with SCHEMA_VERSION
+
+    Returns:
+        True if it was migrated
+    """
+    if schema_version(bind) == SCHEMA_VERSION:
+        return False
+    migrate(bind)
+    return True
+
+
+def main(argv: list[str]) -> int:
+    if argv == ["--fingerprint"]:
+        print(schema_fingerprint())
+        return 0
+    if argv:
+        print("usage: python -m core.migrations [--fingerprint]")
+        return 2
+    from database import engine
+
+    before = schema_version(engine)
+    migrate(engine)
+    print(f"Migrated schema version {before} -> {SCHEMA_VERSION}")
+    return 0
+
+
+if __name__ == "__main__":
+    # Steps register with the importable core.migrations, not this __main__ copy
+    from core.migrations import main
+
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,153 @@
+"""
+Keyset (cursor) pagination helpers
+Shared by the resource CRUD modules so every page costs the same,
+no matter how deep into the result set it is
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from typing import Any, Optional
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import InstrumentedAttribute, Query
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+
+def encode_cursor(sort: str, key: Any, row_id: int) -> str:
+    """
+    Build an opaque cursor pointing just after a row
+
+    Args:
+        sort: Name of the sort key the page was ordered by
+        key: Value of the sort key on the last row of the page
+        row_id: ID of the last row of the page
+
+    Returns:
+        URL-safe cursor string
+    """
+    if isinstance(key, (date, datetime)):
+        key = key.isoformat()
+    payload = json.dumps({"s": sort, "k": key, "i": row_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, column) -> tuple[Any, int]:
+    """
+    Decode a cursor produced by encode_cursor
+
+    Args:
+        cursor: Cursor string sent by the client
+        sort: Sort key requested for this page
+        column: Column the sort key maps to (used to restore the key type)
+
+    Returns:
+        Tuple of (sort key value, row id)
+
+    Raises:
+        InvalidCursor: If the cursor is malformed or was issued for another sort
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        key, row_id = payload["k"], int(payload["i"])
+        issued_for = payload["s"]
+    except (binascii.Error, ValueError, KeyError, TypeError) as exc:
+        raise InvalidCursor("Malformed cursor") from exc
+
+    if issued_for != sort:
+        raise InvalidCursor(f"Cursor was issued for sort '{issued_for}', not '{sort}'")
+
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        python_type = None
+    try:
+        if python_type is date and key is not None:
+            key = date.fromisoformat(key)
+        elif python_type is datetime and key is not None:
+            key = datetime.fromisoformat(key)
+    except (TypeError, ValueError) as exc:
+        raise InvalidCursor("Malformed cursor") from exc
+    return key, row_id
+
+
+def order_by_key(query: Query, sort_column, id_column) -> Query:
+    """Order a query by (sort key, id), the order keyset pages rely on"""
+    if sort_column is id_column:
+        return query.order_by(id_column)
+    return query.order_by(sort_column, id_column)
+
+
+def paginate(
+    query: Query,
+    sort: str,
+    sort_column,
+    id_column,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None
+) -> tuple[list, Optional[str]]:
+    """
+    Fetch one page of a query ordered by (sort key, id)
+
+    With a cursor the page starts right after the cursor row using a
+    row-value comparison, so SQLite seeks instead of scanning and
+    discarding the skipped rows. Without a cursor the classic
+    offset/limit behaviour is kept for existing clients.
+
+    Args:
+        query: Filtered ORM query, of the model or of selected columns
+        sort: Name of the sort key (encoded into the cursor)
+        sort_column: Column to order by; may also be an expression that is
+            not a mapped attribute (e.g. a search rank), in which case it is
+            selected alongside each row
+        id_column: Primary key column used as the tie-breaker
+        skip: Offset used when no cursor is given
+        limit: Maximum number of rows to return
+        cursor: Cursor from a previous page's next_cursor
+
+    Returns:
+        Tuple of (rows, next_cursor); next_cursor is None on the last page
+
+    Raises:
+        InvalidCursor: If the cursor cannot be decoded
+    """
+    by_id = sort_column is id_column
+    # Entity queries return model objects; column queries (with_entities)
+    # return Row tuples, which carry the sort key and id as attributes too
+    descriptions = query.column_descriptions
+    single_entity = len(descriptions) == 1 and descriptions[0]["expr"] is descriptions[0]["entity"]
+    query = order_by_key(query, sort_column, id_column)
+    computed = not isinstance(sort_column, InstrumentedAttribute)
+    if computed:
+        query = query.add_columns(sort_column)
+
+    if cursor:
+        key, last_id = decode_cursor(cursor, sort, sort_column)
+        if by_id:
+            query = query.filter(id_column > last_id)
+        else:
+            query = query.filter(tuple_(sort_column, id_column) > tuple_(key, last_id))
+    elif skip:
+        query = query.offset(skip)
+
+    # Fetch one extra row to learn whether another page exists
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        if computed:
+            key = last[-1]
+            if single_entity:
+                last = last[0]
+        else:
+            key = getattr(last, sort_column.key)
+        next_cursor = encode_cursor(sort, key, getattr(last, id_column.key))
+    if computed:
+        rows = [row[0] for row in rows] if single_entity else [row[:-1] for row in rows]
+    return rows, next_cursor
@@ -0,0 +1,353 @@
+"""
+Monthly partitioned storage (one SQLite table per calendar month)
+A resource registered with MonthlyPartitions stores its rows in
+<table>_YYYY_MM tables behind a UNION ALL view under the original name,
+so code reading the table by name keeps working; core.crud.PartitionedCRUD
+routes writes to the right month and prunes date-range reads to the
+months they cover
+"""
+import re
+import threading
+from datetime import date, datetime
+from typing import Optional
+
+from sqlalchemy import Column, Date, Index, Integer, MetaData, Table, func, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session, aliased
+
+# Every MonthlyPartitions created at import time, so startup can create them
+_registry: list["MonthlyPartitions"] = []
+
+# Last id handed out per partitioned table; ids stay unique across months
+SEQUENCE_TABLE = "partition_sequences"
+
+# Month-range entities kept per partitioned table (date windows repeat)
+_RANGE_CACHE_SIZE = 256
+
+
+def month_of(value) -> date:
+    """First day of the month of a date, datetime or ISO date string"""
+    if isinstance(value, datetime):
+        value = value.date()
+    elif isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    return value.replace(day=1)
+
+
+def next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _month_or_none(value) -> Optional[date]:
+    # A bound that is not a date cannot prune; the query still filters on it
+    try:
+        return month_of(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _connection(db) -> Connection:
+    return db.connection() if isinstance(db, Session) else db
+
+
+class MonthlyPartitions:
+    """
+    Monthly tables holding the rows of one model, split by a date column
+
+    Each partition has the model's columns and indexes. Ids come from
+    SEQUENCE_TABLE, so they are unique across partitions and a row keeps
+    its id when an update moves it to another month. The directory table
+    (<table>_directory) records the month of every id, so a row or a set
+    of ids found through another index (full-text, R*Tree) is looked up
+    in its own partition only. The list of partitions is read from
+    sqlite_master and cached per database file until its schema version
+    changes.
+    """
+
+    def __init__(self, model, column: str):
+        self.model = model
+        self.source: Table = model.__table__
+        self.name = self.source.name
+        self.column = column
+        self._metadata = MetaData()
+        self._lock = threading.Lock()
+        self._pattern = re.compile(rf"^{re.escape(self.name)}_(\d{{4}})_(\d{{2}})$")
+        # Database file -> (schema version, months); read replicas may lag
+        self._known: dict[str, tuple[int, list[date]]] = {}
+        self._ranges: dict[tuple[date, ...], object] = {}
+        self.directory = Table(
+            f"{self.name}_directory",
+            self._metadata,
+            Column("id", Integer, primary_key=True, autoincrement=False),
+            Column("month", Date, nullable=False),
+        )
+        # ensure_columns / ensure_indexes leave the view to create()
+        self.source.info["partitions"] = self
+        _registry.append(self)
+
+    def table_name(self, month: date) -> str:
+        return f"{self.name}_{month:%Y_%m}"
+
+    def table(self, month: date) -> Table:
+        """The Table of one month (whether or not it exists yet)"""
+        name = self.table_name(month)
+        with self._lock:
+            table = self._metadata.tables.get(name)
+            if table is None:
+                table = self.source.to_metadata(self._metadata, name=name)
+                table.info["month"] = month
+                # Index names are global in SQLite, so each month gets its own
+                for index in list(table.indexes):
+                    table.indexes.discard(index)
+                prefix = f"ix_{self.name}_"
+                for index in self.source.indexes:
+                    suffix = index.name[len(prefix):] if index.name.startswith(prefix) else index.name
+                    Index(f"ix_{name}_{suffix}", *(table.c[c.name] for c in index.columns), unique=index.unique)
+        return table
+
+    def months(self, db) -> list[date]:
+        """Months that have a partition, oldest first"""
+        conn = _connection(db)
+        version = conn.execute(text("PRAGMA schema_version")).scalar()
+        database = conn.engine.url.database
+        known = self._known.get(database)
+        if known is None or known[0] != version:
+            names = conn.execute(
+                text("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE :prefix"),
+                {"prefix": f"{self.name}_%"},
+            ).scalars()
+            months = sorted(
+                date(int(match.group(1)), int(match.group(2)), 1)
+                for match in map(self._pattern.match, names) if match
+            )
+            known = self._known[database] = (version, months)
+        return known[1]
+
+    def tables(self, db, lower=None, upper=None) -> list[Table]:
+        """Existing partitions that may hold rows dated between lower and upper (inclusive)"""
+        low, high = _month_or_none(lower), _month_or_none(upper)
+        return [
+            self.table(month) for month in self.months(db)
+            if (low is None or month >= low) and (high is None or month <= high)
+        ]
+
+    def entity(self, db, lower=None, upper=None):
+        """
+        The model to select rows dated between lower and upper from
+
+        Returns the model itself (the view over every month) when the
+        bounds do not exclude any partition, otherwise the model aliased
+        onto a UNION ALL of just the months in range. SQLite runs each
+        month through its own indexes and merges the arms in ORDER BY
+        order, so sorted pages stream without a sort over the union.
+        """
+        months = self.months(db)
+        low, high = _month_or_none(lower), _month_or_none(upper)
+        chosen = tuple(
+            month for month in months if (low is None or month >= low) and (high is None or month <= high)
+        )
+        if not chosen or len(chosen) == len(months):
+            return self.model
+        entity = self._ranges.get(chosen)
+        if entity is None:
+            if len(self._ranges) >= _RANGE_CACHE_SIZE:
+                self._ranges.clear()
+            entity = self._ranges[chosen] = (
+                aliased(self.model, self.table(chosen[0]), adapt_on_names=True) if len(chosen) == 1
+                else self._union(chosen)
+            )
+        return entity
+
+    def route(self, db, ids: list, lower=None, upper=None, materialize: bool = False):
+        """
+        The model restricted to the rows whose ids every select in `ids` returns
+
+        The directory maps those ids to their months, and each month's
+        arm of the union looks up only its own ids by primary key. A
+        search or map query over all months thus costs one pass over its
+        matches instead of one per partition.
+
+        Args:
+            db: Session or connection
+            ids: Selects of candidate ids (e.g. full-text matches)
+            lower, upper: Bounds of the partition column, None when open
+            materialize: The caller joins another table to the result;
+                stops SQLite from flattening the join into every month
+        """
+        directory = self.directory.c
+        conditions = [directory.id.in_(candidates) for candidates in ids]
+        low, high = _month_or_none(lower), _month_or_none(upper)
+        if low is not None:
+            conditions.append(directory.month >= low)
+        if high is not None:
+            conditions.append(directory.month <= high)
+        # One JSON array of ids per month, built by SQLite rather than row by row in Python
+        by_month = dict(_connection(db).execute(
+            select(directory.month, func.json_group_array(directory.id)).where(*conditions).group_by(directory.month)
+        ).all())
+        return self._union(tuple(sorted(by_month)), by_month, materialize)
+
+    def _union(self, months: tuple[date, ...], ids: Optional[dict[date, str]] = None, materialize=False):
+        # Textual SQL: building the same UNION as SQLAlchemy constructs
+        # costs more than most of the queries it is used in. With ids (a
+        # JSON array per month), each arm reads its month's ids from one
+        # parameter.
+        columns = ", ".join(column.name for column in self.source.columns)
+        arms, params = [], {}
+        for month in months:
+            name = self.table_name(month)
+            if ids is None:
+                arms.append(f"SELECT {columns} FROM {name}")
+            else:
+                arms.append(f"SELECT {columns} FROM {name} WHERE id IN (SELECT value FROM json_each(:{name}))")
+                params[name] = ids[month]
+        if not arms:
+            arms.append(self._empty_select())
+        # A subquery with a LIMIT is never flattened into the outer query
+        limit = " LIMIT -1" if materialize else ""
+        statement = text(" UNION ALL ".join(arms) + limit).bindparams(**params).columns(*self.source.columns)
+        return aliased(self.model, statement.subquery(f"{self.name}_range"), adapt_on_names=True)
+
+    def locate(self, db, row_id: int) -> Optional[Table]:
+        """The partition holding a row, or None if the id does not exist"""
+        directory = self.directory.c
+        month = _connection(db).execute(select(directory.month).where(directory.id == row_id)).scalar()
+        return self.table(month) if month is not None else None
+
+    def table_for(self, db, value) -> Table:
+        """The partition for a date, created (and added to the view) if missing"""
+        month = month_of(value)
+        if month not in self.months(db):
+            conn = _connection(db)
+            self._begin(conn)
+            self.table(month).create(conn, checkfirst=True)
+            self._refresh_view(conn)
+        return self.table(month)
+
+    def allocate(self, db, count: int) -> range:
+        """Reserve `count` new ids inside the caller's transaction"""
+        last = _connection(db).execute(
+            text(f"UPDATE {SEQUENCE_TABLE} SET last_id = last_id + :count WHERE table_name = :name "
+                 "RETURNING last_id"),
+            {"count": count, "name": self.name},
+        ).scalar_one()
+        return range(last - count + 1, last + 1)
+
+    def drop(self, db, months: list[date]) -> None:
+        """Drop whole partitions and remove them from the view"""
+        if not months:
+            return
+        conn = _connection(db)
+        self._begin(conn)
+        for month in months:
+            name = self.table_name(month)
+            conn.execute(text(f"DELETE FROM {self.directory.name} WHERE id IN (SELECT id FROM {name})"))
+            conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+        self._refresh_view(conn)
+
+    def _begin(self, conn: Connection) -> None:
+        # pysqlite only opens a transaction before DML, so a no-op write
+        # comes first to keep the DDL that follows in the caller's transaction
+        conn.execute(
+            text(f"UPDATE {SEQUENCE_TABLE} SET last_id = last_id WHERE table_name = :name"), {"name": self.name}
+        )
+
+    def _refresh_view(self, conn: Connection) -> None:
+        # The view always has at least the current month's partition, so a
+        # new (or fully expired) table is still read through its indexes
+        if not self.months(conn):
+            self.table(month_of(date.today())).create(conn, checkfirst=True)
+        columns = ", ".join(column.name for column in self.source.columns)
+        names = [self.table_name(month) for month in self.months(conn)]
+        body = " UNION ALL ".join(f"SELECT {columns} FROM {name}" for name in names)
+        conn.execute(text(f"DROP VIEW IF EXISTS {self.name}"))
+        conn.execute(text(f"CREATE VIEW {self.name} AS {body}"))
+
+    def _empty_select(self) -> str:
+        return "SELECT " + ", ".join(f"NULL AS {column.name}" for column in self.source.columns) + " WHERE 0"
+
+    def create(self, bind: Engine) -> bool:
+        """
+        Move a plain table into monthly partitions, or bring existing
+        partitions in line with the model (new nullable columns, indexes)
+        and fill the directory if it is missing
+
+        Runs in one transaction, so an interrupted conversion leaves the
+        original table untouched.
+
+        Returns:
+            True if a plain table was converted
+        """
+        with bind.begin() as conn:
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {SEQUENCE_TABLE} "
+                "(table_name TEXT PRIMARY KEY, last_id INTEGER NOT NULL)"
+            ))
+        with bind.begin() as conn:
+            conn.execute(
+                text(f"INSERT OR IGNORE INTO {SEQUENCE_TABLE} (table_name, last_id) VALUES (:name, 0)"),
+                {"name": self.name},
+            )
+            kind = conn.execute(
+                text("SELECT type FROM sqlite_master WHERE name = :name"), {"name": self.name}
+            ).scalar()
+            indexed = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE name = :name"), {"name": self.directory.name}
+            ).first()
+            self.directory.create(conn, checkfirst=True)
+            if kind == "table":
+                self._convert(conn)
+            else:
+                for month in self.months(conn):
+                    self._sync(conn, self.table(month))
+                    if not indexed:
+                        self._fill_directory(conn, month)
+            self._refresh_view(conn)
+        return kind == "table"
+
+    def _convert(self, conn: Connection) -> None:
+        existing = {row[1] for row in conn.execute(text(f"PRAGMA table_info({self.name})"))}
+        columns = ", ".join(column.name for column in self.source.columns if column.name in existing)
+        conn.execute(
+            text(f"UPDATE {SEQUENCE_TABLE} SET last_id = max(last_id, "
+                 f"(SELECT coalesce(max(id), 0) FROM {self.name})) WHERE table_name = :name"),
+            {"name": self.name},
+        )
+        months = conn.execute(text(
+            f"SELECT DISTINCT substr({self.column}, 1, 7) FROM {self.name} WHERE {self.column} IS NOT NULL"
+        )).scalars()
+        for month in sorted(month_of(f"{value}-01") for value in months):
+            table = self.table(month)
+            table.create(conn, checkfirst=True)
+            conn.execute(
+                text(f"INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {self.name} "
+                     f"WHERE {self.column} >= :start AND {self.column} < :end"),
+                {"start": month.isoformat(), "end": next_month(month).isoformat()},
+            )
+            self._fill_directory(conn, month)
+        conn.execute(text(f"DROP TABLE {self.name}"))
+
+    def _fill_directory(self, conn: Connection, month: date) -> None:
+        conn.execute(
+            text(f"INSERT OR REPLACE INTO {self.directory.name} (id, month) "
+                 f"SELECT id, :month FROM {self.table_name(month)}"),
+            {"month": month.isoformat()},
+        )
+
+    def _sync(self, conn: Connection, table: Table) -> None:
+        existing = {row[1] for row in conn.execute(text(f"PRAGMA table_info({table.name})"))}
+        for column in table.columns:
+            if column.name not in existing:
+                if not column.nullable or column.server_default is not None:
+                    raise RuntimeError(f"Cannot add non-nullable column {table.name}.{column.name} automatically")
+                conn.execute(text(
+                    f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(conn.dialect)}"
+                ))
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def ensure_partitions(bind: Engine) -> None:
+    """Convert or update every registered partitioned table"""
+    for partitions in _registry:
+        partitions.create(bind)
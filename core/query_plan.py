@@ -0,0 +1,74 @@
+"""
+Startup check that the canonical list queries are served by an index
+Each CRUD module registers the query shapes its list endpoint issues;
+check_query_plans runs EXPLAIN QUERY PLAN on each and fails on a full scan
+"""
+import re
+from typing import Callable
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Query, Session, sessionmaker
+
+from core.spatial import assume_sparse
+
+# Functions returning {name: query} for the list shapes of one resource
+_providers: list[Callable[[Session], dict[str, Query]]] = []
+
+_SCAN_RE = re.compile(r"^SCAN (\w+)")
+
+
+class FullScanError(RuntimeError):
+    """Raised when a canonical list query falls back to a full table scan"""
+
+
+def canonical_queries(provider: Callable[[Session], dict[str, Query]]):
+    """Register a function returning the canonical list queries of a resource"""
+    _providers.append(provider)
+    return provider
+
+
+def explain(db: Session, query: Query) -> list[str]:
+    """Return the EXPLAIN QUERY PLAN detail lines for a query"""
+    bind = db.get_bind()
+    sql = query.statement.compile(dialect=bind.dialect, compile_kwargs={"literal_binds": True})
+    rows = db.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+    return [row[-1] for row in rows]
+
+
+def full_scans(db: Session, query: Query) -> list[str]:
+    """Return the plan lines that scan a whole resource table (or one of its monthly partitions)"""
+    table = query.column_descriptions[0]["entity"].__tablename__
+    partition = re.compile(rf"{re.escape(table)}_\d{{4}}_\d{{2}}$")
+    scans = []
+    for line in explain(db, query):
+        match = _SCAN_RE.match(line)
+        if match and (match.group(1) == table or partition.match(match.group(1))):
+            scans.append(line)
+    return scans
+
+
+def check_query_plans(bind: Engine) -> None:
+    """
+    Verify every registered canonical query uses an index
+
+    Spatial filters are built on their R*Tree path. The key-order path a
+    dense area takes instead reads the table in id order by design, and
+    which one a viewport gets depends on the data, not on the schema.
+
+    Raises:
+        FullScanError: Listing each query whose plan scans its whole table
+    """
+    failures = []
+    db = sessionmaker(bind=bind)()
+    try:
+        for provider in _providers:
+            with assume_sparse():
+                shapes = provider(db)
+            for name, query in shapes.items():
+                for line in full_scans(db, query):
+                    failures.append(f"{name}: {line}")
+    finally:
+        db.close()
+    if failures:
+        raise FullScanError("Canonical list queries fall back to a full scan:\n  " + "\n  ".join(failures))
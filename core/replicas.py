@@ -0,0 +1,200 @@
+"""
+Read replicas of the primary SQLite database
+
+A replica is a copy of the primary file, refreshed every
+REPLICA_REFRESH_SECONDS with the SQLite backup API. The list, export and
+stats endpoints read from a replica (database.get_read_session); writes,
+reads by id and any request with consistency=strong use the primary. A
+replica lags by up to one refresh interval plus the time a copy takes;
+db_replica_lag_seconds exports how far behind each one is, and a replica
+further behind than REPLICA_MAX_LAG_SECONDS is skipped.
+
+A refresh copies the whole file inside one read transaction on the
+primary (which, in WAL mode, does not block writers), and readers of the
+replica keep their snapshot until the copy commits. Its cost grows with
+the database, so pick the interval accordingly.
+
+Once the replicas are refreshed, every table written since the previous
+refresh has its cached responses and counts dropped, so a page cached
+from the old copy is not served after it.
+
+Configure with DATABASE_REPLICAS, a comma-separated list of database URLs.
+"""
+import enum
+import itertools
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from core.cache import response_cache
+from core.metrics import Counter, Gauge, Histogram, registry
+
+REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICAS", "").split(",") if url.strip()]
+REFRESH_SECONDS = float(os.getenv("REPLICA_REFRESH_SECONDS", "10"))
+MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "60"))
+
+# How often a process re-reads a replica's snapshot time
+_LAG_CHECK_SECONDS = 1.0
+
+logger = logging.getLogger("city_infrastructure.replicas")
+
+
+class Consistency(str, enum.Enum):
+    """Whether a read may be served from a replica"""
+    EVENTUAL = "eventual"
+    STRONG = "strong"
+
+
+# Every Replica created, for the lag gauge
+_replicas: list["Replica"] = []
+
+
+def _lags() -> dict[tuple, float]:
+    lags = {}
+    for replica in _replicas:
+        lag = replica.lag()
+        if lag is not None:
+            lags[(replica.name,)] = lag
+    return lags
+
+
+REPLICA_LAG = registry.register(Gauge(
+    "db_replica_lag_seconds", "Age of the primary snapshot each read replica holds", ("replica",), _lags,
+))
+REPLICA_REFRESH_SECONDS = registry.register(Histogram(
+    "db_replica_refresh_seconds", "Time to copy the primary into a read replica", ("replica",),
+))
+READ_SESSIONS = registry.register(Counter(
+    "db_read_sessions_total", "Sessions opened for list, export and stats reads by database", ("database",),
+))
+
+
+class Replica:
+    """One replica file and the engines reading it"""
+
+    def __init__(self, url: str, engine: Engine, async_engine: AsyncEngine):
+        self.url = url
+        self.path = make_url(url).database
+        self.name = os.path.basename(self.path)
+        self.engine = engine
+        self.session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        self.async_session_factory = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+        self._taken_at: Optional[float] = None
+        self._checked_at = float("-inf")
+        _replicas.append(self)
+
+    def refresh(self, primary: Engine) -> None:
+        """Copy the primary database into the replica file"""
+        started = time.perf_counter()
+        taken_at = time.time()
+        source = primary.raw_connection()
+        try:
+            target = sqlite3.connect(self.path)
+            try:
+                source.driver_connection.backup(target)
+                target.execute("CREATE TABLE IF NOT EXISTS replica_snapshot (id INTEGER PRIMARY KEY, taken_at REAL)")
+                target.execute("INSERT OR REPLACE INTO replica_snapshot (id, taken_at) VALUES (1, ?)", (taken_at,))
+                target.commit()
+            finally:
+                target.close()
+        finally:
+            source.close()
+        self._taken_at, self._checked_at = taken_at, time.monotonic()
+        REPLICA_REFRESH_SECONDS.observe(time.perf_counter() - started, self.name)
+
+    def snapshot_time(self) -> Optional[float]:
+        """When the replica's data was read from the primary (None before its first refresh)"""
+        try:
+            with self.engine.connect() as conn:
+                return conn.execute(text("SELECT taken_at FROM replica_snapshot")).scalar()
+        except OperationalError:
+            return None
+
+    def lag(self) -> Optional[float]:
+        """Seconds since the replica's snapshot, re-read at most once a second"""
+        now = time.monotonic()
+        if now - self._checked_at >= _LAG_CHECK_SECONDS:
+            self._taken_at, self._checked_at = self.snapshot_time(), now
+        return None if self._taken_at is None else max(0.0, time.time() - self._taken_at)
+
+
+def invalidate_tables(tables: set[str]) -> None:
+    """Drop this process's cached counts and responses for tables"""
+    from core.crud import crud_for
+
+    for table in tables:
+        crud = crud_for(table)
+        if crud is not None:
+            crud.invalidate()
+        else:
+            response_cache.invalidate(table)
+
+
+class ReplicaSet:
+    """The replicas reads are spread over, and their refresh loop"""
+
+    def __init__(self, replicas: list[Replica]):
+        self.replicas = list(replicas)
+        self._turn = itertools.count()
+        self._snapshot_versions: dict[str, int] = {}
+        self._stop: Optional[threading.Event] = None
+
+    def pick(self, consistency: Consistency) -> Optional[Replica]:
+        """
+        The replica to read from next, round robin
+
+        Returns:
+            None for consistency=strong, or when no replica has been
+            refreshed within MAX_LAG_SECONDS; read the primary then
+        """
+        if consistency == Consistency.EVENTUAL and self.replicas:
+            start = next(self._turn)
+            for offset in range(len(self.replicas)):
+                replica = self.replicas[(start + offset) % len(self.replicas)]
+                lag = replica.lag()
+                if lag is not None and lag <= MAX_LAG_SECONDS:
+                    READ_SESSIONS.inc(replica.name)
+                    return replica
+        READ_SESSIONS.inc("primary")
+        return None
+
+    def refresh(self, primary: Engine, on_refresh: Callable[[set[str]], None] = invalidate_tables) -> None:
+        """Refresh every replica, then drop what was cached from the previous copies"""
+        versions = response_cache.versions()
+        for replica in self.replicas:
+            replica.refresh(primary)
+        changed = {table for table, version in versions.items() if self._snapshot_versions.get(table) != version}
+        self._snapshot_versions = versions
+        if changed:
+            on_refresh(changed)
+
+    def start(self, primary: Engine, on_refresh: Callable[[set[str]], None] = invalidate_tables) -> None:
+        """Refresh the replicas now and every REFRESH_SECONDS, in a background thread"""
+        if not self.replicas or self._stop is not None:
+            return
+        stop = self._stop = threading.Event()
+
+        def loop():
+            while True:
+                try:
+                    self.refresh(primary, on_refresh)
+                except Exception:
+                    logger.exception("Refreshing the read replicas failed")
+                if stop.wait(REFRESH_SECONDS):
+                    return
+
+        threading.Thread(target=loop, name="replica-refresh", daemon=True).start()
+
+    def stop(self) -> None:
+        if self._stop is not None:
+            self._stop.set()
+            self._stop = None
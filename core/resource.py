@@ -0,0 +1,602 @@
+"""
+Resource router factory
+Builds the list, export, bulk upload and item endpoints of a resource from
+its CRUDBase and schemas, so every resource serves the same optimized
+endpoints from one implementation
+"""
+import inspect
+import json
+from functools import partial
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel as Schema, Field, ValidationError, create_model
+from sqlalchemy.orm import Session, sessionmaker
+
+from database import get_read_session, get_read_sessionmaker, get_session, run_db
+from core.cache import cached_route
+from core.counting import TotalMode
+from core.crud import CRUDBase, Filter
+from core.export import EXPORT_MEDIA_TYPES, stream_export
+from core.pagination import InvalidCursor
+from core.search import FullTextIndex, SearchMode
+from core import serialize
+from core.serialize import PAGE_MEDIA_TYPES, PageEncoder
+from schemas.base import BulkDeleteResponse, BulkResponse, BulkRowError, BulkUpdateResponse
+
+# Upper bound on rows accepted by a single bulk upload
+MAX_BULK_ROWS = 50_000
+
+
+def filter_dependency(filters: list[Filter]):
+    """
+    Build a dependency that reads the declared filters from the query string
+
+    Returns:
+        Callable whose signature lists one optional query parameter per
+        filter; it returns the values as a dict
+    """
+    def read_filters(**values) -> dict:
+        return values
+
+    read_filters.__signature__ = inspect.Signature([
+        inspect.Parameter(
+            spec.name,
+            inspect.Parameter.KEYWORD_ONLY,
+            default=Query(None, description=spec.description),
+            annotation=Optional[spec.annotation],
+        )
+        for spec in filters
+    ])
+    return read_filters
+
+
+def _parse_floats(name: str, raw: str, count: int) -> tuple[float, ...]:
+    try:
+        values = tuple(float(part) for part in raw.split(","))
+    except ValueError:
+        values = ()
+    if len(values) != count:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{name} must be {count} comma-separated numbers",
+        )
+    return values
+
+
+def spatial_dependency(enabled: bool):
+    """
+    Build a dependency that reads the bbox / near filters from the query string
+
+    Returns:
+        Callable returning {"bbox": ..., "near": ...} as parsed tuples, or
+        one without parameters returning {} when the resource has no
+        spatial index
+    """
+    if not enabled:
+        return lambda: {}
+
+    def read_spatial(
+        bbox: Optional[str] = Query(
+            None, description="Bounding box min_lat,min_lon,max_lat,max_lon (WGS84 degrees)"
+        ),
+        near: Optional[str] = Query(None, description="Centre point lat,lon; requires radius_m"),
+        radius_m: Optional[float] = Query(None, gt=0, le=100_000, description="Radius around near, in metres"),
+    ) -> dict:
+        values = {}
+        if bbox:
+            min_lat, min_lon, max_lat, max_lon = _parse_floats("bbox", bbox, 4)
+            if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lon <= max_lon <= 180):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="bbox must be min_lat,min_lon,max_lat,max_lon with min <= max",
+                )
+            values["bbox"] = (min_lat, min_lon, max_lat, max_lon)
+        if (near is None) != (radius_m is None):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="near and radius_m must be given together"
+            )
+        if near:
+            lat, lon = _parse_floats("near", near, 2)
+            if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="near is out of range")
+            values["near"] = (lat, lon, radius_m)
+        return values
+
+    return read_spatial
+
+
+def search_in_dependency(index: Optional[FullTextIndex]):
+    """
+    Build a dependency that reads `search_in`, the indexed columns a search matches
+
+    Returns:
+        Callable returning {"search_in": [...]} when the parameter is given,
+        else {}; one without parameters returning {} when the resource has
+        no search index
+    """
+    if index is None:
+        return lambda: {}
+
+    def read_search_in(
+        search_in: Optional[str] = Query(
+            None,
+            description=f"Comma-separated columns the search matches: any of {', '.join(index.columns)} "
+                        f"(default: {', '.join(index.searched)})",
+        ),
+    ) -> dict:
+        if not search_in:
+            return {}
+        requested = {name.strip() for name in search_in.split(",") if name.strip()}
+        unknown = requested.difference(index.columns)
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown search columns: {', '.join(sorted(unknown))}; "
+                       f"expected any of {', '.join(index.columns)}",
+            )
+        return {"search_in": tuple(name for name in index.columns if name in requested)}
+
+    return read_search_in
+
+
+def parse_bulk(schema: type[Schema], body: bytes, content_type: str) -> tuple[list[dict], list[BulkRowError]]:
+    """
+    Parse and validate a bulk upload (CPU-bound, run it in the threadpool)
+
+    Args:
+        schema: Create schema each row is validated against
+        body: JSON array, or NDJSON when content_type says so
+        content_type: Request Content-Type
+
+    Returns:
+        Tuple of (valid rows as dicts, errors of the invalid rows)
+    """
+    if "ndjson" in content_type:
+        items = [line for line in body.splitlines() if line.strip()]
+        validate = schema.model_validate_json
+    else:
+        try:
+            items = json.loads(body)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Body is not valid JSON")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Body must be a JSON array")
+        validate = schema.model_validate
+
+    if len(items) > MAX_BULK_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {MAX_BULK_ROWS} rows per upload",
+        )
+
+    rows, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            rows.append(validate(item).model_dump())
+        except ValidationError as exc:
+            errors.append(BulkRowError(index=index, errors=exc.errors(include_url=False, include_context=False)))
+    return rows, errors
+
+
+def parse_fields(raw: Optional[str], allowed: list[str]) -> Optional[list[str]]:
+    """
+    Parse a `fields=` projection
+
+    Args:
+        raw: Comma-separated field names, or None for every field
+        allowed: Fields of the response schema, in output order
+
+    Returns:
+        Requested fields in schema order, always including id, or None
+
+    Raises:
+        HTTPException: 400 if a name is not a field of the resource
+    """
+    if not raw:
+        return None
+    requested = {name.strip() for name in raw.split(",") if name.strip()}
+    unknown = requested.difference(allowed)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}; expected any of {', '.join(allowed)}",
+        )
+    return [name for name in allowed if name == "id" or name in requested]
+
+
+FIELDS_DESCRIPTION = "Comma-separated fields to return (id is always included); default all"
+
+
+def require_format(fmt: str) -> None:
+    """Reject msgpack when the optional msgpack package is not installed"""
+    if fmt == "msgpack" and serialize.msgpack is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="format=msgpack is not available on this server (msgpack is not installed)",
+        )
+
+
+def bulk_update_schema(label: str, update_schema: type[Schema], filters: list[Filter]) -> type[Schema]:
+    """
+    Build the request body of PATCH /bulk
+
+    Either `items`, a list of {id, changes} pairs, or `filter` (values for
+    the declared filters) together with one `changes` set.
+    """
+    FilterValues = create_model(
+        f"{label}BulkFilter",
+        **{
+            spec.name: (Optional[spec.annotation], Field(None, description=spec.description))
+            for spec in filters
+        },
+    )
+    ItemChanges = create_model(f"{label}ItemChanges", id=(int, ...), changes=(update_schema, ...))
+    return create_model(
+        f"{label}BulkUpdate",
+        items=(Optional[list[ItemChanges]], Field(None, max_length=MAX_BULK_ROWS)),
+        filter=(Optional[FilterValues], None),
+        changes=(Optional[update_schema], None),
+    )
+
+
+def require_filter(filters: dict) -> dict:
+    """Refuse a set-based write without any filter, which would hit every row"""
+    values = {name: value for name, value in filters.items() if value is not None}
+    if not values:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="At least one filter is required",
+        )
+    return values
+
+
+class ResourceRouter(APIRouter):
+    """
+    APIRouter with the standard endpoints of one resource
+
+    The collection routes (list, export, create and optionally bulk upload,
+    bulk update and delete by filter) are registered on construction. Add
+    any resource-specific collection routes next, then call
+    add_item_routes() last so `/{item_id}` does not shadow them.
+
+    GET responses are cached per query and revalidated with ETags (see
+    core/cache.py). Routes are async and reach the database through run_db,
+    so the same code serves the sync and the aiosqlite engines. The list
+    and export routes read a replica when one is configured, unless the
+    request passes consistency=strong (see core/replicas.py).
+    """
+
+    def __init__(
+        self,
+        crud: CRUDBase,
+        *,
+        create_schema: type[Schema],
+        update_schema: type[Schema],
+        response_schema: type[Schema],
+        list_schema: type[Schema],
+        list_field: str,
+        label: str,
+        export_name: str,
+        bulk: bool = False,
+        bulk_edit: bool = False,
+        fast_json: bool = True,
+        **kwargs
+    ):
+        """
+        Args:
+            crud: CRUD operations of the resource
+            create_schema: Request body of create and bulk upload
+            update_schema: Request body of update (all fields optional)
+            response_schema: One row
+            list_schema: List page with total, next_cursor and list_field
+            list_field: Name of the rows field on list_schema
+            label: Resource name used in messages, e.g. "Bridge"
+            export_name: File name stem of exports
+            bulk: Whether to add POST /bulk
+            bulk_edit: Whether to add PATCH /bulk and DELETE / (by filter)
+            fast_json: Serve list pages from column tuples encoded with
+                orjson instead of validating every row through Pydantic
+            **kwargs: Passed to APIRouter
+        """
+        super().__init__(route_class=cached_route(crud.table_name), **kwargs)
+        self.crud = crud
+        self.create_schema = create_schema
+        self.update_schema = update_schema
+        self.response_schema = response_schema
+        self.list_schema = list_schema
+        self.list_field = list_field
+        self.label = label
+        self.export_name = export_name
+        self.read_filters = filter_dependency(crud.filters)
+        self.read_spatial = spatial_dependency(crud.spatial_index is not None)
+        self.read_search_in = search_in_dependency(crud.search_index)
+        self.fast_json = fast_json
+        self.encoder = PageEncoder(list_schema, response_schema, list_field)
+
+        self._add_list_route()
+        self._add_export_route()
+        self._add_create_route()
+        if bulk:
+            self._add_bulk_route()
+        if bulk_edit:
+            self._add_bulk_edit_routes()
+
+    def not_found(self, item_id: int) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"{self.label} with id {item_id} not found"
+        )
+
+    def _add_list_route(self):
+        crud = self.crud
+        sort_keys = list(crud.sort_columns) + (["relevance"] if crud.search_index is not None else [])
+        SortKey = Literal[tuple(sort_keys)]
+        encoder = self.encoder
+        fast_json = self.fast_json
+
+        @self.get("/", response_model=self.list_schema, summary=f"List {self.export_name.replace('_', ' ')}")
+        async def list_rows(
+            skip: int = Query(0, ge=0, description="Number of records to skip"),
+            limit: int = Query(100, ge=1, le=500, description="Maximum records to return"),
+            search: Optional[str] = Query(None, description="Search term (word prefixes, case-insensitive)"),
+            search_mode: SearchMode = Query(SearchMode.FTS, description="fts (indexed prefix match) or substring"),
+            sort: SortKey = Query("id", description="Sort key (ties broken by id)"),
+            cursor: Optional[str] = Query(None, description="Cursor from a previous page's next_cursor"),
+            include_total: TotalMode = Query(
+                TotalMode.EXACT,
+                description="Count total: false, exact or estimate (cached; with only bbox/near, a dense area "
+                            "is approximated from the spatial index and total_is_estimate is set)",
+            ),
+            fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+            format: Literal["json", "columnar", "msgpack"] = Query(
+                "json", description="json, columnar (one array per field) or msgpack"
+            ),
+            filters: dict = Depends(self.read_filters),
+            spatial: dict = Depends(self.read_spatial),
+            search_in: dict = Depends(self.read_search_in),
+            db: Session = Depends(get_read_session),
+        ):
+            """
+            List rows with optional filtering
+
+            Use `cursor` (the previous page's `next_cursor`) for deep pages;
+            `skip` is kept for existing clients but gets slower the deeper
+            it goes. Pollers that do not need `total` should pass
+            `include_total=false` or `include_total=estimate` to avoid a
+            COUNT(*) per request; a map-area estimate may be approximate
+            and comes with `total_is_estimate=true`. `search` matches word prefixes through the
+            full-text index, and a term without any words matches nothing;
+            pass `search_mode=substring` for the old `%term%` behaviour.
+            `search_in` widens or narrows the indexed columns it matches
+            (e.g. `search_in=notes`).
+            `fields` selects only the named columns, so less is read and
+            sent. High-volume clients can ask for `format=columnar` or
+            `format=msgpack` for a more compact page. Resources with
+            locations also take `bbox` and `near` plus `radius_m`, answered
+            from a spatial index.
+            """
+            require_format(format)
+            names = parse_fields(fields, encoder.names)
+            columns = encoder.columns(crud.model, names) if fast_json or names or format != "json" else None
+            if names and sort in crud.sort_columns and sort not in names:
+                # The sort key is needed for the cursor but not returned
+                columns.append(crud.sort_columns[sort])
+            if cursor and skip:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="skip cannot be combined with cursor"
+                )
+            if sort == "relevance" and not (search and search_mode == SearchMode.FTS):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="sort=relevance requires a search term with search_mode=fts"
+                )
+            try:
+                rows, total, next_cursor = await run_db(
+                    db,
+                    crud.get_page,
+                    skip=skip,
+                    limit=limit,
+                    sort=sort,
+                    cursor=cursor,
+                    include_total=include_total,
+                    search=search,
+                    search_mode=search_mode,
+                    columns=columns,
+                    **filters,
+                    **spatial,
+                    **search_in
+                )
+            except InvalidCursor as exc:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+            estimated = crud.estimates_total(include_total, search, **filters, **spatial)
+            if columns:
+                return Response(
+                    encoder.encode(rows, total, next_cursor, names, format, total_is_estimate=estimated),
+                    media_type=PAGE_MEDIA_TYPES[format],
+                )
+            return self.list_schema(
+                total=total, total_is_estimate=estimated, next_cursor=next_cursor, **{self.list_field: rows}
+            )
+
+    def _add_export_route(self):
+        crud = self.crud
+        export_name = self.export_name
+
+        @self.get("/export", response_class=StreamingResponse, summary=f"Export {export_name.replace('_', ' ')}")
+        def export_rows(
+            format: Literal["ndjson", "csv", "columnar", "msgpack"] = Query(
+                "ndjson", description="ndjson, csv, columnar (NDJSON of per-batch column arrays) or msgpack"
+            ),
+            search: Optional[str] = Query(None, description="Search term (word prefixes, case-insensitive)"),
+            search_mode: SearchMode = Query(SearchMode.FTS, description="fts (indexed prefix match) or substring"),
+            fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+            filters: dict = Depends(self.read_filters),
+            spatial: dict = Depends(self.read_spatial),
+            search_in: dict = Depends(self.read_search_in),
+            session_factory: sessionmaker = Depends(get_read_sessionmaker),
+        ):
+            """
+            Stream every matching row as NDJSON, CSV, columnar NDJSON or MessagePack
+
+            Takes the same filters as the list endpoint but has no page size
+            limit. Rows are written in id order and read through a
+            server-side cursor, so memory use stays flat.
+            """
+            require_format(format)
+            names = parse_fields(fields, self.encoder.names)
+            columns = self.encoder.columns(crud.model, names) if names else crud.export_columns
+            body = stream_export(
+                session_factory,
+                partial(
+                    crud.export_query, columns=columns, search=search, search_mode=search_mode,
+                    **filters, **spatial, **search_in
+                ),
+                columns,
+                format,
+            )
+            return StreamingResponse(
+                body,
+                media_type=EXPORT_MEDIA_TYPES[format],
+                headers={"Content-Disposition": f'attachment; filename="{export_name}.{format}"'}
+            )
+
+    def _add_create_route(self):
+        crud = self.crud
+        CreateSchema = self.create_schema
+
+        @self.post(
+            "/",
+            response_model=self.response_schema,
+            status_code=status.HTTP_201_CREATED,
+            summary=f"Create {self.label.lower()}",
+        )
+        async def create_row(data: CreateSchema, db: Session = Depends(get_session)):
+            """Create a new row"""
+            return await run_db(db, crud.create, writes=True, data=data)
+
+    def _add_bulk_route(self):
+        crud = self.crud
+        CreateSchema = self.create_schema
+
+        @self.post(
+            "/bulk",
+            response_model=BulkResponse,
+            status_code=status.HTTP_201_CREATED,
+            summary=f"Bulk create {self.export_name.replace('_', ' ')}",
+            openapi_extra={
+                "requestBody": {
+                    "required": True,
+                    "content": {
+                        "application/json": {
+                            "schema": {
+                                "type": "array",
+                                "items": {"$ref": f"#/components/schemas/{CreateSchema.__name__}"},
+                            }
+                        },
+                        "application/x-ndjson": {"schema": {"type": "string", "description": "One row per line"}},
+                    },
+                }
+            },
+        )
+        async def bulk_create_rows(request: Request, db: Session = Depends(get_session)):
+            """
+            Create many rows in one request
+
+            Send a JSON array, or NDJSON (one row per line) with
+            `Content-Type: application/x-ndjson`. Valid rows are inserted in
+            chunked transactions; invalid rows are skipped and reported by index.
+            """
+            body = await request.body()
+            rows, errors = await run_in_threadpool(
+                parse_bulk, CreateSchema, body, request.headers.get("content-type", "")
+            )
+            ids = await run_db(db, crud.bulk_create, writes=True, rows=rows)
+            return BulkResponse(created=len(ids), ids=ids, errors=errors)
+
+    def _add_bulk_edit_routes(self):
+        crud = self.crud
+        BulkUpdate = bulk_update_schema(self.label, self.update_schema, crud.filters)
+        plural = self.export_name.replace("_", " ")
+
+        @self.patch("/bulk", response_model=BulkUpdateResponse, summary=f"Bulk update {plural}")
+        async def bulk_update_rows(data: BulkUpdate, db: Session = Depends(get_session)):
+            """
+            Update many rows in one transaction
+
+            Send `items`, a list of `{"id": ..., "changes": {...}}`, or a
+            `filter` (the list endpoint's filters) with one `changes` set.
+            Each distinct change set is a single set-based UPDATE; ids that
+            do not exist are left out of the result.
+            """
+            if (data.items is None) == (data.filter is None) or (data.items is not None and data.changes is not None):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Send either items or filter with changes",
+                )
+            if data.items is not None:
+                items = [(item.id, item.changes.model_dump(exclude_unset=True)) for item in data.items]
+                items = [(row_id, changes) for row_id, changes in items if changes]
+                ids = await run_db(db, crud.bulk_update, writes=True, items=items) if items else []
+                return BulkUpdateResponse(updated=len(ids), ids=ids)
+            filters = require_filter(data.filter.model_dump())
+            changes = data.changes.model_dump(exclude_unset=True) if data.changes else {}
+            if not changes:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="changes must set a field")
+            ids = await run_db(db, crud.update_where, writes=True, changes=changes, **filters)
+            return BulkUpdateResponse(updated=len(ids), ids=ids)
+
+        @self.delete("/", response_model=BulkDeleteResponse, summary=f"Delete {plural} by filter")
+        async def delete_rows(filters: dict = Depends(self.read_filters), db: Session = Depends(get_session)):
+            """
+            Delete every row matching the filters with one set-based DELETE
+
+            At least one filter is required.
+            """
+            ids = await run_db(db, crud.delete_where, writes=True, **require_filter(filters))
+            return BulkDeleteResponse(deleted=len(ids), ids=ids)
+
+    def add_item_routes(self) -> "ResourceRouter":
+        """Register GET, PUT and DELETE /{item_id}; call after every collection route"""
+        crud = self.crud
+        UpdateSchema = self.update_schema
+        label = self.label.lower()
+
+        encoder = self.encoder
+
+        @self.get("/{item_id}", response_model=self.response_schema, summary=f"Get {label}")
+        async def get_row(
+            item_id: int,
+            fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+            db: Session = Depends(get_session),
+        ):
+            """Get one row by ID; `fields` selects only the named columns"""
+            names = parse_fields(fields, encoder.names)
+            columns = encoder.columns(crud.model, names) if names else None
+            row = await run_db(db, crud.get, row_id=item_id, columns=columns)
+            if not row:
+                raise self.not_found(item_id)
+            if columns:
+                return Response(encoder.encode_item(row, names), media_type="application/json")
+            return row
+
+        @self.put("/{item_id}", response_model=self.response_schema, summary=f"Update {label}")
+        async def update_row(item_id: int, data: UpdateSchema, db: Session = Depends(get_session)):
+            """Update a row; only the provided fields change"""
+            row = await run_db(db, crud.update, writes=True, row_id=item_id, data=data)
+            if not row:
+                raise self.not_found(item_id)
+            return row
+
+        @self.delete("/{item_id}", status_code=status.HTTP_204_NO_CONTENT, summary=f"Delete {label}")
+        async def delete_row(item_id: int, db: Session = Depends(get_session)):
+            """Delete a row; returns 204 No Content on success"""
+            deleted = await run_db(db, crud.delete, writes=True, row_id=item_id)
+            if not deleted:
+                raise self.not_found(item_id)
+            return None
+
+        return self
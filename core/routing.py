@@ -0,0 +1,82 @@
+"""
+Declarative router registry with lazy imports
+
+routers/__init__.py lists every resource router as a RouterSpec (its
+package, prefix and tag). Nothing is imported when the app is built: a
+placeholder route per prefix imports its package on the first request
+under that prefix, includes the router and routes the request again.
+Building the OpenAPI schema (/docs, /openapi.json) loads them all.
+"""
+import importlib
+import threading
+from dataclasses import dataclass
+
+from fastapi import APIRouter, FastAPI
+from starlette.routing import BaseRoute, Match, NoMatchFound
+from starlette.types import Receive, Scope, Send
+
+
+@dataclass(frozen=True)
+class RouterSpec:
+    """One resource router: the package exporting `router` and where it is mounted"""
+    module: str
+    prefix: str
+    tag: str
+
+    def load(self) -> APIRouter:
+        return importlib.import_module(self.module).router
+
+
+class LazyRouters:
+    """Include a list of RouterSpecs in an app, each on first use"""
+
+    def __init__(self, app: FastAPI, specs: list[RouterSpec]):
+        self.app = app
+        self.specs = list(specs)
+        self._pending = {spec.prefix: _PendingRouter(self, spec) for spec in self.specs}
+        self._lock = threading.Lock()
+        app.router.routes.extend(self._pending.values())
+
+        build_openapi = app.openapi
+
+        def openapi() -> dict:
+            self.load_all()
+            return build_openapi()
+
+        app.openapi = openapi
+
+    def load(self, spec: RouterSpec) -> None:
+        """Import a router's package and include the router (once)"""
+        with self._lock:
+            pending = self._pending.get(spec.prefix)
+            if pending is None:
+                return
+            self.app.include_router(spec.load(), prefix=spec.prefix, tags=[spec.tag])
+            self.app.router.routes.remove(pending)
+            del self._pending[spec.prefix]
+
+    def load_all(self) -> None:
+        for spec in self.specs:
+            self.load(spec)
+
+
+class _PendingRouter(BaseRoute):
+    """Matches every path under a router's prefix until that router is loaded"""
+
+    def __init__(self, routers: LazyRouters, spec: RouterSpec):
+        self.routers = routers
+        self.spec = spec
+
+    def matches(self, scope: Scope) -> tuple[Match, Scope]:
+        if scope["type"] in ("http", "websocket"):
+            path = scope["path"].removeprefix(scope.get("root_path", ""))
+            if path == self.spec.prefix or path.startswith(self.spec.prefix + "/"):
+                return Match.FULL, {}
+        return Match.NONE, {}
+
+    def url_path_for(self, name: str, /, **path_params):
+        raise NoMatchFound(name, path_params)
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.routers.load(self.spec)
+        await self.routers.app.router(scope, receive, send)
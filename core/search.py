@@ -0,0 +1,206 @@
+"""
+Full-text search shadow tables (SQLite FTS5)
+Each resource registers a FullTextIndex over its searchable text columns;
+the CRUD layer keeps it in sync and the list queries join against it
+"""
+import enum
+import re
+from typing import Optional
+
+from sqlalchemy import Select, bindparam, column, false, literal_column, select, table, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Query, Session
+
+# Every FullTextIndex created at import time, so startup can create them
+_registry: list["FullTextIndex"] = []
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Ids bound per statement by the set-based sync methods, well under SQLite's variable limit
+_CHUNK = 10_000
+
+
+def _chunks(ids: list[int]):
+    for start in range(0, len(ids), _CHUNK):
+        yield ids[start:start + _CHUNK]
+
+
+class SearchMode(str, enum.Enum):
+    """How the `search` list parameter is matched"""
+    FTS = "fts"
+    SUBSTRING = "substring"
+
+
+class FullTextIndex:
+    """
+    FTS5 table mirroring the text columns of one resource table
+
+    The FTS rowid is the source row's id, so results join straight back
+    to the resource table. A search matches the `searched` columns
+    (default: all of them) unless the caller names other indexed columns.
+    """
+
+    def __init__(self, source_table: str, columns: list[str], searched: Optional[list[str]] = None):
+        self.source_table = source_table
+        self.columns = list(columns)
+        self.searched = list(searched or columns)
+        self.name = f"{source_table}_fts"
+        self.table = table(self.name, column("rowid"), column("rank"), *(column(c) for c in self.columns))
+        _registry.append(self)
+
+    @property
+    def rank(self):
+        """BM25 rank of a match (lower is more relevant)"""
+        return self.table.c.rank
+
+    def create(self, bind: Engine) -> bool:
+        """
+        Create the FTS table if it is missing and backfill it from the source table
+
+        An existing table indexing other columns is dropped and rebuilt.
+
+        Returns:
+            True if the table was created
+        """
+        with bind.begin() as conn:
+            indexed = [row[1] for row in conn.execute(text(f"PRAGMA table_info({self.name})"))]
+            if indexed == self.columns:
+                return False
+            if indexed:
+                conn.execute(text(f"DROP TABLE {self.name}"))
+            cols = ", ".join(self.columns)
+            conn.execute(text(f"CREATE VIRTUAL TABLE {self.name} USING fts5({cols}, tokenize='unicode61')"))
+            conn.execute(text(
+                f"INSERT INTO {self.name} (rowid, {cols}) SELECT id, {cols} FROM {self.source_table}"
+            ))
+        return True
+
+    def upsert(self, db: Session, row_id: int, values: dict) -> None:
+        """Index (or re-index) a single row inside the caller's transaction"""
+        self.remove(db, row_id)
+        cols = ", ".join(self.columns)
+        params = ", ".join(f":{c}" for c in self.columns)
+        db.execute(
+            text(f"INSERT INTO {self.name} (rowid, {cols}) VALUES (:rowid, {params})"),
+            {"rowid": row_id, **{c: values.get(c) for c in self.columns}},
+        )
+
+    def add_many(self, db: Session, rows: list[tuple[int, dict]]) -> None:
+        """Index freshly inserted rows with a single executemany"""
+        if not rows:
+            return
+        cols = ", ".join(self.columns)
+        params = ", ".join(f":{c}" for c in self.columns)
+        db.execute(
+            text(f"INSERT INTO {self.name} (rowid, {cols}) VALUES (:rowid, {params})"),
+            [{"rowid": row_id, **{c: values.get(c) for c in self.columns}} for row_id, values in rows],
+        )
+
+    def remove(self, db: Session, row_id: int) -> None:
+        """Drop a row from the index inside the caller's transaction"""
+        db.execute(text(f"DELETE FROM {self.name} WHERE rowid = :rowid"), {"rowid": row_id})
+
+    def refresh_many(self, db: Session, ids: list[int]) -> None:
+        """Re-index rows changed by a set-based UPDATE, reading them back from the source table"""
+        cols = ", ".join(self.columns)
+        for chunk in _chunks(ids):
+            self.remove_many(db, chunk)
+            db.execute(
+                text(f"INSERT INTO {self.name} (rowid, {cols}) SELECT id, {cols} FROM {self.source_table} "
+                     "WHERE id IN :ids").bindparams(bindparam("ids", expanding=True)),
+                {"ids": chunk},
+            )
+
+    def remove_many(self, db: Session, ids: list[int]) -> None:
+        """Drop rows removed by a set-based DELETE from the index"""
+        for chunk in _chunks(ids):
+            db.execute(
+                text(f"DELETE FROM {self.name} WHERE rowid IN :ids").bindparams(bindparam("ids", expanding=True)),
+                {"ids": chunk},
+            )
+
+    def touches(self, fields) -> bool:
+        """Whether an update to these fields requires re-indexing"""
+        return any(field in self.columns for field in fields)
+
+    def rebuild(self, db: Session) -> None:
+        """Recreate the index contents from the source table"""
+        cols = ", ".join(self.columns)
+        db.execute(text(f"DELETE FROM {self.name}"))
+        db.execute(text(
+            f"INSERT INTO {self.name} (rowid, {cols}) SELECT id, {cols} FROM {self.source_table}"
+        ))
+
+    def expression(self, term: str, columns: Optional[list[str]] = None) -> Optional[str]:
+        """
+        FTS5 query for a search term over some indexed columns
+
+        Args:
+            term: Free-text search term
+            columns: Indexed columns to match, or None for the searched ones
+
+        Returns:
+            The match_expression, behind a column filter unless every
+            indexed column is searched; None if the term has no tokens
+        """
+        expression = match_expression(term)
+        columns = list(columns or self.searched)
+        if expression is None or columns == self.columns:
+            return expression
+        return f"{{{' '.join(columns)}}} : ({expression})"
+
+    def filter(self, query: Query, id_column, term: str, columns: Optional[list[str]] = None) -> Query:
+        """
+        Restrict a query to rows matching a search term
+
+        Args:
+            query: Query over the resource table
+            id_column: Primary key column of the resource
+            term: Free-text search term
+            columns: Indexed columns to match, or None for the searched ones
+
+        Returns:
+            Joined and filtered query; one that matches nothing if the term
+            has no searchable tokens (e.g. "%%"), rather than every row
+        """
+        expression = self.expression(term, columns)
+        if expression is None:
+            return query.filter(false())
+        return query.join(self.table, self.table.c.rowid == id_column).filter(self._match(expression))
+
+    def matches(self, term: str, columns: Optional[list[str]] = None) -> Optional[Select]:
+        """Select of the ids matching a search term, or None if it has no searchable tokens"""
+        expression = self.expression(term, columns)
+        if expression is None:
+            return None
+        return select(self.table.c.rowid).where(self._match(expression))
+
+    def ids(self, db: Session, term: str, columns: Optional[list[str]] = None) -> Optional[Query]:
+        """Query of the rowids matching a search term, or None if it has no searchable tokens"""
+        expression = self.expression(term, columns)
+        if expression is None:
+            return None
+        return db.query(self.table.c.rowid).filter(self._match(expression))
+
+    def _match(self, expression: str):
+        return literal_column(self.name).op("MATCH")(expression)
+
+
+def match_expression(term: str) -> Optional[str]:
+    """
+    Turn a user search term into an FTS5 query
+
+    Every word becomes a quoted prefix token ("brid"* matches "bridge"),
+    and all words must match. Quoting keeps FTS5 operators in user input
+    from being interpreted.
+    """
+    tokens = _TOKEN_RE.findall(term)
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def ensure_full_text_indexes(bind: Engine) -> None:
+    """Create (and backfill) every registered FTS table that does not exist yet"""
+    for index in _registry:
+        index.create(bind)
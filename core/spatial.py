@@ -0,0 +1,270 @@
+"""
+Spatial index over asset locations (SQLite R*Tree)
+Each resource with latitude/longitude columns registers a SpatialIndex;
+the CRUD layer keeps it in sync and the bbox / near filters of the list
+endpoints are answered from it
+"""
+import math
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import Select, bindparam, column, func, select, table, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Query, Session
+
+# Every SpatialIndex created at import time, so startup can create them
+_registry: list["SpatialIndex"] = []
+
+# Metres per degree of latitude (and of longitude at the equator)
+METERS_PER_DEGREE = 111_320.0
+
+# Ids bound per statement by the set-based sync methods
+_CHUNK = 10_000
+
+# With at least this many R*Tree candidates, a page fills sooner by walking
+# the table in key order and testing coordinates than by fetching and
+# ordering every candidate
+DENSE_CANDIDATES = 5_000
+
+# Set by assume_sparse() to take the R*Tree path whatever the data holds
+_assume_sparse: ContextVar[bool] = ContextVar("assume_sparse", default=False)
+
+
+def _chunks(ids: list[int]):
+    for start in range(0, len(ids), _CHUNK):
+        yield ids[start:start + _CHUNK]
+
+
+def radius_box(lat: float, lon: float, radius_m: float) -> tuple[float, float, float, float]:
+    """Bounding box (min_lat, min_lon, max_lat, max_lon) of a circle"""
+    dlat = radius_m / METERS_PER_DEGREE
+    dlon = radius_m / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+    return lat - dlat, lon - dlon, lat + dlat, lon + dlon
+
+
+class SpatialIndex:
+    """
+    R*Tree mirroring the point location of one resource table
+
+    The R*Tree id is the source row's id. Only rows with both coordinates
+    are indexed. R*Tree bounds are 32-bit floats rounded outwards, so the
+    index yields a superset of candidates and the filters re-check the
+    exact coordinates on the source table.
+    """
+
+    def __init__(self, source_table: str, lat_column: str = "latitude", lon_column: str = "longitude"):
+        self.source_table = source_table
+        self.lat_column = lat_column
+        self.lon_column = lon_column
+        self.name = f"{source_table}_rtree"
+        self.table = table(self.name, *(column(c) for c in ("id", "min_lat", "max_lat", "min_lon", "max_lon")))
+        _registry.append(self)
+
+    def _backfill_sql(self, where: str = "") -> str:
+        lat, lon = self.lat_column, self.lon_column
+        return (
+            f"INSERT OR REPLACE INTO {self.name} (id, min_lat, max_lat, min_lon, max_lon) "
+            f"SELECT id, {lat}, {lat}, {lon}, {lon} FROM {self.source_table} "
+            f"WHERE {lat} IS NOT NULL AND {lon} IS NOT NULL{where}"
+        )
+
+    def create(self, bind: Engine) -> bool:
+        """
+        Create the R*Tree if it is missing and backfill it from the source table
+
+        Returns:
+            True if the table was created
+        """
+        with bind.begin() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": self.name},
+            ).first()
+            if exists:
+                return False
+            conn.execute(text(f"CREATE VIRTUAL TABLE {self.name} USING rtree(id, min_lat, max_lat, min_lon, max_lon)"))
+            conn.execute(text(self._backfill_sql()))
+        return True
+
+    def upsert(self, db: Session, row_id: int, values) -> None:
+        """Index (or re-index) one row from a dict or row holding its coordinates"""
+        lat, lon = _coordinates(values, self.lat_column, self.lon_column)
+        if lat is None or lon is None:
+            self.remove(db, row_id)
+            return
+        db.execute(
+            text(f"INSERT OR REPLACE INTO {self.name} (id, min_lat, max_lat, min_lon, max_lon) "
+                 "VALUES (:id, :lat, :lat, :lon, :lon)"),
+            {"id": row_id, "lat": lat, "lon": lon},
+        )
+
+    def add_many(self, db: Session, rows: list[tuple[int, dict]]) -> None:
+        """Index freshly inserted rows with a single executemany"""
+        params = []
+        for row_id, values in rows:
+            lat, lon = _coordinates(values, self.lat_column, self.lon_column)
+            if lat is not None and lon is not None:
+                params.append({"id": row_id, "lat": lat, "lon": lon})
+        if params:
+            db.execute(
+                text(f"INSERT INTO {self.name} (id, min_lat, max_lat, min_lon, max_lon) "
+                     "VALUES (:id, :lat, :lat, :lon, :lon)"),
+                params,
+            )
+
+    def remove(self, db: Session, row_id: int) -> None:
+        """Drop a row from the index inside the caller's transaction"""
+        db.execute(text(f"DELETE FROM {self.name} WHERE id = :id"), {"id": row_id})
+
+    def remove_many(self, db: Session, ids: list[int]) -> None:
+        """Drop rows removed by a set-based DELETE from the index"""
+        for chunk in _chunks(ids):
+            db.execute(
+                text(f"DELETE FROM {self.name} WHERE id IN :ids").bindparams(bindparam("ids", expanding=True)),
+                {"ids": chunk},
+            )
+
+    def refresh_many(self, db: Session, ids: list[int]) -> None:
+        """Re-index rows changed by a set-based UPDATE, reading them back from the source table"""
+        for chunk in _chunks(ids):
+            self.remove_many(db, chunk)
+            db.execute(
+                text(self._backfill_sql(" AND id IN :ids")).bindparams(bindparam("ids", expanding=True)),
+                {"ids": chunk},
+            )
+
+    def rebuild(self, db: Session) -> None:
+        """Recreate the index contents from the source table"""
+        db.execute(text(f"DELETE FROM {self.name}"))
+        db.execute(text(self._backfill_sql()))
+
+    def touches(self, fields) -> bool:
+        """Whether an update to these fields requires re-indexing"""
+        return self.lat_column in fields or self.lon_column in fields
+
+    def filter(
+        self,
+        query: Query,
+        model,
+        bbox: Optional[tuple[float, float, float, float]] = None,
+        near: Optional[tuple[float, float, float]] = None,
+        use_index: bool = True,
+    ) -> Query:
+        """
+        Restrict a query to rows inside a box and/or within a radius of a point
+
+        A capped count on the R*Tree first checks how many rows the area
+        holds. A sparse area is answered from the R*Tree (an `id IN (...)`
+        lookup, so SQLite drives the query from the index). A dense one
+        skips that lookup: the page is filled by walking the table in
+        key order, which finds enough matches within a few thousand rows.
+        The exact coordinates are always checked. Distances use an
+        equirectangular approximation, accurate to well under 1% at city
+        scale. Boxes crossing the antimeridian are not supported.
+
+        Args:
+            query: Query over the resource table
+            model: Resource model (id and coordinate columns)
+            bbox: (min_lat, min_lon, max_lat, max_lon)
+            near: (lat, lon, radius in metres)
+            use_index: False when the query already selects from the
+                candidates() of the same filters; only the exact checks
+                are added
+        """
+        lat, lon = getattr(model, self.lat_column), getattr(model, self.lon_column)
+        for box in _boxes(bbox, near):
+            min_lat, min_lon, max_lat, max_lon = box
+            if use_index and not self._dense(query.session, box):
+                query = query.filter(model.id.in_(self._candidates(box)))
+            query = query.filter(lat.between(min_lat, max_lat), lon.between(min_lon, max_lon))
+        if near is not None:
+            center_lat, center_lon, radius_m = near
+            scale = math.cos(math.radians(center_lat))
+            query = query.filter(
+                (lat - center_lat) * (lat - center_lat)
+                + (lon - center_lon) * (lon - center_lon) * (scale * scale)
+                <= (radius_m / METERS_PER_DEGREE) ** 2
+            )
+        return query
+
+    def candidates(
+        self,
+        db: Session,
+        bbox: Optional[tuple[float, float, float, float]] = None,
+        near: Optional[tuple[float, float, float]] = None,
+    ) -> list[Select]:
+        """Selects of the R*Tree candidate ids for the sparse areas of a bbox / near filter"""
+        return [self._candidates(box) for box in _boxes(bbox, near) if not self._dense(db, box)]
+
+    def estimate(
+        self,
+        db: Session,
+        bbox: Optional[tuple[float, float, float, float]] = None,
+        near: Optional[tuple[float, float, float]] = None,
+    ) -> Optional[int]:
+        """
+        Approximate rows in a dense area, counted from the R*Tree alone
+
+        Counts the R*Tree entries overlapping the area's box without
+        checking coordinates. Entries are rounded outward, so rows just
+        outside a bbox can be included; for a radius the box count is
+        scaled by pi/4, the share of the box the circle covers. Returns
+        None for a sparse area, whose exact count is cheap, and for a bbox
+        and a radius together.
+        """
+        boxes = _boxes(bbox, near)
+        if len(boxes) != 1 or not self._dense(db, boxes[0]):
+            return None
+        count = db.execute(select(func.count()).select_from(self._candidates(boxes[0]).subquery())).scalar()
+        return round(count * math.pi / 4) if near is not None else count
+
+    def _dense(self, db: Session, box: tuple[float, float, float, float]) -> bool:
+        if _assume_sparse.get():
+            return False
+        capped = self._candidates(box).limit(DENSE_CANDIDATES).subquery()
+        return db.execute(select(func.count()).select_from(capped)).scalar() >= DENSE_CANDIDATES
+
+    def _candidates(self, box: tuple[float, float, float, float]):
+        min_lat, min_lon, max_lat, max_lon = box
+        rtree = self.table.c
+        return select(rtree.id).where(
+            rtree.max_lat >= min_lat,
+            rtree.min_lat <= max_lat,
+            rtree.max_lon >= min_lon,
+            rtree.min_lon <= max_lon,
+        )
+
+
+@contextmanager
+def assume_sparse():
+    """
+    Treat every area as sparse, so spatial filters built inside take the R*Tree path
+
+    Used by the startup plan check, whose verdict must not depend on how
+    many rows happen to lie in its sample viewport.
+    """
+    token = _assume_sparse.set(True)
+    try:
+        yield
+    finally:
+        _assume_sparse.reset(token)
+
+
+def _boxes(bbox, near) -> list[tuple[float, float, float, float]]:
+    boxes = [bbox] if bbox is not None else []
+    if near is not None:
+        boxes.append(radius_box(*near))
+    return boxes
+
+
+def _coordinates(values, lat_column: str, lon_column: str) -> tuple:
+    if isinstance(values, dict):
+        return values.get(lat_column), values.get(lon_column)
+    return getattr(values, lat_column, None), getattr(values, lon_column, None)
+
+
+def ensure_spatial_indexes(bind: Engine) -> None:
+    """Create (and backfill) every registered R*Tree that does not exist yet"""
+    for index in _registry:
+        index.create(bind)
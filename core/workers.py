@@ -0,0 +1,285 @@
+"""
+Multi-worker mode: N reader processes and one writer process
+
+The reader workers are ordinary uvicorn workers sharing the listening
+socket; they serve every GET from their own connections. A write
+(every run_db(..., writes=True)) is not run in the reader: it is sent to
+the single writer process over a Unix socket, so only one process ever
+takes SQLite's write lock and no request waits on busy_timeout.
+
+The writer group-commits. Writes that queue up while one transaction
+commits go into the next one, up to MAX_BATCH, each in its own SAVEPOINT:
+the CRUD method's commit() releases it and a failing write rolls back
+only itself. After the transaction commits, the writer broadcasts the new
+response cache version of every table it changed. Each reader drops its
+cached counts and responses for them and adopts the version, so ETags
+stay the same across workers. The writing reader gets the broadcast
+before its own reply, so it never serves its stale cache afterwards.
+The writer also refreshes the read replicas (core/replicas.py), if any,
+and broadcasts the same way what each refresh invalidates.
+
+Run: python main.py --workers 4
+"""
+import asyncio
+import itertools
+import os
+import queue
+import secrets
+import shutil
+import tempfile
+import threading
+from concurrent.futures import Future
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Callable, Optional
+
+from core.cache import response_cache
+
+# Set for the reader workers by serve(); without them writes run in-process
+ADDRESS_ENV = "WRITER_ADDRESS"
+AUTHKEY_ENV = "WRITER_AUTHKEY"
+
+# Most writes committed in one transaction
+MAX_BATCH = 64
+
+
+class WriterUnavailable(RuntimeError):
+    """The writer process is gone, so a write could not be committed"""
+
+
+def apply_versions(versions: dict[str, int]) -> None:
+    """Drop this process's cached counts and responses for tables the writer changed"""
+    from core.crud import crud_for
+
+    for table, version in versions.items():
+        crud = crud_for(table)
+        if crud is not None:
+            crud.invalidate(version)
+        else:  # its router is not loaded yet
+            response_cache.invalidate(table, version)
+
+
+class WriterClient:
+    """A reader worker's connection to the writer process"""
+
+    def __init__(self, address: str, authkey: bytes):
+        self._conn = Client(address, family="AF_UNIX", authkey=authkey)
+        self._lock = threading.Lock()
+        self._pending: dict[int, Future] = {}
+        self._ids = itertools.count()
+        self._closed = False
+        threading.Thread(target=self._receive, name="writer-client", daemon=True).start()
+
+    async def submit(self, fn: Callable, **kwargs):
+        """
+        Run a CRUD write method in the writer process
+
+        Args:
+            fn: Bound write method of a CRUDBase (e.g. crud.create)
+            **kwargs: Its arguments after the session; they must pickle
+
+        Returns:
+            What the method returned in the writer
+
+        Raises:
+            Whatever the method raised there, or WriterUnavailable
+        """
+        future: Future = Future()
+        with self._lock:
+            if self._closed:
+                raise WriterUnavailable("the writer process is not running")
+            request_id = next(self._ids)
+            self._pending[request_id] = future
+            self._conn.send((request_id, fn.__self__.table_name, fn.__name__, kwargs))
+        return await asyncio.wrap_future(future)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def _receive(self) -> None:
+        try:
+            while True:
+                kind, *payload = self._conn.recv()
+                if kind == "versions":
+                    apply_versions(payload[0])
+                    continue
+                request_id, value = payload
+                with self._lock:
+                    future = self._pending.pop(request_id)
+                if kind == "error":
+                    future.set_exception(value)
+                else:
+                    future.set_result(value)
+        except (EOFError, OSError):
+            with self._lock:
+                self._closed = True
+                pending, self._pending = self._pending, {}
+            for future in pending.values():
+                future.set_exception(WriterUnavailable("the writer process exited"))
+
+
+# This worker's connection to the writer, set by connect()
+client: Optional[WriterClient] = None
+
+
+def connect() -> None:
+    """Send this worker's writes to the writer process named in the environment, if any"""
+    global client
+    address = os.environ.get(ADDRESS_ENV)
+    if address and client is None:
+        client = WriterClient(address, bytes.fromhex(os.environ[AUTHKEY_ENV]))
+
+
+def disconnect() -> None:
+    global client
+    if client is not None:
+        client.close()
+        client = None
+
+
+class Writer:
+    """The writer process: one queue of writes from every reader, group-committed"""
+
+    def __init__(self, address: str, authkey: bytes, max_batch: int = MAX_BATCH):
+        self.max_batch = max_batch
+        self._listener = Listener(address, family="AF_UNIX", authkey=authkey)
+        self._queue: queue.Queue = queue.Queue()
+        self._send_lock = threading.Lock()
+        self._readers: list[Connection] = []
+
+    def serve_forever(self) -> None:
+        threading.Thread(target=self._accept, name="writer-accept", daemon=True).start()
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._commit(batch)
+
+    def close(self) -> None:
+        self._listener.close()
+
+    def publish(self, tables: set[str]) -> None:
+        """Bump the cache versions of tables here and in every reader (after a replica refresh)"""
+        from core.replicas import invalidate_tables
+
+        invalidate_tables(tables)
+        with self._send_lock:
+            versions = {table: response_cache.version(table) for table in tables}
+            for reader in self._readers:
+                self._send(reader, ("versions", versions))
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                reader = self._listener.accept()
+            except OSError:
+                return
+            with self._send_lock:
+                reader.send(("versions", response_cache.versions()))
+                self._readers.append(reader)
+            threading.Thread(target=self._receive, args=(reader,), name="writer-receive", daemon=True).start()
+
+    def _receive(self, reader: Connection) -> None:
+        try:
+            while True:
+                self._queue.put((reader, reader.recv()))
+        except (EOFError, OSError):
+            with self._send_lock:
+                self._readers.remove(reader)
+
+    def _commit(self, batch: list) -> None:
+        from core.crud import crud_for
+        from database import SessionLocal, engine
+
+        replies = []
+        changed = set()
+        with engine.connect() as connection:
+            transaction = connection.begin()
+            # pysqlite would otherwise let the first SAVEPOINT start (and its
+            # RELEASE commit) the transaction
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+            for reader, (request_id, table, method, kwargs) in batch:
+                db = SessionLocal(bind=connection, join_transaction_mode="create_savepoint")
+                try:
+                    replies.append((reader, "result", request_id, getattr(crud_for(table), method)(db, **kwargs)))
+                    changed.add(table)
+                except Exception as error:
+                    db.rollback()
+                    replies.append((reader, "error", request_id, error))
+                finally:
+                    db.close()
+            try:
+                transaction.commit()
+            except Exception as error:
+                replies = [(reader, "error", request_id, error) for reader, _, request_id, _ in replies]
+                changed = set()
+
+        with self._send_lock:
+            if changed:
+                versions = {table: response_cache.version(table) for table in changed}
+                for reader in self._readers:
+                    self._send(reader, ("versions", versions))
+            for reader, kind, request_id, value in replies:
+                self._send(reader, (kind, request_id, value))
+
+    @staticmethod
+    def _send(reader: Connection, message: tuple) -> None:
+        try:
+            reader.send(message)
+        except OSError:
+            pass  # the reader exited; _receive drops it
+        except Exception as error:  # an unpicklable result or exception
+            reader.send(("error", message[1], RuntimeError(f"{type(error).__name__}: {error}")))
+
+
+def run_writer(address: str, authkey: bytes, ready) -> None:
+    """Entry point of the writer process"""
+    from routers import ROUTERS
+
+    from database import engine, replicas
+
+    for spec in ROUTERS:
+        spec.load()  # every CRUD, so crud_for finds them
+
+    writer = Writer(address, authkey)
+    replicas.start(engine, on_refresh=writer.publish)
+    ready.set()
+    writer.serve_forever()
+
+
+def serve(host: str, port: int, workers: int) -> None:
+    """
+    Run `workers` reader processes on host:port and one writer process
+
+    Tables and indexes are created (and migrated) once, by this process,
+    before either kind of worker starts.
+    """
+    import multiprocessing
+
+    import uvicorn
+
+    from core.migrations import ensure_schema
+    from database import engine
+
+    ensure_schema(engine)
+    engine.dispose()
+    context = multiprocessing.get_context("spawn")
+    directory = tempfile.mkdtemp(prefix="city-writer-")
+    address = os.path.join(directory, "writer.sock")
+    authkey = secrets.token_bytes(32)
+    ready = context.Event()
+    writer = context.Process(target=run_writer, args=(address, authkey, ready), name="writer", daemon=True)
+    writer.start()
+    try:
+        if not ready.wait(timeout=120):
+            raise RuntimeError("the writer process did not start")
+        # Inherited by the reader workers (but not by the writer, already started)
+        os.environ[ADDRESS_ENV] = address
+        os.environ[AUTHKEY_ENV] = authkey.hex()
+        uvicorn.run("main:app", host=host, port=port, workers=workers)
+    finally:
+        writer.terminate()
+        writer.join()
+        shutil.rmtree(directory, ignore_errors=True)
@@ -1,21 +1,152 @@
 """
 Database configuration and session management
 """
-from sqlalchemy import create_engine
+import asyncio
+import os
+import weakref
+from functools import partial
+
+from fastapi import Depends, Query
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from core import workers
+from core.metrics import instrument_engine
+from core.replicas import REPLICA_URLS, Consistency, Replica, ReplicaSet
 
 # SQLite database URL
-SQLALCHEMY_DATABASE_URL = "sqlite:///./city_infrastructure.db"
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./city_infrastructure.db")
+
+# Engine profiles, selected with the DB_PROFILE environment variable.
+# "pragmas" are applied to every new SQLite connection, "pool" is passed to
+# create_engine. The production pool matches uvicorn's threadpool (40 worker
+# threads for sync routes), so no request waits on a connection while its
+# thread is free.
+ENGINE_PROFILES = {
+    "default": {
+        "pragmas": {},
+        "pool": {},
+    },
+    "production": {
+        "pragmas": {
+            "journal_mode": "WAL",       # readers no longer block on the writer
+            "synchronous": "NORMAL",     # fsync at checkpoints only; safe with WAL
+            "cache_size": -64000,        # 64 MiB page cache per connection
+            "mmap_size": 268435456,      # 256 MiB memory-mapped reads
+            "temp_store": "MEMORY",      # sorts and temp b-trees stay in RAM
+            "busy_timeout": 5000,        # wait up to 5 s for the write lock
+        },
+        "pool": {
+            "pool_size": 40,
+            "max_overflow": 10,
+            "pool_timeout": 30,
+            "pool_pre_ping": False,
+        },
+    },
+}
+
+DB_PROFILE = os.getenv("DB_PROFILE", "default")
+
+# DB_ASYNC=1 serves requests from an aiosqlite engine instead of the
+# threadpool-backed sync engine
+DB_ASYNC = os.getenv("DB_ASYNC", "0").lower() in ("1", "true", "yes")
+
+
+def apply_pragmas(dbapi_connection, pragmas: dict) -> None:
+    """Run the given PRAGMA statements on a raw SQLite connection"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def create_profiled_engine(url: str = SQLALCHEMY_DATABASE_URL, profile: str = DB_PROFILE):
+    """
+    Create an engine configured with one of ENGINE_PROFILES
+
+    Args:
+        url: Database URL
+        profile: Name of the profile to apply
+
+    Returns:
+        SQLAlchemy engine
+    """
+    if profile not in ENGINE_PROFILES:
+        raise ValueError(f"Unknown DB_PROFILE '{profile}', expected one of {sorted(ENGINE_PROFILES)}")
+    settings = ENGINE_PROFILES[profile]
+
+    new_engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False},  # Needed for SQLite
+        **settings["pool"]
+    )
+
+    if settings["pragmas"]:
+        @event.listens_for(new_engine, "connect")
+        def _on_connect(dbapi_connection, connection_record):
+            apply_pragmas(dbapi_connection, settings["pragmas"])
+
+    return new_engine
+
+
+def async_url(url: str) -> str:
+    """Map a pysqlite URL onto the aiosqlite driver"""
+    return url.replace("sqlite://", "sqlite+aiosqlite://", 1) if url.startswith("sqlite://") else url
+
+
+def create_profiled_async_engine(url: str = SQLALCHEMY_DATABASE_URL, profile: str = DB_PROFILE):
+    """
+    Create an aiosqlite engine configured with one of ENGINE_PROFILES
+
+    aiosqlite defaults to NullPool for file databases (a new connection and
+    thread per session), so connections are always pooled here.
+
+    Args:
+        url: Database URL (sync or async form)
+        profile: Name of the profile to apply
+
+    Returns:
+        SQLAlchemy AsyncEngine
+    """
+    if profile not in ENGINE_PROFILES:
+        raise ValueError(f"Unknown DB_PROFILE '{profile}', expected one of {sorted(ENGINE_PROFILES)}")
+    settings = ENGINE_PROFILES[profile]
+
+    new_engine = create_async_engine(async_url(url), poolclass=AsyncAdaptedQueuePool, **settings["pool"])
+
+    if settings["pragmas"]:
+        @event.listens_for(new_engine.sync_engine, "connect")
+        def _on_connect(dbapi_connection, connection_record):
+            apply_pragmas(dbapi_connection, settings["pragmas"])
+
+    return new_engine
+
 
 # Create engine
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False}  # Needed for SQLite
-)
+engine = create_profiled_engine()
+instrument_engine(engine)
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine and sessions; connections are only opened when DB_ASYNC is on
+async_engine = create_profiled_async_engine()
+instrument_engine(async_engine.sync_engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Read replicas for list, export and stats requests (DATABASE_REPLICAS);
+# none by default, so every read goes to the primary
+replicas = ReplicaSet([
+    Replica(url, create_profiled_engine(url), create_profiled_async_engine(url)) for url in REPLICA_URLS
+])
+for replica in replicas.replicas:
+    instrument_engine(replica.engine)
+
 # Create Base class for models
 Base = declarative_base()
 
@@ -30,3 +161,96 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """
+    Dependency function to get an async database session
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def read_consistency(
+    consistency: Consistency = Query(
+        Consistency.EVENTUAL, description="eventual (may read a replica a few seconds behind) or strong (primary)"
+    ),
+) -> Consistency:
+    return consistency
+
+
+def get_read_db(consistency: Consistency = Depends(read_consistency)):
+    """
+    Dependency function for the list, export and stats endpoints
+
+    Opens the session on a read replica unless the request asks for
+    consistency=strong or no replica is up to date (see core/replicas.py)
+    """
+    replica = replicas.pick(consistency)
+    db = replica.session_factory() if replica else SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db(consistency: Consistency = Depends(read_consistency)):
+    """
+    Dependency function to get an async session for the list, export and stats endpoints
+    """
+    replica = replicas.pick(consistency)
+    async with (replica.async_session_factory if replica else AsyncSessionLocal)() as db:
+        yield db
+
+
+def get_read_sessionmaker(consistency: Consistency = Depends(read_consistency)) -> sessionmaker:
+    """Dependency returning the session factory of a streaming read (exports open their own session)"""
+    replica = replicas.pick(consistency)
+    return replica.session_factory if replica else SessionLocal
+
+
+# The session dependency routes use, chosen by DB_ASYNC
+get_session = get_async_db if DB_ASYNC else get_db
+get_read_session = get_async_read_db if DB_ASYNC else get_read_db
+
+
+# One writer at a time per event loop on the async stack. SQLite serializes
+# writers anyway; queueing them here keeps a burst of writes from holding
+# the write lock past busy_timeout while their statements interleave.
+_write_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+
+def _write_lock() -> asyncio.Lock:
+    loop = asyncio.get_running_loop()
+    lock = _write_locks.get(loop)
+    if lock is None:
+        lock = _write_locks[loop] = asyncio.Lock()
+    return lock
+
+
+async def run_db(db, fn, /, *, writes: bool = False, **kwargs):
+    """
+    Await a sync CRUD function on either kind of session
+
+    With an AsyncSession the function runs through run_sync, so every
+    statement awaits aiosqlite and no worker thread is held. With a sync
+    Session it runs in the threadpool, exactly like a sync route. In
+    multi-worker mode (core.workers) a write runs in the writer process.
+
+    Args:
+        db: Session or AsyncSession from get_session
+        fn: CRUD function taking the session as its first argument
+        writes: True if fn writes; async writers are queued one at a time
+        **kwargs: Passed to fn
+
+    Returns:
+        Whatever fn returns
+    """
+    if writes and workers.client is not None:
+        return await workers.client.submit(fn, **kwargs)
+    if isinstance(db, AsyncSession):
+        if writes:
+            async with _write_lock():
+                return await db.run_sync(partial(fn, **kwargs))
+        return await db.run_sync(partial(fn, **kwargs))
+    return await run_in_threadpool(fn, db, **kwargs)
@@ -2,21 +2,41 @@
 Municipal Infrastructure Monitoring API
 Main application file
 """
-from fastapi import FastAPI
+import argparse
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from database import engine, Base
+from database import engine, replicas
+from core.cache import response_cache
+from core import workers
+from core.compression import CompressionMiddleware
+from core.metrics import PROMETHEUS_MEDIA_TYPE, MetricsMiddleware, registry
+from core.migrations import ensure_schema
+from core.routing import LazyRouters
+from routers import ROUTERS
+
 
-# Import routers here as you complete them
-from routers.bridges import router as bridges_router
-from routers.water_quality import router as water_quality_router
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create or migrate tables, indexes and shadow tables unless the
+    # database is already stamped with the current schema version
+    ensure_schema(engine)
+    # Reader workers started by `--workers N` send their writes to the writer process
+    workers.connect()
+    # Refresh the read replicas (DATABASE_REPLICAS), unless the writer process does
+    if workers.client is None:
+        replicas.start(engine)
+    yield
+    replicas.stop()
+    workers.disconnect()
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
 
 app = FastAPI(
     title="City Infrastructure API",
     description="A comprehensive API for monitoring municipal infrastructure",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Configure CORS
@@ -26,12 +46,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
-# Register routers
-# TODO: Add your router here using the pattern below
-app.include_router(bridges_router, prefix="/api/bridges", tags=["Bridges"])
-app.include_router(water_quality_router, prefix="/api/water-quality", tags=["Water Quality"])
+# brotli/gzip by Accept-Encoding for bodies of 1 KiB or more
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+# Per-route latency and SQL statement histograms, served at /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Register routers (listed in routers/__init__.py, imported on first use)
+LazyRouters(app, ROUTERS)
 
 @app.get("/")
 def root():
@@ -39,11 +64,7 @@ def root():
     return {
         "name": "City Infrastructure API",
         "version": "1.0.0",
-        "endpoints": [
-            "/api/bridges",
-            "/api/water-quality",
-            # Add more as routers are completed
-        ]
+        "endpoints": [spec.prefix for spec in ROUTERS]
     }
 
 
@@ -53,6 +74,27 @@ def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/cache/stats")
+def cache_stats():
+    """Response cache hit/miss counters"""
+    return response_cache.stats()
+
+
+@app.get("/metrics", response_class=Response)
+def metrics():
+    """Request latency and database query metrics in Prometheus text format"""
+    return Response(registry.render(), media_type=PROMETHEUS_MEDIA_TYPE)
+
+
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    parser = argparse.ArgumentParser(description="Run the API server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="reader processes; above 1, writes go to one writer process (core/workers.py)")
+    args = parser.parse_args()
+    if args.workers > 1:
+        workers.serve(args.host, args.port, args.workers)
+    else:
+        import uvicorn
+        uvicorn.run(app, host=args.host, port=args.port)
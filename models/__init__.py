@@ -1,2 +1,2 @@
 """Models package"""
-from .base import BaseModel, TimestampMixin
+from .base import BaseModel, GeoMixin, TimestampMixin, ensure_columns, ensure_indexes
@@ -1,7 +1,7 @@
 """
 Base SQLAlchemy models
 """
-from sqlalchemy import Column, Integer, DateTime
+from sqlalchemy import Column, Float, Integer, DateTime, inspect, text
 from sqlalchemy.sql import func
 from database import Base
 
@@ -12,11 +12,81 @@ class TimestampMixin:
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
 
 
+class GeoMixin:
+    """
+    Mixin to add an optional point location (WGS84 degrees)
+
+    Pair it with a core.spatial.SpatialIndex on the CRUD to serve the
+    bbox / near list filters.
+    """
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+
+
 class BaseModel(Base, TimestampMixin):
     """
     Abstract base model with id and timestamps
     All student models should inherit from this
+
+    Declare secondary indexes in `__table_args__`, ending each one with
+    `id` so it also serves the (sort key, id) keyset order of the list
+    endpoints. The primary key needs no extra index: it is SQLite's rowid.
     """
     __abstract__ = True
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
+
+
+def ensure_columns(bind) -> None:
+    """
+    Add declared nullable columns that existing tables are missing
+
+    create_all() never alters an existing table, so a column added to a
+    model later (e.g. GeoMixin's coordinates) is added here with
+    ALTER TABLE ... ADD COLUMN. Monthly partitioned tables are brought up
+    to date by core.partitions.ensure_partitions instead.
+    """
+    inspector = inspect(bind)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name) or "partitions" in table.info:
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        missing = [column for column in table.columns if column.name not in existing]
+        if not missing:
+            continue
+        with bind.begin() as conn:
+            for column in missing:
+                if not column.nullable or column.server_default is not None:
+                    raise RuntimeError(f"Cannot add non-nullable column {table.name}.{column.name} automatically")
+                conn.execute(text(
+                    f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(bind.dialect)}"
+                ))
+
+
+def ensure_indexes(bind) -> None:
+    """
+    Bring the indexes of existing tables in line with the declared models
+
+    create_all() only creates indexes together with a new table, so an
+    index added to a model later would never reach an existing database.
+    This creates any missing declared index and drops the redundant
+    `ix_<table>_id` primary-key index older databases were created with.
+    Existing indexes are read from sqlite_master: the inspector leaves out
+    expression indexes, which would then be created a second time.
+    """
+    inspector = inspect(bind)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name) or "partitions" in table.info:
+            continue
+        with bind.connect() as conn:
+            existing = set(conn.execute(
+                text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table"),
+                {"table": table.name},
+            ).scalars())
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind)
+        legacy = f"ix_{table.name}_id"
+        if legacy in existing and legacy not in {index.name for index in table.indexes}:
+            with bind.begin() as conn:
+                conn.execute(text(f"DROP INDEX {legacy}"))
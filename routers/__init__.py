@@ -0,0 +1,13 @@
+"""
+Resource routers
+
+Register each router package here; main.py includes them lazily (see
+core/routing.py), so adding one costs nothing until it is first used.
+"""
+from core.routing import RouterSpec
+
+ROUTERS = [
+    RouterSpec("routers.bridges", "/api/bridges", "Bridges"),
+    RouterSpec("routers.water_quality", "/api/water-quality", "Water Quality"),
+    # Add yours here: RouterSpec("routers.<package>", "/api/<resource>", "<Tag>")
+]
@@ -2,134 +2,105 @@
 Bridge CRUD operations
 Database operations for bridges
 """
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from datetime import date, timedelta
 from typing import Optional
-from .models import Bridge, BridgeCondition
-from .schemas import BridgeCreate, BridgeUpdate
 
-
-def get_bridges(
-    db: Session,
-    skip: int = 0,
-    limit: int = 100,
-    condition: Optional[BridgeCondition] = None,
-    search: Optional[str] = None
-) -> tuple[list[Bridge], int]:
+from sqlalchemy import func
+from sqlalchemy.orm import Query, Session
+from core.crud import CRUDBase, Filter
+from core.pagination import order_by_key
+from core.query_plan import canonical_queries
+from .models import Bridge, BridgeCondition, bridge_locations, bridge_search, due_rank
+from .schemas import BridgeResponse
+
+
+bridges = CRUDBase(
+    Bridge,
+    filters=[
+        Filter("condition", Bridge.condition, annotation=BridgeCondition, description="Filter by condition"),
+    ],
+    sort_columns={
+        "id": Bridge.id,
+        "name": Bridge.name,
+    },
+    search_index=bridge_search,
+    spatial_index=bridge_locations,
+    substring_columns=[Bridge.name, Bridge.location],
+    # Columns written by the export endpoint, in the order of BridgeResponse
+    export_columns=[getattr(Bridge, name) for name in BridgeResponse.model_fields],
+)
+
+# Module-level names used by scripts and tests
+count_cache = bridges.count_cache
+SORT_COLUMNS = bridges.sort_columns
+EXPORT_COLUMNS = bridges.export_columns
+filter_bridges = bridges.filter
+get_bridges = bridges.get_page
+export_bridges = bridges.export_query
+get_bridge = bridges.get
+create_bridge = bridges.create
+update_bridge = bridges.update
+delete_bridge = bridges.delete
+bulk_update_bridges = bridges.bulk_update
+update_bridges_where = bridges.update_where
+delete_bridges_where = bridges.delete_where
+
+
+def filter_due(db: Session, within_days: int, today: date, columns: Optional[list] = None) -> Query:
     """
-    Get list of bridges with optional filtering
-
-    Args:
-        db: Database session
-        skip: Number of records to skip
-        limit: Maximum number of records to return
-        condition: Filter by condition rating
-        search: Search term for name or location
+    Bridges due for inspection by today + within_days, highest risk first
 
-    Returns:
-        Tuple of (list of bridges, total count)
+    Selects (Bridge, risk_score), or the given Bridge columns followed by
+    risk_score, ordered by ix_bridges_due_rank_id. The risk weights are
+    never negative, so every bridge due by the cutoff has due_rank <=
+    julianday(cutoff); that bound lets SQLite walk the index from the
+    front and stop after the page instead of sorting the table.
     """
-    query = db.query(Bridge)
-
-    # Apply filters
-    if condition:
-        query = query.filter(Bridge.condition == condition)
-
-    if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            or_(
-                Bridge.name.ilike(search_term),
-                Bridge.location.ilike(search_term)
-            )
-        )
-
-    # Get total count before pagination
-    total = query.count()
-
-    # Apply pagination and get results
-    bridges = query.offset(skip).limit(limit).all()
-
-    return bridges, total
-
-
-def get_bridge(db: Session, bridge_id: int) -> Optional[Bridge]:
+    cutoff = today + timedelta(days=within_days)
+    risk_score = (func.julianday(today.isoformat()) - due_rank).label("risk_score")
+    return (
+        db.query(*(columns or [Bridge]), risk_score)
+        .filter(due_rank <= func.julianday(cutoff.isoformat()), Bridge.next_inspection_date <= cutoff)
+        .order_by(due_rank, Bridge.id)
+    )
+
+
+def get_due_bridges(
+    db: Session, within_days: int, limit: int, today: date, columns: Optional[list] = None
+) -> list[tuple]:
     """
-    Get a specific bridge by ID
+    Inspection worklist: the `limit` highest-risk bridges due within `within_days`
 
     Args:
-        db: Database session
-        bridge_id: Bridge ID
+        columns: Select only these Bridge columns instead of the model
 
     Returns:
-        Bridge object or None if not found
-    """
-    return db.query(Bridge).filter(Bridge.id == bridge_id).first()
-
-
-def create_bridge(db: Session, bridge_data: BridgeCreate) -> Bridge:
+        List of (bridge, risk score in days), or of the selected column
+        values followed by the risk score
     """
-    Create a new bridge
+    return filter_due(db, within_days, today, columns).limit(limit).all()
 
-    Args:
-        db: Database session
-        bridge_data: Bridge creation data
 
-    Returns:
-        Created bridge object
+@canonical_queries
+def list_query_shapes(db: Session) -> dict:
     """
-    bridge = Bridge(**bridge_data.model_dump())
-    db.add(bridge)
-    db.commit()
-    db.refresh(bridge)
-    return bridge
-
+    Filtered list queries that must be served by an index (checked at startup)
 
-def update_bridge(
-    db: Session,
-    bridge_id: int,
-    bridge_data: BridgeUpdate
-) -> Optional[Bridge]:
+    The unfiltered list is left out on purpose: it walks the table in
+    key order and stops at the page limit.
     """
-    Update an existing bridge
-
-    Args:
-        db: Database session
-        bridge_id: Bridge ID
-        bridge_data: Bridge update data
-
-    Returns:
-        Updated bridge object or None if not found
-    """
-    bridge = get_bridge(db, bridge_id)
-    if not bridge:
-        return None
-
-    # Update only provided fields
-    update_data = bridge_data.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(bridge, field, value)
-
-    db.commit()
-    db.refresh(bridge)
-    return bridge
-
-
-def delete_bridge(db: Session, bridge_id: int) -> bool:
-    """
-    Delete a bridge
-
-    Args:
-        db: Database session
-        bridge_id: Bridge ID
-
-    Returns:
-        True if deleted, False if not found
-    """
-    bridge = get_bridge(db, bridge_id)
-    if not bridge:
-        return False
-
-    db.delete(bridge)
-    db.commit()
-    return True
+    return {
+        "bridges by condition": order_by_key(
+            filter_bridges(db, condition=BridgeCondition.POOR), Bridge.id, Bridge.id
+        ).limit(100),
+        "bridges by condition and search": order_by_key(
+            filter_bridges(db, condition=BridgeCondition.POOR, search="river"), Bridge.id, Bridge.id
+        ).limit(100),
+        "bridges in a map viewport": order_by_key(
+            filter_bridges(db, bbox=(40.70, -74.02, 40.72, -73.99)), Bridge.id, Bridge.id
+        ).limit(100),
+        "bridges near a point": order_by_key(
+            filter_bridges(db, near=(40.71, -74.0, 500.0)), Bridge.id, Bridge.id
+        ).limit(100),
+        "bridges due for inspection": filter_due(db, 30, date(2025, 1, 1)).limit(100),
+    }
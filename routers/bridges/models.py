@@ -1,8 +1,10 @@
 """
 Bridge database model
 """
-from sqlalchemy import Column, String, Float, Date, Enum as SQLEnum
-from models.base import BaseModel
+from sqlalchemy import Column, String, Float, Date, Index, Enum as SQLEnum, case, func, literal_column
+from models.base import BaseModel, GeoMixin
+from core.search import FullTextIndex
+from core.spatial import SpatialIndex
 import enum
 
 
@@ -15,12 +17,18 @@ class BridgeCondition(str, enum.Enum):
     CRITICAL = "critical"
 
 
-class Bridge(BaseModel):
+class Bridge(BaseModel, GeoMixin):
     """
     Bridge infrastructure model
     Tracks bridge inspections, conditions, and maintenance
     """
     __tablename__ = "bridges"
+    __table_args__ = (
+        # condition filter, paged in id order
+        Index("ix_bridges_condition_id", "condition", "id"),
+        # inspection scheduling by due date
+        Index("ix_bridges_next_inspection_date_id", "next_inspection_date", "id"),
+    )
 
     # Basic Information
     name = Column(String, nullable=False, index=True)
@@ -45,3 +53,41 @@ class Bridge(BaseModel):
 
     def __repr__(self):
         return f"<Bridge(id={self.id}, name='{self.name}', condition='{self.condition}')>"
+
+
+# Inspection worklist risk, in days: how long overdue a bridge is plus a
+# weight for its condition and for the load it is rated to carry
+CONDITION_RISK_DAYS = {
+    BridgeCondition.CRITICAL: 365,
+    BridgeCondition.POOR: 180,
+    BridgeCondition.FAIR: 60,
+    BridgeCondition.GOOD: 0,
+    BridgeCondition.EXCELLENT: 0,
+}
+LOAD_RISK_DAYS_PER_TON = 0.5
+LOAD_RISK_MAX_TONS = 100
+
+
+def _risk_weight(table):
+    # Literals rather than bound parameters, so queries repeat the indexed expression exactly
+    condition = case(
+        *((table.c.condition == literal_column(f"'{member.name}'"), literal_column(str(days)))
+          for member, days in CONDITION_RISK_DAYS.items()),
+        else_=literal_column("0"),
+    )
+    load = func.min(table.c.max_load_rating_tons, literal_column(str(LOAD_RISK_MAX_TONS)))
+    return condition + load * literal_column(str(LOAD_RISK_DAYS_PER_TON))
+
+
+# Risk in days is julianday(today) - due_rank, so ordering by due_rank
+# ascending is the risk order on any day. NULL for unscheduled bridges.
+risk_weight = _risk_weight(Bridge.__table__)
+due_rank = func.julianday(Bridge.__table__.c.next_inspection_date) - risk_weight
+Index("ix_bridges_due_rank_id", due_rank, Bridge.__table__.c.id)
+
+# FTS5 shadow table used by the `search` filter; kept in sync by crud.py.
+# A plain search matches name/location; notes only when asked for (search_in)
+bridge_search = FullTextIndex("bridges", ["name", "location", "notes"], searched=["name", "location"])
+
+# R*Tree over latitude/longitude used by the bbox / near filters; kept in sync by crud.py
+bridge_locations = SpatialIndex("bridges")
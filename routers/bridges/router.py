@@ -2,111 +2,69 @@
 Bridge Router
 FastAPI endpoints for bridge management
 """
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from datetime import date
+
+from fastapi import Depends, Query, Response
 from sqlalchemy.orm import Session
-from typing import Optional
 
-from database import get_db
-from .models import BridgeCondition
-from .schemas import BridgeCreate, BridgeUpdate, BridgeResponse, BridgeListResponse
+from database import get_read_session, run_db
+from core.cache import vary_cache
+from core.resource import ResourceRouter
+from core.serialize import PageEncoder
+from .schemas import (
+    BridgeCreate,
+    BridgeUpdate,
+    BridgeResponse,
+    BridgeListResponse,
+    BridgeDue,
+    BridgeDueListResponse,
+)
+from .models import Bridge
 from . import crud
 
-router = APIRouter()
-
-
-@router.get("/", response_model=BridgeListResponse)
-def list_bridges(
-    skip: int = Query(0, ge=0, description="Number of records to skip"),
-    limit: int = Query(100, ge=1, le=500, description="Maximum records to return"),
-    condition: Optional[BridgeCondition] = Query(None, description="Filter by condition"),
-    search: Optional[str] = Query(None, description="Search in name or location"),
-    db: Session = Depends(get_db)
-):
-    """
-    List all bridges with optional filtering
-    - **skip**: Pagination offset
-    - **limit**: Maximum number of results
-    - **condition**: Filter by condition rating (excellent, good, fair, poor, critical)
-    - **search**: Search term for name or location (case-insensitive)
-    """
-    bridges, total = crud.get_bridges(
-        db=db,
-        skip=skip,
-        limit=limit,
-        condition=condition,
-        search=search
-    )
-    return BridgeListResponse(total=total, bridges=bridges)
-
+router = ResourceRouter(
+    crud.bridges,
+    create_schema=BridgeCreate,
+    update_schema=BridgeUpdate,
+    response_schema=BridgeResponse,
+    list_schema=BridgeListResponse,
+    list_field="bridges",
+    label="Bridge",
+    export_name="bridges",
+    bulk_edit=True,
+)
 
-@router.post("/", response_model=BridgeResponse, status_code=status.HTTP_201_CREATED)
-def create_bridge(
-    bridge: BridgeCreate,
-    db: Session = Depends(get_db)
-):
-    """
-    Create a new bridge
-    Provide all required bridge information including:
-    - Name and location
-    - Physical dimensions (length, width)
-    - Load rating
-    - Current condition
-    """
-    return crud.create_bridge(db=db, bridge_data=bridge)
+# Worklist rows are the bridge columns plus overdue_days and risk_score
+due_encoder = PageEncoder(BridgeDueListResponse, BridgeDue, "bridges")
+due_columns = router.encoder.columns(Bridge)
+next_inspection = router.encoder.names.index("next_inspection_date")
 
 
-@router.get("/{bridge_id}", response_model=BridgeResponse)
-def get_bridge(
-    bridge_id: int,
-    db: Session = Depends(get_db)
+@router.get("/due", response_model=BridgeDueListResponse, summary="Bridges due for inspection")
+# The worklist moves with the date, not only with writes to bridges
+@vary_cache(lambda request: date.today())
+async def bridges_due(
+    within_days: int = Query(30, ge=0, le=3650, description="Include bridges due within this many days"),
+    limit: int = Query(100, ge=1, le=500, description="Maximum bridges to return"),
+    db: Session = Depends(get_read_session),
 ):
     """
-    Get a specific bridge by ID
-    Returns detailed information about a single bridge.
-    """
-    bridge = crud.get_bridge(db=db, bridge_id=bridge_id)
-    if not bridge:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Bridge with id {bridge_id} not found"
-        )
-    return bridge
-
+    Inspection worklist, highest risk first
 
-@router.put("/{bridge_id}", response_model=BridgeResponse)
-def update_bridge(
-    bridge_id: int,
-    bridge: BridgeUpdate,
-    db: Session = Depends(get_db)
-):
-    """
-    Update an existing bridge
-    All fields are optional - only provided fields will be updated.
-    Use this to update inspection dates, condition ratings, or any other bridge information.
+    Lists bridges whose next inspection is overdue or due within
+    `within_days`. `risk_score` is the days overdue plus a weight for the
+    condition (critical 365, poor 180, fair 60) and half a day per ton of
+    load rating up to 100 tons. Bridges without a next inspection date are
+    not listed.
     """
-    updated_bridge = crud.update_bridge(db=db, bridge_id=bridge_id, bridge_data=bridge)
-    if not updated_bridge:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Bridge with id {bridge_id} not found"
-        )
-    return updated_bridge
+    today = date.today()
+    rows = await run_db(
+        db, crud.get_due_bridges, within_days=within_days, limit=limit, today=today, columns=due_columns
+    )
+    rows = [(*row[:-1], (today - row[next_inspection]).days, round(row[-1], 2)) for row in rows]
+    return Response(
+        due_encoder.encode(rows, None, None, as_of=today, within_days=within_days), media_type="application/json"
+    )
 
 
-@router.delete("/{bridge_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_bridge(
-    bridge_id: int,
-    db: Session = Depends(get_db)
-):
-    """
-    Delete a bridge
-    Permanently removes a bridge from the system.
-    Returns 204 No Content on success.
-    """
-    deleted = crud.delete_bridge(db=db, bridge_id=bridge_id)
-    if not deleted:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Bridge with id {bridge_id} not found"
-        )
-    return None
+router.add_item_routes()
@@ -11,6 +11,8 @@ class BridgeBase(BaseModel):
     """Base bridge schema with common fields"""
     name: str = Field(..., min_length=1, max_length=200, description="Bridge name")
     location: str = Field(..., min_length=1, max_length=300, description="Bridge location/address")
+    latitude: Optional[float] = Field(None, ge=-90, le=90, description="Latitude (WGS84 degrees)")
+    longitude: Optional[float] = Field(None, ge=-180, le=180, description="Longitude (WGS84 degrees)")
     length_meters: float = Field(..., gt=0, description="Bridge length in meters")
     width_meters: float = Field(..., gt=0, description="Bridge width in meters")
     max_load_rating_tons: float = Field(..., gt=0, description="Maximum load rating in tons")
@@ -31,6 +33,8 @@ class BridgeUpdate(BaseModel):
     """Schema for updating a bridge - all fields optional"""
     name: Optional[str] = Field(None, min_length=1, max_length=200)
     location: Optional[str] = Field(None, min_length=1, max_length=300)
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
     length_meters: Optional[float] = Field(None, gt=0)
     width_meters: Optional[float] = Field(None, gt=0)
     max_load_rating_tons: Optional[float] = Field(None, gt=0)
@@ -53,5 +57,23 @@ class BridgeResponse(BridgeBase):
 
 class BridgeListResponse(BaseModel):
     """Schema for list of bridges"""
-    total: int
+    total: Optional[int] = Field(None, description="Matching rows; null when include_total=false")
+    total_is_estimate: bool = Field(
+        False, description="total may be approximate: include_total=estimate with only bbox/near, where a "
+                           "dense area is estimated from the spatial index"
+    )
     bridges: list[BridgeResponse]
+    next_cursor: Optional[str] = Field(None, description="Cursor for the next page, null on the last page")
+
+
+class BridgeDue(BridgeResponse):
+    """A bridge on the inspection worklist"""
+    overdue_days: int = Field(..., description="Days past next_inspection_date (negative: not due yet)")
+    risk_score: float = Field(..., description="overdue_days plus the condition and load rating weights, in days")
+
+
+class BridgeDueListResponse(BaseModel):
+    """Schema for the inspection worklist"""
+    as_of: date = Field(..., description="Day the overdue days and risk scores were computed for")
+    within_days: int
+    bridges: list[BridgeDue] = Field(..., description="Highest risk first")
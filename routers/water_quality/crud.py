@@ -1,80 +1,268 @@
 """
 CRUD operations for water quality samples
 """
+import math
+from functools import partial
+from itertools import chain, groupby
+from operator import ge, is_not, itemgetter, le
+
 from sqlalchemy.orm import Session
 from typing import Optional
-from .models import WaterQualitySample, WaterQualityStatus
-from .schemas import WaterQualityCreate, WaterQualityUpdate
-from sqlalchemy import or_
+from .models import (
+    WaterQualityDailyRollup, WaterQualitySample, WaterQualityStatus, sample_locations, sample_partitions,
+    sample_search
+)
+from . import rollup
+from .schemas import WaterQualityResponse
+from sqlalchemy import Row, func, select
+from core.crud import Filter, PartitionedCRUD, query_entity
+from core.pagination import order_by_key
+from core.query_plan import canonical_queries
 
 
-def get_samples(
-    db: Session,
-    skip: int = 0,
-    limit: int = 100,
-    start_date: Optional[str] = None,
-    end_date: Optional[str] = None,
-    status: Optional[WaterQualityStatus] = None,
-    search: Optional[str] = None
-) -> tuple[list[WaterQualitySample], int]:
-    """
-    Retrieve water quality samples with optional filters
-    """
-    query = db.query(WaterQualitySample)
+class SampleCRUD(PartitionedCRUD[WaterQualitySample]):
+    """Sample CRUD that also keeps the daily stats rollup in sync"""
 
-    if status:
-        query = query.filter(WaterQualitySample.status == status)
+    # A sample moved to another site or day also refreshes the day it left
+    before_columns = ("site_name", "sample_date")
+    delete_columns = ("id", "site_name", "sample_date")
 
-    if start_date:
-        query = query.filter(WaterQualitySample.sample_date >= start_date)
+    def on_create(self, db: Session, row: Row, values: dict) -> None:
+        super().on_create(db, row, values)
+        rollup.refresh_days(db, [(row.site_name, row.sample_date)])
 
-    if end_date:
-        query = query.filter(WaterQualitySample.sample_date <= end_date)
-
-    if search:
-        term = f"%{search}%"
-        query = query.filter(
-            or_(
-                WaterQualitySample.site_name.ilike(term),
-                WaterQualitySample.location.ilike(term)
+    def on_bulk_create(self, db: Session, ids: list[int], rows: list[dict]) -> None:
+        super().on_bulk_create(db, ids, rows)
+        rollup.refresh_days(db, [(row["site_name"], row["sample_date"]) for row in rows])
+
+    def on_update(self, db: Session, row: Row, before: dict, changes: dict) -> None:
+        super().on_update(db, row, before, changes)
+        if changes.keys() & {"site_name", "sample_date", *rollup.METRICS}:
+            rollup.refresh_days(
+                db, [(before["site_name"], before["sample_date"]), (row.site_name, row.sample_date)]
             )
-        )
 
-    total = query.count()
-    samples = query.offset(skip).limit(limit).all()
-    return samples, total
+    def on_delete(self, db: Session, row: Row) -> None:
+        super().on_delete(db, row)
+        rollup.refresh_days(db, [(row.site_name, row.sample_date)])
+
+    def on_bulk_update(self, db: Session, rows: list[Row], before: list[Row], changes: dict) -> None:
+        super().on_bulk_update(db, rows, before, changes)
+        if changes.keys() & {"site_name", "sample_date", *rollup.METRICS}:
+            rollup.refresh_days(db, [(row.site_name, row.sample_date) for row in chain(before, rows)])
+
+    def on_bulk_delete(self, db: Session, rows: list[Row]) -> None:
+        super().on_bulk_delete(db, rows)
+        rollup.refresh_days(db, [(row.site_name, row.sample_date) for row in rows])
+
+    def on_drop_partitions(self, db: Session, ids: list[int], before) -> None:
+        super().on_drop_partitions(db, ids, before)
+        rollup.drop_before(db, before)
+
+
+samples = SampleCRUD(
+    WaterQualitySample,
+    sample_partitions,
+    filters=[
+        Filter("start_date", WaterQualitySample.sample_date, ge,
+               description="Start sample date (YYYY-MM-DD)"),
+        Filter("end_date", WaterQualitySample.sample_date, le,
+               description="End sample date (YYYY-MM-DD)"),
+        Filter("status", WaterQualitySample.status, annotation=WaterQualityStatus, description="Filter by status"),
+    ],
+    sort_columns={
+        "id": WaterQualitySample.id,
+        "sample_date": WaterQualitySample.sample_date,
+    },
+    search_index=sample_search,
+    spatial_index=sample_locations,
+    substring_columns=[WaterQualitySample.site_name, WaterQualitySample.location],
+    # Columns written by the export endpoint, in the order of WaterQualityResponse
+    export_columns=[getattr(WaterQualitySample, name) for name in WaterQualityResponse.model_fields],
+)
+
+# Module-level names used by scripts and tests
+count_cache = samples.count_cache
+SORT_COLUMNS = samples.sort_columns
+EXPORT_COLUMNS = samples.export_columns
+filter_samples = samples.filter
+get_samples = samples.get_page
+export_samples = samples.export_query
+get_sample = samples.get
+create_sample = samples.create
+bulk_create_samples = samples.bulk_create
+update_sample = samples.update
+delete_sample = samples.delete
+drop_samples_before = samples.drop_before
+
+
+@canonical_queries
+def list_query_shapes(db: Session) -> dict:
+    """Filtered list queries that must be served by an index (checked at startup)"""
+    def page(query, sort="id"):
+        # Date-range and search queries select from only their months (an aliased model)
+        sample = query_entity(query)
+        return order_by_key(query, getattr(sample, sort), sample.id).limit(100)
+
+    return {
+        "samples by status": page(filter_samples(db, status=WaterQualityStatus.POOR)),
+        "samples by status and date range": page(
+            filter_samples(db, status=WaterQualityStatus.POOR, start_date="2025-01-01", end_date="2025-03-31"),
+            "sample_date",
+        ),
+        "samples by date range": page(
+            filter_samples(db, start_date="2025-01-01", end_date="2025-03-31"), "sample_date"
+        ),
+        "samples by search": page(filter_samples(db, search="river")),
+        "samples in a map viewport": page(filter_samples(db, bbox=(40.70, -74.02, 40.72, -73.99))),
+    }
+
 
+# Numeric columns summarised by the stats endpoint
+METRIC_COLUMNS = ["ph", "turbidity_ntu", "dissolved_oxygen_mg_l", "nitrates_mg_l", "e_coli_count"]
 
-def get_sample(db: Session, sample_id: int) -> Optional[WaterQualitySample]:
-    return db.query(WaterQualitySample).filter(WaterQualitySample.id == sample_id).first()
+_is_value = partial(is_not, None)
 
+# SQL expressions mapping sample_date to the first day of its bucket
+STATS_BUCKETS = {
+    "day": lambda column: column,
+    "week": lambda column: func.date(column, "-6 days", "weekday 1"),  # Monday on or before
+    "month": lambda column: func.strftime("%Y-%m-01", column),
+}
 
-def create_sample(db: Session, sample_data: WaterQualityCreate) -> WaterQualitySample:
-    sample = WaterQualitySample(**sample_data.model_dump())
-    db.add(sample)
-    db.commit()
-    db.refresh(sample)
-    return sample
 
+def _stats_filters(site_name, start_date, end_date, site_column, date_column) -> list:
+    conditions = []
+    if site_name:
+        conditions.append(site_column == site_name)
+    if start_date:
+        conditions.append(date_column >= start_date)
+    if end_date:
+        conditions.append(date_column <= end_date)
+    return conditions
+
+
+def _raw_aggregates(sample, bucket: str, conditions: list):
+    """count/min/max/mean per (site, bucket) straight from the samples"""
+    bucket_expr = STATS_BUCKETS[bucket](sample.sample_date)
+    aggregates = [func.count()]
+    for metric in METRIC_COLUMNS:
+        column = getattr(sample, metric)
+        aggregates += [func.count(column), func.min(column), func.max(column), func.avg(column)]
+    return (
+        select(sample.site_name, bucket_expr, *aggregates)
+        .where(*conditions)
+        .group_by(sample.site_name, bucket_expr)
+        .order_by(sample.site_name, bucket_expr)
+    )
+
+
+def _rollup_aggregates(bucket: str, conditions: list):
+    """The same aggregates combined from the per-day rollup rows"""
+    table = WaterQualityDailyRollup
+    bucket_expr = STATS_BUCKETS[bucket](table.day)
+    aggregates = [func.sum(table.samples)]
+    for metric in METRIC_COLUMNS:
+        count = func.sum(getattr(table, f"{metric}_count"))
+        aggregates += [
+            count,
+            func.min(getattr(table, f"{metric}_min")),
+            func.max(getattr(table, f"{metric}_max")),
+            func.sum(getattr(table, f"{metric}_sum")) * 1.0 / func.nullif(count, 0),
+        ]
+    return (
+        select(table.site_name, bucket_expr, *aggregates)
+        .where(*conditions)
+        .group_by(table.site_name, bucket_expr)
+        .order_by(table.site_name, bucket_expr)
+    )
+
+
+def _percentiles(db: Session, sample, bucket_expr, conditions, percentiles: list[float]) -> dict:
+    """
+    Nearest-rank percentiles of every metric per (site, bucket)
+
+    One query returns the metric columns ordered by group. Each group is
+    then transposed and sorted with C-level builtins (zip, filter, sorted),
+    so there is no Python bytecode per sample. This beats a window query
+    per metric, which costs SQLite one full sort per metric.
 
-def update_sample(db: Session, sample_id: int, sample_data: WaterQualityUpdate) -> Optional[WaterQualitySample]:
-    sample = get_sample(db, sample_id)
-    if not sample:
-        return None
+    Returns:
+        {(site_name, bucket): {metric: {"p50": value, ...}}}
+    """
+    site = sample.site_name
+    columns = [getattr(sample, metric) for metric in METRIC_COLUMNS]
+    # Core execution on the session's connection skips ORM result handling,
+    # and fetching in partitions avoids a Python call per row
+    result = db.connection().execute(
+        select(site, bucket_expr, *columns).where(*conditions).order_by(site, bucket_expr),
+        execution_options={"yield_per": 10_000},
+    )
+    rows = chain.from_iterable(result.partitions())
+
+    result = {}
+    for key, group in groupby(rows, key=itemgetter(0, 1)):
+        per_metric = {}
+        for metric, values in zip(METRIC_COLUMNS, list(zip(*group))[2:]):
+            ordered = sorted(filter(_is_value, values))
+            if ordered:
+                size = len(ordered)
+                per_metric[metric] = {
+                    f"p{p:g}": ordered[max(1, math.ceil(size * p / 100.0)) - 1] for p in percentiles
+                }
+        result[key] = per_metric
+    return result
+
+
+def get_stats(
+    db: Session,
+    bucket: str = "day",
+    site_name: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    percentiles: Optional[list[float]] = None,
+    use_rollup: bool = True
+) -> list[dict]:
+    """
+    Aggregate sample metrics per site and time bucket
 
-    update_data = sample_data.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(sample, field, value)
+    Count, min, max and mean are combined from the daily rollup table
+    (or, with use_rollup=False, a GROUP BY over raw samples). Date filters
+    are whole days, so the rollup covers a range exactly and there are no
+    partial edge days to patch from raw rows. Percentiles cannot be
+    rolled up; when requested they are computed from the raw samples,
+    reading only the months in the date range.
 
-    db.commit()
-    db.refresh(sample)
-    return sample
+    Returns:
+        One dict per (site_name, bucket_start), ordered by site then bucket
+    """
+    sample = sample_partitions.entity(db, start_date, end_date)
+    raw_filters = _stats_filters(site_name, start_date, end_date, sample.site_name, sample.sample_date)
+    if use_rollup:
+        table = WaterQualityDailyRollup
+        query = _rollup_aggregates(
+            bucket, _stats_filters(site_name, start_date, end_date, table.site_name, table.day)
+        )
+    else:
+        query = _raw_aggregates(sample, bucket, raw_filters)
+    rows = db.execute(query).all()
 
+    ranked = {}
+    if percentiles:
+        ranked = _percentiles(db, sample, STATS_BUCKETS[bucket](sample.sample_date), raw_filters, percentiles)
 
-def delete_sample(db: Session, sample_id: int) -> bool:
-    sample = get_sample(db, sample_id)
-    if not sample:
-        return False
-    db.delete(sample)
-    db.commit()
-    return True
+    groups = []
+    for row in rows:
+        site, bucket_start, samples = row[0], row[1], row[2]
+        metrics = {}
+        for index, metric in enumerate(METRIC_COLUMNS):
+            count, low, high, mean = row[3 + index * 4: 7 + index * 4]
+            metrics[metric] = {
+                "count": count,
+                "min": low,
+                "max": high,
+                "mean": mean,
+                "percentiles": ranked.get((site, bucket_start), {}).get(metric, {}),
+            }
+        groups.append({"site_name": site, "bucket_start": bucket_start, "samples": samples, "metrics": metrics})
+    return groups
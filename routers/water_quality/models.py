@@ -1,8 +1,12 @@
 """
 Water Quality database model
 """
-from sqlalchemy import Column, String, Float, Date, Integer, Enum as SQLEnum
-from models.base import BaseModel
+from sqlalchemy import Column, String, Float, Date, Integer, Index, Enum as SQLEnum
+from database import Base
+from models.base import BaseModel, GeoMixin
+from core.partitions import MonthlyPartitions
+from core.search import FullTextIndex
+from core.spatial import SpatialIndex
 import enum
 
 
@@ -14,12 +18,24 @@ class WaterQualityStatus(str, enum.Enum):
     UNSAFE = "unsafe"
 
 
-class WaterQualitySample(BaseModel):
+class WaterQualitySample(BaseModel, GeoMixin):
     """
     Water quality sample model
-    Tracks sensor/site samples and common water quality metrics
+    Tracks sensor/site samples and common water quality metrics.
+    Stored in monthly partitions by sample_date (see sample_partitions);
+    the table name is a view over all of them.
     """
     __tablename__ = "water_quality_samples"
+    __table_args__ = (
+        # status filter, paged in id order (the default sort)
+        Index("ix_water_quality_samples_status_id", "status", "id"),
+        # status filter with an optional date range, paged by (sample_date, id)
+        Index("ix_water_quality_samples_status_sample_date_id", "status", "sample_date", "id"),
+        # date range without a status filter, and sort=sample_date
+        Index("ix_water_quality_samples_sample_date_id", "sample_date", "id"),
+        # one site's samples for a day (daily rollup maintenance)
+        Index("ix_water_quality_samples_site_name_sample_date", "site_name", "sample_date"),
+    )
 
     site_name = Column(String, nullable=False, index=True)
     location = Column(String, nullable=False)
@@ -38,3 +54,60 @@ class WaterQualitySample(BaseModel):
 
     def __repr__(self):
         return f"<WaterQualitySample(id={self.id}, site='{self.site_name}', date={self.sample_date})>"
+
+
+class WaterQualityDailyRollup(Base):
+    """
+    Per-site, per-day aggregates of the sample metrics
+    Maintained by rollup.py whenever samples change; the stats endpoint
+    reads these rows instead of scanning raw samples
+    """
+    __tablename__ = "water_quality_daily_rollups"
+
+    site_name = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    samples = Column(Integer, nullable=False)
+
+    ph_count = Column(Integer, nullable=False)
+    ph_sum = Column(Float, nullable=True)
+    ph_min = Column(Float, nullable=True)
+    ph_max = Column(Float, nullable=True)
+
+    turbidity_ntu_count = Column(Integer, nullable=False)
+    turbidity_ntu_sum = Column(Float, nullable=True)
+    turbidity_ntu_min = Column(Float, nullable=True)
+    turbidity_ntu_max = Column(Float, nullable=True)
+
+    dissolved_oxygen_mg_l_count = Column(Integer, nullable=False)
+    dissolved_oxygen_mg_l_sum = Column(Float, nullable=True)
+    dissolved_oxygen_mg_l_min = Column(Float, nullable=True)
+    dissolved_oxygen_mg_l_max = Column(Float, nullable=True)
+
+    nitrates_mg_l_count = Column(Integer, nullable=False)
+    nitrates_mg_l_sum = Column(Float, nullable=True)
+    nitrates_mg_l_min = Column(Float, nullable=True)
+    nitrates_mg_l_max = Column(Float, nullable=True)
+
+    e_coli_count_count = Column(Integer, nullable=False)
+    e_coli_count_sum = Column(Integer, nullable=True)
+    e_coli_count_min = Column(Integer, nullable=True)
+    e_coli_count_max = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        # date range across all sites
+        Index("ix_water_quality_daily_rollups_day", "day"),
+    )
+
+
+# One table per month of sample_date behind a view named water_quality_samples;
+# crud.py routes writes and prunes date-range reads
+sample_partitions = MonthlyPartitions(WaterQualitySample, "sample_date")
+
+# FTS5 shadow table used by the `search` filter; kept in sync by crud.py.
+# A plain search matches site_name/location; notes only when asked for (search_in)
+sample_search = FullTextIndex(
+    "water_quality_samples", ["site_name", "location", "notes"], searched=["site_name", "location"]
+)
+
+# R*Tree over latitude/longitude used by the bbox / near filters; kept in sync by crud.py
+sample_locations = SpatialIndex("water_quality_samples")
@@ -0,0 +1,39 @@
+"""
+Retention for water quality samples
+
+Samples are stored in monthly partitions, so old data is removed by
+dropping whole months rather than deleting rows. Their search, spatial
+and daily rollup rows go in the same transaction.
+
+Drop every month that ends before a date:
+    python -m routers.water_quality.retention drop-before 2016-01-01
+"""
+import sys
+from datetime import date
+
+
+def main(argv: list[str]) -> int:
+    if len(argv) != 2 or argv[0] != "drop-before":
+        print("usage: python -m routers.water_quality.retention drop-before YYYY-MM-DD")
+        return 2
+    try:
+        before = date.fromisoformat(argv[1])
+    except ValueError:
+        print(f"not a date: {argv[1]}")
+        return 2
+    from core.migrations import ensure_schema
+    from database import SessionLocal, engine
+    from .crud import drop_samples_before
+
+    ensure_schema(engine)
+    db = SessionLocal()
+    try:
+        dropped = drop_samples_before(db, before)
+        print(f"Dropped {dropped} samples from the months before {before:%Y-%m}")
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,115 @@
+"""
+Daily rollup maintenance for water quality samples
+
+Every write recomputes the rollup rows of the (site, day) pairs it
+touched, inside the same transaction, using the same aggregate query as
+a full rebuild. Incremental maintenance therefore produces exactly the
+rows a rebuild would.
+
+Rebuild from scratch:
+    python -m routers.water_quality.rollup rebuild
+"""
+import sys
+from typing import Iterable
+
+from sqlalchemy import delete, func, insert, select, tuple_
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from core.migrations import migration_step
+from .models import WaterQualityDailyRollup, WaterQualitySample, sample_partitions
+
+# Numeric columns rolled up per day (same order as crud.METRIC_COLUMNS)
+METRICS = ["ph", "turbidity_ntu", "dissolved_oxygen_mg_l", "nitrates_mg_l", "e_coli_count"]
+
+_ROLLUP_COLUMNS = ["site_name", "day", "samples"] + [
+    f"{metric}_{part}" for metric in METRICS for part in ("count", "sum", "min", "max")
+]
+
+
+def _aggregate(sample, *conditions):
+    """Per (site, day) aggregates of raw samples matching conditions"""
+    columns = [
+        sample.site_name,
+        sample.sample_date,
+        func.count(),
+    ]
+    for metric in METRICS:
+        column = getattr(sample, metric)
+        columns += [func.count(column), func.sum(column), func.min(column), func.max(column)]
+    return (
+        select(*columns)
+        .where(*conditions)
+        .group_by(sample.site_name, sample.sample_date)
+    )
+
+
+def refresh_days(db: Session, keys: Iterable[tuple]) -> None:
+    """
+    Recompute the rollup rows for the given (site_name, day) pairs
+
+    Runs in the caller's transaction; pending ORM changes are flushed
+    first so the aggregate sees them. Only the monthly partitions of the
+    days are read.
+    """
+    keys = list({(site, day) for site, day in keys})
+    if not keys:
+        return
+    db.flush()
+    rollup = WaterQualityDailyRollup.__table__
+    for start in range(0, len(keys), 500):
+        chunk = keys[start:start + 500]
+        days = [day for _, day in chunk]
+        sample = sample_partitions.entity(db, min(days), max(days))
+        db.execute(delete(rollup).where(tuple_(rollup.c.site_name, rollup.c.day).in_(chunk)))
+        db.execute(insert(rollup).from_select(
+            _ROLLUP_COLUMNS,
+            _aggregate(sample, tuple_(sample.site_name, sample.sample_date).in_(chunk)),
+        ))
+
+
+def rebuild(db: Session) -> None:
+    """Recreate every rollup row from the raw samples"""
+    rollup = WaterQualityDailyRollup.__table__
+    db.execute(delete(rollup))
+    db.execute(insert(rollup).from_select(_ROLLUP_COLUMNS, _aggregate(WaterQualitySample)))
+
+
+def drop_before(db: Session, day) -> None:
+    """Remove the rollup rows of days before `day` (their samples were dropped by retention)"""
+    rollup = WaterQualityDailyRollup.__table__
+    db.execute(delete(rollup).where(rollup.c.day < day))
+
+
+@migration_step
+def ensure_rollups(bind: Engine) -> None:
+    """Build the rollup table when it is empty but samples exist (e.g. right after it was added)"""
+    db = Session(bind=bind)
+    try:
+        if db.query(WaterQualityDailyRollup.day).first() is None and db.query(WaterQualitySample.id).first():
+            rebuild(db)
+            db.commit()
+    finally:
+        db.close()
+
+
+def main(argv: list[str]) -> int:
+    if argv != ["rebuild"]:
+        print("usage: python -m routers.water_quality.rollup rebuild")
+        return 2
+    from core.migrations import ensure_schema
+    from database import SessionLocal, engine
+
+    ensure_schema(engine)
+    db = SessionLocal()
+    try:
+        rebuild(db)
+        db.commit()
+        print(f"Rebuilt {db.query(WaterQualityDailyRollup).count()} daily rollup rows")
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -2,74 +2,74 @@
 Water Quality Router
 FastAPI endpoints for water quality sample management
 """
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import Literal, Optional
 
-from database import get_db
+from database import get_read_session, run_db
+from core.resource import ResourceRouter
 from .schemas import (
     WaterQualityCreate,
     WaterQualityUpdate,
     WaterQualityResponse,
     WaterQualityListResponse,
+    WaterQualityStatsResponse,
 )
 from . import crud
-from .models import WaterQualityStatus
 
-router = APIRouter()
+router = ResourceRouter(
+    crud.samples,
+    create_schema=WaterQualityCreate,
+    update_schema=WaterQualityUpdate,
+    response_schema=WaterQualityResponse,
+    list_schema=WaterQualityListResponse,
+    list_field="samples",
+    label="Sample",
+    export_name="water_quality",
+    bulk=True,
+)
+
+
+def _parse_percentiles(raw: Optional[str]) -> list[float]:
+    if not raw:
+        return []
+    try:
+        values = [float(part) for part in raw.split(",") if part.strip()]
+    except ValueError:
+        values = [-1.0]
+    if any(not 0 < value <= 100 for value in values):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="percentiles must be comma-separated numbers in (0, 100]",
+        )
+    return values
 
 
-@router.get("/", response_model=WaterQualityListResponse)
-def list_samples(
-    skip: int = Query(0, ge=0),
-    limit: int = Query(100, ge=1, le=500),
+@router.get("/stats", response_model=WaterQualityStatsResponse)
+async def sample_stats(
+    bucket: Literal["day", "week", "month"] = Query("day", description="Time bucket over sample_date"),
+    site_name: Optional[str] = Query(None, description="Only this site"),
     start_date: Optional[str] = Query(None, description="Start sample date (YYYY-MM-DD)"),
     end_date: Optional[str] = Query(None, description="End sample date (YYYY-MM-DD)"),
-    status: Optional[WaterQualityStatus] = Query(None, description="Filter by status"),
-    search: Optional[str] = Query(None, description="Search site name or location"),
-    db: Session = Depends(get_db)
+    percentiles: Optional[str] = Query(None, description="Comma-separated percentiles, e.g. 50,90,95"),
+    db: Session = Depends(get_read_session),
 ):
-    """List water quality samples with optional filtering"""
-    samples, total = crud.get_samples(
-        db=db,
-        skip=skip,
-        limit=limit,
+    """
+    Aggregate metrics per site and day, week (starting Monday) or month
+
+    Returns count, min, max and mean for every metric, computed in SQL.
+    Percentiles are opt-in because each one needs a sort per metric.
+    """
+    groups = await run_db(
+        db,
+        crud.get_stats,
+        bucket=bucket,
+        site_name=site_name,
         start_date=start_date,
         end_date=end_date,
-        status=status,
-        search=search,
+        percentiles=_parse_percentiles(percentiles),
     )
-    return WaterQualityListResponse(total=total, samples=samples)
-
-
-@router.post("/", response_model=WaterQualityResponse, status_code=status.HTTP_201_CREATED)
-def create_sample(sample: WaterQualityCreate, db: Session = Depends(get_db)):
-    """Create a new water quality sample"""
-    return crud.create_sample(db=db, sample_data=sample)
-
-
-@router.get("/{sample_id}", response_model=WaterQualityResponse)
-def get_sample(sample_id: int, db: Session = Depends(get_db)):
-    """Get a specific water quality sample by ID"""
-    s = crud.get_sample(db=db, sample_id=sample_id)
-    if not s:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Sample with id {sample_id} not found")
-    return s
-
-
-@router.put("/{sample_id}", response_model=WaterQualityResponse)
-def update_sample(sample_id: int, sample: WaterQualityUpdate, db: Session = Depends(get_db)):
-    """Update an existing water quality sample"""
-    updated = crud.update_sample(db=db, sample_id=sample_id, sample_data=sample)
-    if not updated:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Sample with id {sample_id} not found")
-    return updated
+    return WaterQualityStatsResponse(bucket=bucket, groups=groups)
 
 
-@router.delete("/{sample_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_sample(sample_id: int, db: Session = Depends(get_db)):
-    """Delete a water quality sample"""
-    deleted = crud.delete_sample(db=db, sample_id=sample_id)
-    if not deleted:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Sample with id {sample_id} not found")
-    return None
+router.add_item_routes()
@@ -10,6 +10,8 @@ from .models import WaterQualityStatus
 class WaterQualityBase(BaseModel):
     site_name: str = Field(..., min_length=1, max_length=200)
     location: str = Field(..., min_length=1, max_length=300)
+    latitude: Optional[float] = Field(None, ge=-90, le=90, description="Latitude (WGS84 degrees)")
+    longitude: Optional[float] = Field(None, ge=-180, le=180, description="Longitude (WGS84 degrees)")
     sample_date: date
 
     ph: Optional[float] = Field(None, description="pH value")
@@ -31,6 +33,8 @@ class WaterQualityUpdate(BaseModel):
     """Schema for updating a sample - all fields optional"""
     site_name: Optional[str] = Field(None, min_length=1, max_length=200)
     location: Optional[str] = Field(None, min_length=1, max_length=300)
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
     sample_date: Optional[date] = None
 
     ph: Optional[float] = None
@@ -52,5 +56,31 @@ class WaterQualityResponse(WaterQualityBase):
 
 
 class WaterQualityListResponse(BaseModel):
-    total: int
+    total: Optional[int] = Field(None, description="Matching rows; null when include_total=false")
+    total_is_estimate: bool = Field(
+        False, description="total may be approximate: include_total=estimate with only bbox/near, where a "
+                           "dense area is estimated from the spatial index"
+    )
     samples: list[WaterQualityResponse]
+    next_cursor: Optional[str] = Field(None, description="Cursor for the next page, null on the last page")
+
+
+class MetricStats(BaseModel):
+    """Summary of one metric within a site/time bucket"""
+    count: int = Field(..., description="Samples with a value for this metric")
+    min: Optional[float] = None
+    max: Optional[float] = None
+    mean: Optional[float] = None
+    percentiles: dict[str, float] = Field(default_factory=dict, description='Nearest-rank percentiles, e.g. {"p90": 7.9}')
+
+
+class WaterQualityStatsGroup(BaseModel):
+    site_name: str
+    bucket_start: date
+    samples: int
+    metrics: dict[str, MetricStats]
+
+
+class WaterQualityStatsResponse(BaseModel):
+    bucket: str
+    groups: list[WaterQualityStatsGroup]
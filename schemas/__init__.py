@@ -1,2 +1,4 @@
 """Schemas package"""
-from .base import BaseResponse, TimestampMixin
+from .base import (
+    BaseResponse, BulkDeleteResponse, BulkResponse, BulkRowError, BulkUpdateResponse, TimestampMixin
+)
@@ -2,7 +2,7 @@
 Base Pydantic schemas
 Students can inherit from these for consistent response formatting
 """
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 from datetime import datetime
 from typing import Optional
 
@@ -20,3 +20,28 @@ class BaseResponse(BaseModel):
     id: int
     
     model_config = ConfigDict(from_attributes=True)
+
+
+class BulkRowError(BaseModel):
+    """Validation errors for one row of a bulk upload"""
+    index: int = Field(..., description="Zero-based position of the row in the upload")
+    errors: list[dict]
+
+
+class BulkResponse(BaseModel):
+    """Result of a bulk upload"""
+    created: int
+    ids: list[int]
+    errors: list[BulkRowError]
+
+
+class BulkUpdateResponse(BaseModel):
+    """Result of a bulk update"""
+    updated: int
+    ids: list[int] = Field(..., description="IDs of the updated rows")
+
+
+class BulkDeleteResponse(BaseModel):
+    """Result of a delete by filter"""
+    deleted: int
+    ids: list[int] = Field(..., description="IDs of the deleted rows")
@@ -6,8 +6,27 @@ To run tests:
 1. Install pytest: pip install pytest httpx
 2. Run: pytest test_bridges_example.py -v
 """
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+from datetime import date, timedelta
+
+from fastapi import FastAPI
 from fastapi.testclient import TestClient
+from sqlalchemy.exc import IntegrityError
 from main import app
+import database
+from core import metrics, replicas, spatial, workers
+from core.migrations import SCHEMA_VERSION, migrate, schema_fingerprint, schema_version
+from core.query_plan import check_query_plans
+from core.routing import LazyRouters
+from routers import ROUTERS
+from routers.bridges.crud import bridges
+from routers.bridges.schemas import BridgeListResponse, BridgeUpdate
 
 client = TestClient(app)
 
@@ -111,5 +130,437 @@ def test_search_bridges():
     assert response.status_code == 200
 
 
+def test_cursor_pagination():
+    """Test walking bridges page by page with next_cursor"""
+    for _ in range(3):
+        create_bridge_helper()
+
+    first = client.get("/api/bridges/?limit=2&sort=name").json()
+    assert len(first["bridges"]) == 2
+    assert first["next_cursor"]
+
+    second = client.get(f"/api/bridges/?limit=2&sort=name&cursor={first['next_cursor']}").json()
+    first_ids = {b["id"] for b in first["bridges"]}
+    assert not first_ids & {b["id"] for b in second["bridges"]}
+
+    # A cursor page matches the equivalent offset page
+    offset_page = client.get("/api/bridges/?limit=2&sort=name&skip=2").json()
+    assert [b["id"] for b in offset_page["bridges"]] == [b["id"] for b in second["bridges"]]
+
+
+def test_invalid_cursor():
+    """Test that a malformed cursor is rejected"""
+    response = client.get("/api/bridges/?cursor=not-a-cursor")
+    assert response.status_code == 400
+
+
+def test_include_total_modes():
+    """Test skipping the total and serving it from the count cache"""
+    response = client.get("/api/bridges/?include_total=false")
+    assert response.status_code == 200
+    assert response.json()["total"] is None
+
+    exact = client.get("/api/bridges/?include_total=exact").json()["total"]
+    cached = client.get("/api/bridges/?include_total=estimate").json()
+    assert cached["total"] == exact and cached["total_is_estimate"] is False
+
+    # Writes invalidate the cached count
+    create_bridge_helper()
+    assert client.get("/api/bridges/?include_total=estimate").json()["total"] == exact + 1
+
+
+def test_full_text_search_prefix_and_sync():
+    """Test that search matches word prefixes of name and location and follows updates and deletes"""
+    bridge_id = create_bridge_helper()
+    client.put(f"/api/bridges/{bridge_id}", json={"name": "Zygomorphic Span", "notes": "Quillwort expansion joints"})
+
+    data = client.get("/api/bridges/?search=zygomor").json()
+    assert [b["id"] for b in data["bridges"]] == [bridge_id]
+    assert client.get("/api/bridges/?search=quillwort").json()["bridges"] == []
+    notes = client.get("/api/bridges/?search=quillwort&search_in=notes").json()
+    assert [b["id"] for b in notes["bridges"]] == [bridge_id] and notes["total"] == 1
+    assert client.get("/api/bridges/?search=quillwort&search_in=name,location").json()["bridges"] == []
+    assert client.get("/api/bridges/?search=quillwort&search_in=inspector").status_code == 400
+    # A term without any words matches nothing instead of scanning every row
+    tokenless = client.get("/api/bridges/?search=%25%25").json()
+    assert tokenless["bridges"] == [] and tokenless["total"] == 0
+
+    ranked = client.get("/api/bridges/?search=zygomor&sort=relevance")
+    assert ranked.status_code == 200
+
+    client.delete(f"/api/bridges/{bridge_id}")
+    assert client.get("/api/bridges/?search=zygomor").json()["bridges"] == []
+
+
+def test_substring_search_fallback():
+    """Test the legacy substring search mode"""
+    response = client.get("/api/bridges/?search=est Bri&search_mode=substring")
+    assert response.status_code == 200
+    assert all("est Bri" in b["name"] or "est Bri" in b["location"] for b in response.json()["bridges"])
+    assert client.get("/api/bridges/?sort=relevance").status_code == 400
+
+
+def test_export_bridges():
+    """Test streaming bridges as NDJSON and CSV"""
+    bridge_id = create_bridge_helper()
+
+    response = client.get("/api/bridges/export?condition=good")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert bridge_id in {row["id"] for row in rows}
+    assert all(row["condition"] == "good" for row in rows)
+    assert rows[0].keys() == client.get(f"/api/bridges/{bridge_id}").json().keys()
+
+    response = client.get("/api/bridges/export?format=csv")
+    assert response.status_code == 200
+    header = response.text.splitlines()[0].split(",")
+    assert header[0] == "name" and "id" in header
+
+
+def test_conditional_get_and_invalidation():
+    """Test ETag revalidation and that writes invalidate cached responses"""
+    bridge_id = create_bridge_helper()
+
+    first = client.get(f"/api/bridges/{bridge_id}")
+    etag = first.headers["etag"]
+    before = client.get("/cache/stats").json()
+    response = client.get(f"/api/bridges/{bridge_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    after = client.get("/cache/stats").json()
+    assert after["hits"] == before["hits"] + 1
+    assert after["not_modified"] == before["not_modified"] + 1
+
+    client.put(f"/api/bridges/{bridge_id}", json={"condition": "poor"})
+    response = client.get(f"/api/bridges/{bridge_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["condition"] == "poor"
+    assert response.headers["etag"] != etag
+
+
+def test_fast_list_serialization_matches_schema():
+    """List pages encoded from column tuples match the Pydantic JSON contract"""
+    bridge_id = create_bridge_helper()
+    client.put(f"/api/bridges/{bridge_id}", json={"notes": "Über die Brücke", "next_inspection_date": "2030-01-31"})
+
+    response = client.get("/api/bridges/?sort=name&limit=500&search=Test")
+    assert response.headers["content-type"] == "application/json"
+    page = response.json()
+    assert BridgeListResponse.model_validate(page).model_dump(mode="json") == page
+    listed = next(b for b in page["bridges"] if b["id"] == bridge_id)
+    assert listed == client.get(f"/api/bridges/{bridge_id}").json()
+
+
+def test_fields_projection():
+    """fields= returns only the requested columns (plus id)"""
+    bridge_id = create_bridge_helper()
+
+    response = client.get("/api/bridges/?fields=name,location,condition&sort=name&limit=2")
+    assert response.status_code == 200
+    page = response.json()
+    assert all(set(b) == {"id", "name", "location", "condition"} for b in page["bridges"])
+    next_page = client.get(f"/api/bridges/?fields=name&sort=name&limit=2&cursor={page['next_cursor']}").json()
+    assert next_page["bridges"][0]["name"] >= page["bridges"][-1]["name"]
+
+    detail = client.get(f"/api/bridges/{bridge_id}?fields=condition").json()
+    assert detail == {"id": bridge_id, "condition": "good"}
+
+    response = client.get("/api/bridges/?fields=name,secret")
+    assert response.status_code == 400
+    assert "secret" in response.json()["detail"]
+
+
+def test_bulk_update_and_delete_by_filter():
+    """Set-based bulk update and delete return affected ids and keep search in sync"""
+    first, second = create_bridge_helper(), create_bridge_helper()
+    before = client.get(f"/api/bridges/{first}").json()
+
+    response = client.patch("/api/bridges/bulk", json={"items": [
+        {"id": first, "changes": {"condition": "critical"}},
+        {"id": second, "changes": {"condition": "critical"}},
+        {"id": 10 ** 9, "changes": {"condition": "critical"}},
+    ]})
+    assert response.status_code == 200
+    assert sorted(response.json()["ids"]) == [first, second]
+    updated = client.get(f"/api/bridges/{first}").json()
+    assert updated["condition"] == "critical"
+    assert updated["updated_at"] >= before["updated_at"]
+
+    response = client.patch(
+        "/api/bridges/bulk", json={"filter": {"condition": "critical"}, "changes": {"name": "Weightlimitcrossing"}}
+    )
+    assert {first, second} <= set(response.json()["ids"])
+    found = {b["id"] for b in client.get("/api/bridges/?search=weightlimit").json()["bridges"]}
+    assert {first, second} <= found
+
+    assert client.patch("/api/bridges/bulk", json={"filter": {}, "changes": {"notes": "x"}}).status_code == 400
+    # Top-level changes apply to a filter only; with items they would be dropped
+    mixed = {"items": [{"id": 1, "changes": {"notes": "x"}}], "changes": {"notes": "y"}}
+    assert client.patch("/api/bridges/bulk", json=mixed).status_code == 400
+    assert client.delete("/api/bridges/").status_code == 400
+
+    response = client.delete("/api/bridges/?condition=critical")
+    assert response.status_code == 200
+    assert {first, second} <= set(response.json()["ids"])
+    assert client.get(f"/api/bridges/{first}").status_code == 404
+    assert client.get("/api/bridges/?search=weightlimit").json()["bridges"] == []
+
+
+def test_single_row_writes_return_rows():
+    """Create/update/delete are single RETURNING statements with the usual 404s"""
+    created = create_bridge_helper(full_result=True).json()
+    assert created["created_at"] and created["updated_at"]
+
+    response = client.put(f"/api/bridges/{created['id']}", json={"material": "steel"})
+    assert response.status_code == 200
+    assert response.json()["material"] == "steel"
+    assert response.json()["name"] == created["name"]
+    assert response.json()["updated_at"] >= created["updated_at"]
+
+    assert client.put("/api/bridges/999999999", json={"material": "steel"}).status_code == 404
+    assert client.delete("/api/bridges/999999999").status_code == 404
+    assert client.delete(f"/api/bridges/{created['id']}").status_code == 204
+    assert client.delete(f"/api/bridges/{created['id']}").status_code == 404
+
+
+def test_metrics_and_slow_query_log(caplog, monkeypatch):
+    """Per-route latency and query counts are exported; slow statements are logged"""
+    bridge_id = create_bridge_helper()
+    route = ("GET", "/api/bridges/{item_id}")
+    requests_before = metrics.REQUEST_QUERIES.count(*route)
+    queries_before = metrics.REQUEST_QUERIES.sum(*route)
+
+    monkeypatch.setattr(metrics, "SLOW_QUERY_MS", 0)
+    with caplog.at_level(logging.WARNING, logger="city_infrastructure.slow_query"):
+        client.get(f"/api/bridges/{bridge_id}?fields=name")
+    assert metrics.REQUEST_QUERIES.count(*route) == requests_before + 1
+    assert metrics.REQUEST_QUERIES.sum(*route) == queries_before + 1
+    assert any(f"GET /api/bridges/{bridge_id}" in record.getMessage() for record in caplog.records)
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    assert '# TYPE http_request_duration_seconds histogram' in text
+    assert 'http_request_db_queries_count{method="GET",route="/api/bridges/{item_id}"}' in text
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/api/bridges/{item_id}",status="200",le="+Inf"}' in text
+
+
+def test_bbox_and_near_filters(monkeypatch):
+    """Locations are indexed on write and answer bbox / near queries"""
+    response = create_bridge_helper(full_result=True)
+    bridge_id = response.json()["id"]
+    assert response.json()["latitude"] is None
+    client.put(f"/api/bridges/{bridge_id}", json={"latitude": -33.8568, "longitude": 151.2153})
+
+    def ids(query):
+        response = client.get(f"/api/bridges/?{query}")
+        assert response.status_code == 200, response.text
+        return {b["id"] for b in response.json()["bridges"]}
+
+    assert bridge_id in ids("bbox=-33.9,151.2,-33.8,151.3")
+    assert bridge_id not in ids("bbox=-33.85,151.2,-33.8,151.3")
+    assert bridge_id in ids("near=-33.857,151.215&radius_m=200")
+    assert bridge_id not in ids("near=-33.86,151.215&radius_m=200")
+
+    client.put(f"/api/bridges/{bridge_id}", json={"latitude": 51.5, "longitude": -0.12})
+    assert bridge_id not in ids("bbox=-33.9,151.2,-33.8,151.3")
+    assert bridge_id in ids("near=51.5,-0.12&radius_m=10")
+    # Dense areas skip the R*Tree lookup and check coordinates while paging
+    monkeypatch.setattr(spatial, "DENSE_CANDIDATES", 1)
+    assert bridge_id in ids("near=51.5,-0.12&radius_m=20")
+    assert bridge_id not in ids("bbox=-33.9,151.2,-33.8,151.3&limit=7")
+
+    # An exact total counts the rows; an estimate of a dense area reads the R*Tree alone
+    exact = client.get("/api/bridges/?bbox=51.4,-0.2,51.6,0&include_total=exact").json()
+    assert exact["total"] == 1 and exact["total_is_estimate"] is False
+
+    def no_count(*args, **kwargs):
+        raise AssertionError("a dense area was counted row by row")
+
+    monkeypatch.setattr(bridges, "count", no_count)
+    estimate = client.get("/api/bridges/?bbox=51.4,-0.2,51.6,0&include_total=estimate").json()
+    assert estimate["total"] == 1 and estimate["total_is_estimate"] is True
+    assert client.get("/api/bridges/?near=51.5,-0.12&radius_m=20&include_total=estimate").json()["total"] == 1
+    # The startup plan check verifies the R*Tree path even when every area is dense
+    monkeypatch.setattr(spatial, "DENSE_CANDIDATES", 0)
+    check_query_plans(database.engine)
+    monkeypatch.undo()
+
+    assert client.get("/api/bridges/?bbox=1,2,3").status_code == 400
+    assert client.get("/api/bridges/?bbox=10,0,5,1").status_code == 400
+    assert client.get("/api/bridges/?near=51.5,-0.12").status_code == 400
+
+    client.delete(f"/api/bridges/{bridge_id}")
+    assert bridge_id not in ids("near=51.5,-0.12&radius_m=10")
+
+
+def test_writes_through_writer_process(tmp_path, monkeypatch):
+    """In multi-worker mode the writer process commits every write, several per transaction"""
+    address, authkey = str(tmp_path / "writer.sock"), b"test"
+    writer = workers.Writer(address, authkey)
+    threading.Thread(target=writer.serve_forever, daemon=True).start()
+    writer_client = workers.WriterClient(address, authkey)
+    monkeypatch.setattr(workers, "client", writer_client)
+    try:
+        bridge_id = create_bridge_helper()
+        etag = client.get("/api/bridges/?limit=5").headers["etag"]
+        assert client.put(f"/api/bridges/{bridge_id}", json={"material": "steel"}).json()["material"] == "steel"
+        assert client.get(f"/api/bridges/{bridge_id}").json()["material"] == "steel"
+        # The writer's invalidation reached this worker's response cache
+        assert client.get("/api/bridges/?limit=5").headers["etag"] != etag
+        assert client.put("/api/bridges/999999999", json={"material": "steel"}).status_code == 404
+
+        # A failing write in a batch only rolls back itself
+        async def burst():
+            updates = [
+                writer_client.submit(bridges.update, row_id=bridge_id, data=BridgeUpdate(notes=f"note {i}"))
+                for i in range(5)
+            ]
+            failing = writer_client.submit(bridges.update, row_id=bridge_id, data=BridgeUpdate(name=None))
+            return await asyncio.gather(*updates, failing, return_exceptions=True)
+
+        results = asyncio.run(burst())
+        assert isinstance(results[-1], IntegrityError)
+        assert [row.notes for row in results[:-1]] == [f"note {i}" for i in range(5)]
+        assert client.get(f"/api/bridges/{bridge_id}").json()["notes"] == "note 4"
+        assert client.delete(f"/api/bridges/{bridge_id}").status_code == 204
+    finally:
+        writer_client.close()
+        writer.close()
+
+
+def test_production_profile_pragmas(tmp_path):
+    """DB_PROFILE=production connections use WAL, relaxed fsync, a busy timeout and mmap"""
+    script = (
+        "import json, database\n"
+        "with database.engine.connect() as conn:\n"
+        "    pragmas = ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size')\n"
+        "    values = {name: conn.exec_driver_sql(f'PRAGMA {name}').scalar() for name in pragmas}\n"
+        "print(json.dumps({'pool_size': database.engine.pool.size(), **values}))\n"
+    )
+    env = dict(os.environ, DB_PROFILE="production", DATABASE_URL=f"sqlite:///{tmp_path / 'production.db'}")
+    output = subprocess.run([sys.executable, "-c", script], env=env, check=True, capture_output=True, text=True).stdout
+    assert json.loads(output.strip().splitlines()[-1]) == {
+        "pool_size": 40, "journal_mode": "wal", "synchronous": 1, "busy_timeout": 5000, "mmap_size": 268435456,
+    }
+
+
+def test_routers_load_on_first_use():
+    """Routers are included on the first request under their prefix, or all for the OpenAPI schema"""
+    lazy_app = FastAPI()
+    LazyRouters(lazy_app, ROUTERS)
+    lazy_client = TestClient(lazy_app)
+    paths = lambda: {getattr(route, "path", None) for route in lazy_app.routes}  # noqa: E731
+    assert "/api/bridges/" not in paths()
+
+    assert lazy_client.get("/api/bridges/?limit=1").status_code == 200
+    assert "/api/bridges/" in paths() and "/api/water-quality/" not in paths()
+    assert lazy_client.get("/api/unknown").status_code == 404
+
+    assert "/api/water-quality/" in lazy_client.get("/openapi.json").json()["paths"]
+    assert "/api/water-quality/" in paths()
+
+
+def test_schema_version_matches_models():
+    assert schema_fingerprint() == SCHEMA_VERSION, (
+        "the declared schema changed: set core.migrations.SCHEMA_VERSION to "
+        "the output of `python -m core.migrations --fingerprint`"
+    )
+
+
+def test_migrate_is_repeatable(tmp_path):
+    """migrate() runs again on a database it has already migrated, empty or built by the benchmarks"""
+    from bench.common import create_database, fill_bridges, fill_samples
+
+    empty_engine = database.create_profiled_engine(f"sqlite:///{tmp_path / 'empty.db'}")
+    bench_engine = create_database(str(tmp_path / "bench.db"))
+    try:
+        fill_bridges(bench_engine, 200)
+        fill_samples(bench_engine, 200)
+        for engine in (empty_engine, bench_engine):
+            for _ in range(2):
+                migrate(engine)
+                assert schema_version(engine) == SCHEMA_VERSION
+    finally:
+        empty_engine.dispose()
+        bench_engine.dispose()
+
+
+def test_list_reads_from_replica(tmp_path, monkeypatch):
+    """Lists read a refreshed replica; consistency=strong and reads by id see the primary"""
+    monkeypatch.setattr(replicas, "_replicas", [])
+    url = f"sqlite:///{tmp_path / 'replica.db'}"
+    replica = replicas.Replica(url, database.create_profiled_engine(url), database.create_profiled_async_engine(url))
+    replica_set = replicas.ReplicaSet([replica])
+    monkeypatch.setattr(database, "replicas", replica_set)
+
+    bridge_id = create_bridge_helper()
+    try:
+        assert client.put(f"/api/bridges/{bridge_id}", json={"name": "Zqreplica Crossing"}).status_code == 200
+        replica_set.refresh(database.engine)
+        assert client.put(f"/api/bridges/{bridge_id}", json={"notes": "after refresh"}).status_code == 200
+
+        def notes(consistency="eventual"):
+            response = client.get(f"/api/bridges/?search=zqreplica&consistency={consistency}")
+            assert response.status_code == 200
+            return [bridge["notes"] for bridge in response.json()["bridges"]]
+
+        assert notes() == [None]
+        assert notes("strong") == ["after refresh"]
+        assert client.get(f"/api/bridges/{bridge_id}").json()["notes"] == "after refresh"
+        assert replicas.READ_SESSIONS.value("replica.db") == 1
+
+        # The refresh also drops the page cached from the old copy
+        replica_set.refresh(database.engine)
+        assert notes() == ["after refresh"]
+        export = client.get("/api/bridges/export?search=zqreplica&fields=notes").text
+        assert json.loads(export)["notes"] == "after refresh"
+        assert 'db_replica_lag_seconds{replica="replica.db"}' in client.get("/metrics").text
+    finally:
+        client.delete(f"/api/bridges/{bridge_id}")
+        replica.engine.dispose()
+
+
+def test_inspection_worklist(monkeypatch):
+    """/due ranks by days overdue plus condition and load weights, and follows updates and the date"""
+    today = date.today()
+    schedule = [("good", -10), ("critical", 20), ("fair", 200)]
+    ids = [create_bridge_helper() for _ in schedule]
+    try:
+        for bridge_id, (condition, due_in) in zip(ids, schedule):
+            update = {"condition": condition, "next_inspection_date": (today + timedelta(days=due_in)).isoformat()}
+            assert client.put(f"/api/bridges/{bridge_id}", json=update).status_code == 200
+
+        def worklist(within_days):
+            response = client.get(f"/api/bridges/due?within_days={within_days}&limit=500")
+            assert response.status_code == 200
+            return [bridge for bridge in response.json()["bridges"] if bridge["id"] in ids]
+
+        due = worklist(30)
+        assert [bridge["id"] for bridge in due] == [ids[1], ids[0]]
+        assert [(bridge["overdue_days"], bridge["risk_score"]) for bridge in due] == [(-20, 370.0), (10, 35.0)]
+        assert [bridge["id"] for bridge in worklist(365)] == [ids[1], ids[0], ids[2]]
+
+        assert client.put(f"/api/bridges/{ids[0]}", json={"condition": "critical"}).status_code == 200
+        assert [bridge["id"] for bridge in worklist(30)] == [ids[0], ids[1]]
+
+        # A cached worklist is not served past midnight
+        class Tomorrow(date):
+            @classmethod
+            def today(cls):
+                return today + timedelta(days=1)
+
+        monkeypatch.setattr(sys.modules["routers.bridges.router"], "date", Tomorrow)
+        assert [bridge["overdue_days"] for bridge in worklist(30)] == [11, -19]
+
+        assert client.get("/api/bridges/due?within_days=-1").status_code == 422
+        assert client.get("/api/bridges/due?limit=0").status_code == 422
+    finally:
+        for bridge_id in ids:
+            client.delete(f"/api/bridges/{bridge_id}")
+
+
 if __name__ == "__main__":
     print("Run with: pytest test_bridges_example.py -v")
@@ -6,8 +6,27 @@ To run tests:
 2. Run: pytest test_water_quality_example.py -v
 """
 
+import io
+import json
+import os
+import re
+import subprocess
+import sys
+import uuid
+from datetime import date
+
+import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
 from main import app
+from core.query_plan import full_scans
+import database
+from core.migrations import migrate
+from database import SessionLocal, get_async_db, get_read_session, get_session
+from routers.water_quality import crud
+from routers.water_quality import rollup
+from routers.water_quality.models import WaterQualityDailyRollup, WaterQualitySample
 
 client = TestClient(app)
 
@@ -78,5 +97,313 @@ def test_get_nonexistent_sample():
     assert resp.status_code == 404
 
 
+def test_cursor_pagination_by_date():
+    for _ in range(3):
+        create_sample_helper()
+    first = client.get("/api/water-quality/?limit=2&sort=sample_date").json()
+    assert first["next_cursor"]
+    second = client.get(
+        f"/api/water-quality/?limit=2&sort=sample_date&cursor={first['next_cursor']}"
+    ).json()
+    offset_page = client.get("/api/water-quality/?limit=2&sort=sample_date&skip=2").json()
+    assert [s["id"] for s in second["samples"]] == [s["id"] for s in offset_page["samples"]]
+
+    # A cursor issued for one sort is not valid for another
+    resp = client.get(f"/api/water-quality/?sort=id&cursor={first['next_cursor']}")
+    assert resp.status_code == 400
+
+
+def test_include_total_estimate_invalidated_on_delete():
+    sample_id = create_sample_helper()
+    before = client.get("/api/water-quality/?status=good&include_total=estimate").json()["total"]
+    client.delete(f"/api/water-quality/{sample_id}")
+    after = client.get("/api/water-quality/?status=good&include_total=estimate").json()["total"]
+    assert after == before - 1
+    assert client.get("/api/water-quality/?include_total=false").json()["total"] is None
+
+
+def test_full_text_search_site_name():
+    sample_id = create_sample_helper()
+    client.put(f"/api/water-quality/{sample_id}", json={"site_name": "Quokkaville Intake"})
+    data = client.get("/api/water-quality/?search=quokka intake&sort=relevance").json()
+    assert sample_id in [s["id"] for s in data["samples"]]
+    assert data["total"] >= 1
+
+
+def test_bulk_create_json_reports_row_errors():
+    good = {"site_name": "Bulk Site", "location": "Dock 4", "sample_date": "2025-11-20", "status": "fair"}
+    resp = client.post("/api/water-quality/bulk", json=[good, {"site_name": "missing fields"}, good])
+    assert resp.status_code == 201
+    data = resp.json()
+    assert data["created"] == 2 and len(data["ids"]) == 2
+    assert [e["index"] for e in data["errors"]] == [1]
+    assert client.get(f"/api/water-quality/{data['ids'][1]}").json()["location"] == "Dock 4"
+
+
+def test_bulk_create_ndjson():
+    line = '{"site_name": "Ndjson Site", "location": "Pier", "sample_date": "2025-11-21", "status": "good"}'
+    resp = client.post(
+        "/api/water-quality/bulk",
+        content="\n".join([line, "not json", line]) + "\n",
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert resp.status_code == 201
+    data = resp.json()
+    assert data["created"] == 2
+    assert data["errors"][0]["index"] == 1
+    # Bulk rows are searchable straight away
+    found = client.get("/api/water-quality/?search=ndjson").json()["samples"]
+    assert set(data["ids"]) <= {s["id"] for s in found}
+
+
+def test_export_matches_list_items():
+    sample_id = create_sample_helper()
+    item = client.get(f"/api/water-quality/{sample_id}").json()
+    resp = client.get("/api/water-quality/export?start_date=2025-11-19&end_date=2025-11-19")
+    assert resp.status_code == 200
+    rows = {row["id"]: row for row in map(json.loads, resp.text.splitlines())}
+    assert rows[sample_id] == item
+
+
+def test_negotiated_compression():
+    client.post("/api/water-quality/bulk", json=[
+        {"site_name": f"Compress Site {i}", "location": "Weir", "sample_date": "2025-10-01", "status": "good"}
+        for i in range(30)
+    ])
+    url = "/api/water-quality/?limit=30&start_date=2025-10-01&end_date=2025-10-01"
+    plain = client.get(url, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    gzipped = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in gzipped.headers["vary"]
+    assert gzipped.json() == plain.json()
+    # Small bodies are sent as they are
+    tiny = client.get("/api/water-quality/?limit=1&fields=status", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in tiny.headers
+
+
+def test_compact_list_and_export_formats():
+    msgpack = pytest.importorskip("msgpack")
+    create_sample_helper()
+    url = "/api/water-quality/?limit=20&start_date=2025-11-19&end_date=2025-11-19&include_total=false"
+    page = client.get(url).json()
+
+    columnar = client.get(url + "&format=columnar").json()
+    assert list(columnar["samples"]) == list(page["samples"][0])
+    assert columnar["samples"]["id"] == [s["id"] for s in page["samples"]]
+
+    packed = client.get(url + "&format=msgpack")
+    assert packed.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(packed.content) == page
+
+    export = "/api/water-quality/export?start_date=2025-11-19&end_date=2025-11-19"
+    rows = [json.loads(line) for line in client.get(export).text.splitlines()]
+    assert list(msgpack.Unpacker(io.BytesIO(client.get(export + "&format=msgpack").content))) == rows
+    batches = [json.loads(line) for line in client.get(export + "&format=columnar").text.splitlines()]
+    assert sum(len(batch["id"]) for batch in batches) == len(rows)
+
+
+def test_stats_by_site_and_month():
+    site = f"Stats Site {uuid.uuid4().hex[:8]}"
+    rows = [
+        {"site_name": site, "location": "Weir", "sample_date": f"2019-03-{day:02d}",
+         "ph": ph, "e_coli_count": 10 * day, "status": "good"}
+        for day, ph in [(1, 6.0), (2, 7.0), (3, 8.0), (4, 9.0)]
+    ]
+    client.post("/api/water-quality/bulk", json=rows)
+    resp = client.get(
+        f"/api/water-quality/stats?bucket=month&site_name={site}"
+        "&start_date=2019-01-01&end_date=2019-12-31&percentiles=50,100"
+    )
+    assert resp.status_code == 200
+    [group] = resp.json()["groups"]
+    assert group["bucket_start"] == "2019-03-01"
+    ph = group["metrics"]["ph"]
+    assert ph["count"] == 4 and ph["min"] == 6.0 and ph["max"] == 9.0 and ph["mean"] == 7.5
+    assert ph["percentiles"] == {"p50": 7.0, "p100": 9.0}
+    assert group["metrics"]["turbidity_ntu"]["count"] == 0
+
+    weekly = client.get(f"/api/water-quality/stats?bucket=week&site_name={site}&end_date=2019-12-31").json()
+    # 2019-03-01 was a Friday: Fri-Sun fall in the week of Feb 25, Monday starts a new one
+    assert [g["bucket_start"] for g in weekly["groups"]] == ["2019-02-25", "2019-03-04"]
+    assert client.get("/api/water-quality/stats?percentiles=0").status_code == 400
+
+
+def _rollup_rows(db):
+    return db.query(WaterQualityDailyRollup).order_by(
+        WaterQualityDailyRollup.site_name, WaterQualityDailyRollup.day
+    ).with_entities(*WaterQualityDailyRollup.__table__.columns).all()
+
+
+def test_rollup_matches_full_rebuild(monkeypatch):
+    site = f"Rollup Site {uuid.uuid4().hex[:8]}"
+    row = {"site_name": site, "location": "Weir", "sample_date": "2018-05-02", "ph": 7.25, "status": "good"}
+    rows = [row, dict(row, ph=6.5), dict(row, ph=None), dict(row, ph=8.0), dict(row, ph=5.5)]
+    ids = client.post("/api/water-quality/bulk", json=rows).json()["ids"]
+    client.put(f"/api/water-quality/{ids[0]}", json={"sample_date": "2018-05-03", "nitrates_mg_l": 1.5})
+    client.delete(f"/api/water-quality/{ids[1]}")
+
+    db = SessionLocal()
+    try:
+        # Set-based writes refresh only the days they touch, old and new
+        def no_rebuild(db):
+            raise AssertionError("a bulk write rebuilt the whole rollup")
+
+        monkeypatch.setattr(rollup, "rebuild", no_rebuild)
+        other = f"{site} B"
+        crud.samples.bulk_update(db, [(ids[3], {"site_name": other, "sample_date": date(2018, 5, 17)})])
+        crud.samples.update_where(db, {"ph": 6.0, "sample_date": date(2018, 6, 17)}, start_date="2018-05-17",
+                                  end_date="2018-05-17")
+        crud.samples.bulk_update(db, [(ids[4], {"sample_date": date(2018, 6, 18)})])
+        assert crud.samples.delete_where(db, start_date="2018-06-18", end_date="2018-06-18") == [ids[4]]
+        monkeypatch.undo()
+
+        incremental = _rollup_rows(db)
+        rollup.rebuild(db)
+        assert _rollup_rows(db) == incremental
+        db.rollback()
+
+        from_rollup = crud.get_stats(db, bucket="month", start_date="2018-01-01", end_date="2018-12-31")
+        from_raw = crud.get_stats(
+            db, bucket="month", start_date="2018-01-01", end_date="2018-12-31", use_rollup=False
+        )
+        assert len(from_rollup) == len(from_raw)
+        for a, b in zip(from_rollup, from_raw):
+            assert (a["site_name"], str(a["bucket_start"]), a["samples"]) == (
+                b["site_name"], str(b["bucket_start"]), b["samples"]
+            )
+            for metric, stats in a["metrics"].items():
+                other = b["metrics"][metric]
+                assert (stats["count"], stats["min"], stats["max"]) == (other["count"], other["min"], other["max"])
+                assert stats["mean"] == pytest.approx(other["mean"])
+    finally:
+        db.close()
+
+
+def test_monthly_partitions(tmp_path):
+    """Samples land in per-month tables; reads merge them and retention drops whole months"""
+    # Retention drops whole months, so this runs on its own database
+    engine = database.create_profiled_engine(f"sqlite:///{tmp_path / 'partitions.db'}")
+    migrate(engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def session():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_session] = app.dependency_overrides[get_read_session] = session
+    try:
+        _check_monthly_partitions(Session)
+    finally:
+        app.dependency_overrides.pop(get_session)
+        app.dependency_overrides.pop(get_read_session)
+        engine.dispose()
+
+
+def _check_monthly_partitions(Session):
+    site = f"Partition Site {uuid.uuid4().hex[:8]}"
+    dates = ["1990-01-20", "1990-01-05", "1990-02-11", "1990-03-02", "1990-03-01"]
+    rows = [{"site_name": site, "location": "Weir", "sample_date": day, "ph": 7.0, "status": "good"} for day in dates]
+    url = "/api/water-quality/?start_date=1990-01-01&end_date=1990-03-31&sort=sample_date&limit=2"
+    before = client.get(url).json()["total"]
+    ids = client.post("/api/water-quality/bulk", json=rows).json()["ids"]
+    expected = sorted(zip(dates, ids))
+
+    page = client.get(url).json()
+    assert page["total"] == before + len(rows)
+    seen = [(s["sample_date"], s["id"]) for s in page["samples"]]
+    while page["next_cursor"]:
+        page = client.get(f"{url}&cursor={page['next_cursor']}").json()
+        seen += [(s["sample_date"], s["id"]) for s in page["samples"]]
+    assert [row for row in seen if row[1] in ids] == expected
+
+    # Changing the date moves the row to its new month under the same id
+    moved = client.put(f"/api/water-quality/{ids[1]}", json={"sample_date": "1990-02-14"}).json()
+    assert moved["id"] == ids[1] and moved["sample_date"] == "1990-02-14"
+    db = Session()
+    try:
+        february = crud.sample_partitions.table(date(1990, 2, 1))
+        assert ids[1] in db.scalars(february.select().with_only_columns(february.c.id)).all()
+        # A read by id touches only the row's month, never the view over all of them
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.get_bind(), "before_cursor_execute", record)
+        try:
+            row = crud.samples.get(db, ids[1])
+        finally:
+            event.remove(db.get_bind(), "before_cursor_execute", record)
+        assert (row.id, row.sample_date) == (ids[1], date(1990, 2, 14))
+        assert not [sql for sql in statements if re.search(r"FROM water_quality_samples\b", sql)]
+        changes = {"sample_date": date(1990, 3, 3)}
+        moved_ids = crud.samples.update_where(db, changes, start_date="1990-02-01", end_date="1990-02-28")
+        assert {ids[1], ids[2]} <= set(moved_ids)
+
+        _, dropped, _ = crud.get_samples(db, limit=1, end_date="1990-02-28")
+        assert crud.drop_samples_before(db, "1990-03-01") == dropped
+        assert [m.isoformat() for m in crud.sample_partitions.months(db)][:1] == ["1990-03-01"]
+    finally:
+        db.close()
+    assert client.get(f"/api/water-quality/{ids[0]}").status_code == 404
+    march = client.get("/api/water-quality/?start_date=1990-01-01&end_date=1990-03-31&limit=500").json()
+    assert {s["id"] for s in march["samples"]} & set(ids) == set(ids[1:])
+    # Searches find moved rows in their new month and nothing from dropped ones
+    token = site.split()[-1]
+    for sort in ("id", "relevance"):
+        found = client.get(f"/api/water-quality/?search={token}&sort={sort}&limit=10").json()
+        assert found["total"] == 4 and sorted(s["id"] for s in found["samples"]) == sorted(ids[1:])
+    stats = client.get(f"/api/water-quality/stats?bucket=month&site_name={site}").json()["groups"]
+    assert [(g["bucket_start"], g["samples"]) for g in stats] == [("1990-03-01", 4)]
+
+
+def test_app_starts_on_empty_database(tmp_path):
+    """A new database gets a partition for the current month, passes the plan check and lists nothing"""
+    script = (
+        "import json\n"
+        "from fastapi.testclient import TestClient\n"
+        "from main import app\n"
+        "with TestClient(app) as client:\n"
+        "    paths = ('/api/water-quality/', '/api/water-quality/?status=poor')\n"
+        "    print(json.dumps([client.get(path).json()['total'] for path in paths]))\n"
+    )
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp_path / 'new.db'}")
+    result = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout.strip().splitlines()[-1]) == [0, 0]
+
+
+def test_list_queries_use_indexes():
+    db = SessionLocal()
+    try:
+        for name, query in crud.list_query_shapes(db).items():
+            assert full_scans(db, query) == [], name
+        # Filtering on an unindexed metric is reported as a full scan
+        unindexed = db.query(WaterQualitySample).filter(WaterQualitySample.ph > 7)
+        assert full_scans(db, unindexed)
+    finally:
+        db.close()
+
+
+def test_async_session_stack():
+    """The same routes work on the aiosqlite engine (DB_ASYNC=1)"""
+    app.dependency_overrides[get_session] = get_async_db
+    try:
+        sample_id = create_sample_helper()
+        assert client.get(f"/api/water-quality/{sample_id}").json()["site_name"] == "Test Site"
+        response = client.put(f"/api/water-quality/{sample_id}", json={"status": "poor"})
+        assert response.json()["status"] == "poor"
+        assert client.get("/api/water-quality/?status=poor&include_total=false").status_code == 200
+        assert client.get("/api/water-quality/stats?site_name=Test Site&bucket=month").status_code == 200
+        assert client.delete(f"/api/water-quality/{sample_id}").status_code == 204
+        assert client.get(f"/api/water-quality/{sample_id}").status_code == 404
+    finally:
+        app.dependency_overrides.pop(get_session)
+
+
 if __name__ == "__main__":
     print("Run with: pytest test_water_quality_example.py -v")